@@ -207,6 +207,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'prenotazioni.context_processors.scuola',
             ],
         },
     },
@@ -223,6 +224,14 @@ DATABASES = {
         conn_health_checks=True,  # Controllo stato connessione
     )
 }
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # BEGIN IMMEDIATE: le transazioni che scrivono prendono subito il lock e
+    # attendono il timeout invece di fallire con "database is locked" quando
+    # due richieste concorrenti passano da lettura a scrittura
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': int(os.environ.get('SQLITE_TIMEOUT', '20')),
+    })
 
 ###########################################################
 # PASSWORD: validatori
@@ -247,9 +256,15 @@ AUTH_PASSWORD_VALIDATORS = [
 # How many previous passwords to keep to prevent reuse. Enforce pruning
 # after password changes to limit storage and allow policy tuning via env.
 PASSWORD_HISTORY_COUNT = int(os.environ.get('PASSWORD_HISTORY_COUNT', 5))
+# Tempo massimo (secondi) per confrontare la nuova password con lo storico
+PASSWORD_HISTORY_CHECK_BUDGET = float(os.environ.get('PASSWORD_HISTORY_CHECK_BUDGET', 2.0))
 # zxcvbn password strength threshold (0-4). Default require at least 3.
 PASSWORD_MIN_ZXCVBN_SCORE = int(os.environ.get('PASSWORD_MIN_ZXCVBN_SCORE', 3))
 
+# Audit e notifiche delle prenotazioni: dopo il commit nello stesso thread
+# (default) oppure in un thread di background dedicato
+BOOKING_SIDE_EFFECTS_ASYNC = os.environ.get('BOOKING_SIDE_EFFECTS_ASYNC', 'False').lower() in ('1', 'true', 'yes')
+
 ###########################################################
 # LOCALIZZAZIONE
 ###########################################################
@@ -396,6 +411,19 @@ BOOKING_END_HOUR = os.environ.get("BOOKING_END_HOUR", "18:00")
 GIORNI_ANTICIPO_PRENOTAZIONE = int(os.environ.get("GIORNI_ANTICIPO_PRENOTAZIONE", 2))
 DURATA_MINIMA_PRENOTAZIONE_MINUTI = int(os.environ.get("DURATA_MINIMA_PRENOTAZIONE_MINUTI", 30))
 DURATA_MASSIMA_PRENOTAZIONE_MINUTI = int(os.environ.get("DURATA_MASSIMA_PRENOTAZIONE_MINUTI", 180))
+# Ore di lezione, es. "08:00-08:50,08:50-09:40" (default: ore intere nella fascia prenotabile)
+ORE_SCOLASTICHE = [p for p in os.environ.get("ORE_SCOLASTICHE", "").split(",") if p.strip()]
+# Indice di disponibilità dei dispositivi per ora di lezione (richiede una cache condivisa con più processi)
+SLOT_INDEX_ENABLED = os.environ.get("SLOT_INDEX_ENABLED", "False").lower() in ("1", "true", "yes")
+SLOT_INDEX_TIMEOUT = int(os.environ.get("SLOT_INDEX_TIMEOUT", 24 * 3600))
+
+# Promemoria prenotazioni: ore prima dell'inizio (es. "24,1") e intervallo del ciclo demone
+PROMEMORIA_ORIZZONTI_ORE = [float(h) for h in os.environ.get("PROMEMORIA_ORIZZONTI_ORE", "24,1").split(",") if h.strip()]
+PROMEMORIA_INTERVALLO_SECONDI = int(os.environ.get("PROMEMORIA_INTERVALLO_SECONDI", 300))
+
+# Warm-up dei worker prima della prima richiesta (vedi gunicorn.conf.py)
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "True").lower() in ("1", "true", "yes")
+WARMUP_BUDGET_SECONDS = float(os.environ.get("WARMUP_BUDGET_SECONDS", 5))
 
 # Configurazione login/logout
 LOGIN_URL = 'login'
@@ -443,11 +471,25 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'prenotazioni.middleware.QueryBudgetMiddleware',
     'prenotazioni.middleware.ForcePasswordChangeMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Profilazione query per richiesta (Server-Timing + log JSON). Sempre
+# disponibile per lo staff con l'header X-Profile-Queries.
+QUERY_PROFILING_ENABLED = os.environ.get('QUERY_PROFILING_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+# Numero massimo di query per view (namespace:nome); oltre viene loggato un warning
+QUERY_BUDGETS = {
+    'prenotazioni:lista_prenotazioni': 15,
+    'prenotazioni:database_viewer': 5,
+    'prenotazioni:database_viewer_data': 5,
+    'admin:prenotazioni_prenotazione_changelist': 12,
+}
+# In strict mode il superamento solleva un'eccezione (per i test)
+QUERY_BUDGET_STRICT = False
+
 # =========================
 # DJANGO CORS HEADERS - Basic API Support
 # =========================
@@ -30,9 +30,9 @@ until python manage.py migrate --noinput; do
     sleep 3
 done
 
-# Check superuser
-if ! python manage.py shell -c "from django.contrib.auth import get_user_model; User = get_user_model(); exit(0) if User.objects.filter(is_superuser=True).exists() else exit(1)"; then
-    echo "[WARNING] Nessun superuser trovato: crea un superuser con 'python manage.py createsuperuser'!"
+# Controlli di avvio (database, superuser): una sola volta qui, non in ogni worker
+if ! python manage.py startup_profile --controlli; then
+    echo "[WARNING] Controlli di avvio falliti"
 fi
 
 # Avvia il comando richiesto (es. gunicorn)
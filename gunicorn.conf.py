@@ -0,0 +1,18 @@
+"""Configurazione di gunicorn, letta automaticamente dalla directory di lavoro.
+
+Le opzioni passate da riga di comando (Procfile, Dockerfile, render.yaml)
+hanno la precedenza; qui ci sono solo gli hook.
+"""
+
+
+def post_worker_init(worker):
+    """Riscalda il worker prima che accetti richieste.
+
+    `post_worker_init` e non `post_fork`: senza `--preload` l'applicazione
+    Django viene caricata dopo il fork, e solo qui è già configurata.
+    """
+    from prenotazioni import warmup
+
+    report = warmup.on_worker_start()
+    if report is not None:
+        worker.log.info('Warm-up worker %s completato in %.0fms', worker.pid, report['total_ms'])
@@ -5,9 +5,11 @@ Aggiornato per supportare tutti i nuovi modelli della ristrutturazione.
 """
 
 from django.contrib import admin
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from .models import (
     # Modelli Core
-    ProfiloUtente, Risorsa, Dispositivo, Prenotazione, PrenotazioneDispositivo,
+    ProfiloUtente, Risorsa, Dispositivo, Prenotazione, PrenotazioneDispositivo, SeriePrenotazioni,
 
     # Configurazione e Info
     ConfigurazioneSistema, InformazioniScuola,
@@ -182,7 +184,7 @@ class AmministrazioneStatoPrenotazione(admin.ModelAdmin):
 class AmministrazionePrenotazione(admin.ModelAdmin):
     """Admin per prenotazioni - Controllo MINUZIOSO e completo."""
 
-    list_display = ('utente', 'risorsa', 'stato', 'quantita', 'inizio', 'fine', 'priorita', 'durata_ore', 'stato_temporale', 'con_approvazione', 'modificabile', 'dispositivi_richiesti')
+    list_display = ('utente', 'risorsa', 'stato', 'quantita', 'inizio', 'fine', 'priorita', 'durata_ore', 'stato_temporale', 'con_approvazione', 'modificabile', 'conflitti', 'dispositivi_richiesti')
     list_filter = ('stato', 'priorita', 'setup_needed', 'cleanup_needed', 'inizio', 'fine', 'approvazione_richiesta')
     search_fields = ('utente__username', 'utente__email', 'risorsa__nome', 'scopo')
     readonly_fields = ('creato_il', 'modificato_il', 'durata_minuti', 'durata_ore', 'stato_temporale', 'con_approvazione', 'modificabile', 'cancellabile', 'conflitti', 'dispositivi_richiesti', 'data_approvazione')
@@ -211,14 +213,11 @@ class AmministrazionePrenotazione(admin.ModelAdmin):
 
     def stato_temporale(self, obj):
         """Mostra stato temporale della prenotazione."""
-        if hasattr(obj, 'is_passata') and hasattr(obj, 'is_in_corso'):
-            if obj.is_passata():
-                return "Passata"
-            elif obj.is_in_corso():
-                return "In Corso"
-            else:
-                return "Futura"
-        return "Sconosciuto"
+        if obj.is_passata:
+            return "Passata"
+        elif obj.is_in_corso:
+            return "In Corso"
+        return "Futura"
     stato_temporale.short_description = 'Stato Temporale'
 
     def con_approvazione(self, obj):
@@ -235,49 +234,78 @@ class AmministrazionePrenotazione(admin.ModelAdmin):
     def modificabile(self, obj):
         """Verifica se la prenotazione può essere modificata."""
         # Logica di controllo minuziosa
-        if hasattr(obj, 'is_passata') and obj.is_passata():
+        if obj.is_passata:
             return "No - Passata"
-        if obj.stato and obj.stato.nome == 'cancelled':
+        if obj.stato == 'annullata' or obj.cancellato_il:
             return "No - Cancellata"
         return "Sì"
     modificabile.short_description = 'Modificabile'
 
     def cancellabile(self, obj):
         """Verifica se la prenotazione può essere cancellata."""
-        if hasattr(obj, 'is_passata') and obj.is_passata():
+        if obj.is_passata:
             return "No - Passata"
-        if obj.stato and obj.stato.nome == 'cancelled':
+        if obj.stato == 'annullata' or obj.cancellato_il:
             return "Già Cancellata"
         return "Sì"
     cancellabile.short_description = 'Cancellabile'
 
     def conflitti(self, obj):
-        """Rileva possibili conflitti di prenotazione."""
-        # Controllo semplificato di sovrapposizioni
-        conflitti_count = Prenotazione.objects.filter(
-            risorsa=obj.risorsa,
-            inizio__lt=obj.fine,
-            fine__gt=obj.inizio
-        ).exclude(pk=obj.pk).count()
+        """Rileva possibili conflitti di prenotazione (da annotazione)."""
+        conflitti_count = getattr(obj, 'num_conflitti', None)
+        if conflitti_count is None:
+            # Oggetto non annotato (es. form di modifica): calcolo puntuale
+            conflitti_count = Prenotazione.objects.filter(
+                risorsa_id=obj.risorsa_id,
+                inizio__lt=obj.fine,
+                fine__gt=obj.inizio
+            ).exclude(pk=obj.pk).count()
 
         if conflitti_count > 0:
             return f"⚠️ {conflitti_count} conflitti"
         return "✅ Nessun conflitto"
     conflitti.short_description = 'Conflitti'
+    conflitti.admin_order_field = 'num_conflitti'
 
     def dispositivi_richiesti(self, obj):
-        """Mostra i dispositivi richiesti per questa prenotazione."""
-        dispositivi = obj.prenotazionedispositivo_set.all()
-        if dispositivi:
-            return ", ".join([pd.dispositivo.nome for pd in dispositivi[:3]]) + (f" +{dispositivi.count()-3}" if dispositivi.count() > 3 else "")
-        return "Nessuno"
+        """Mostra i dispositivi richiesti per questa prenotazione (da annotazione)."""
+        totale = getattr(obj, 'num_dispositivi', None)
+        if totale is None:
+            dispositivi = list(obj.dispositivi_assegnati.select_related('dispositivo').order_by('dispositivo__nome'))
+            totale = len(dispositivi)
+            primo = dispositivi[0].dispositivo.nome if dispositivi else None
+            pezzi = sum(pd.quantita for pd in dispositivi)
+        else:
+            primo = obj.primo_dispositivo
+            pezzi = obj.pezzi_dispositivi
+        if not totale:
+            return "Nessuno"
+        testo = primo + (f" +{totale - 1}" if totale > 1 else "")
+        return f"{testo} ({pezzi} pz)"
     dispositivi_richiesti.short_description = 'Dispositivi'
+    dispositivi_richiesti.admin_order_field = 'num_dispositivi'
 
     def get_queryset(self, request):
-        """Ottimizza le query per controlli minuziosi."""
+        """Annota conflitti e riepilogo dispositivi in un'unica query.
+
+        Le colonne calcolate leggono solo le annotazioni: il numero di query
+        della changelist non dipende dal numero di righe.
+        """
+        conflitti = Prenotazione.objects.filter(
+            risorsa_id=OuterRef('risorsa_id'),
+            inizio__lt=OuterRef('fine'),
+            fine__gt=OuterRef('inizio'),
+        ).exclude(pk=OuterRef('pk')).order_by().values('risorsa_id').annotate(n=Count('pk')).values('n')
+        assegnazioni = PrenotazioneDispositivo.objects.filter(prenotazione_id=OuterRef('pk')).order_by()
+        riepilogo = assegnazioni.values('prenotazione_id')
         return super().get_queryset(request).select_related(
-            'utente', 'risorsa', 'stato', 'approvato_da'
-        ).prefetch_related('prenotazionedispositivo_set')
+            'utente', 'risorsa', 'approvato_da'
+        ).annotate(
+            num_conflitti=Coalesce(Subquery(conflitti[:1]), 0),
+            num_dispositivi=Coalesce(Subquery(riepilogo.annotate(n=Count('pk')).values('n')[:1]), 0),
+            pezzi_dispositivi=Coalesce(Subquery(riepilogo.annotate(n=Sum('quantita')).values('n')[:1]), 0),
+            primo_dispositivo=Subquery(assegnazioni.order_by('dispositivo__nome').values('dispositivo__nome')[:1]),
+        )
 
     def get_readonly_fields(self, request, obj=None):
         """Campi readonly basati su logica minuziosa."""
@@ -285,16 +313,36 @@ class AmministrazionePrenotazione(admin.ModelAdmin):
 
         if obj:
             # Prenotazioni passate diventano in sola lettura completamente
-            if hasattr(obj, 'is_passata') and obj.is_passata():
+            if obj.is_passata:
                 readonly.extend(['inizio', 'fine', 'stato', 'quantita'])
 
             # Prenotazioni cancellate bloccano le modifiche
-            if obj.stato and obj.stato.nome == 'cancelled':
+            elif obj.stato == 'annullata' or obj.cancellato_il:
                 readonly.extend(['inizio', 'fine', 'quantita'])
 
         return tuple(readonly)
 
 
+@admin.register(SeriePrenotazioni)
+class AmministrazioneSeriePrenotazioni(admin.ModelAdmin):
+    """Admin per le serie di prenotazioni ricorrenti."""
+
+    list_display = ('utente', 'risorsa', 'data_inizio', 'data_fine', 'ora_inizio', 'ora_fine', 'intervallo_settimane', 'num_occorrenze', 'cancellato_il')
+    list_filter = ('risorsa', 'intervallo_settimane', 'cancellato_il')
+    search_fields = ('utente__username', 'risorsa__nome', 'scopo')
+    readonly_fields = ('creato_il', 'modificato_il', 'cancellato_il')
+    ordering = ('-data_inizio',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('utente', 'risorsa').annotate(
+            num_occorrenze=Count('occorrenze')
+        )
+
+    @admin.display(description='Occorrenze', ordering='num_occorrenze')
+    def num_occorrenze(self, obj):
+        return obj.num_occorrenze
+
+
 @admin.register(PrenotazioneDispositivo)
 class AmministrazionePrenotazioneDispositivo(admin.ModelAdmin):
     """Admin per assegnazioni dispositivi alle prenotazioni."""
@@ -0,0 +1,255 @@
+"""Benchmark dei percorsi critici dei servizi di prenotazione.
+
+Ogni benchmark viene eseguito su un dataset sintetico (vedi `synthetic`)
+dentro una transazione che alla fine viene annullata: il database resta
+com'era e le scale successive partono da zero.
+
+Le callback `transaction.on_commit` registrate da un percorso (audit,
+notifiche, hook della pipeline degli effetti collaterali) vengono
+eseguite subito dopo, dentro la misura: il commit non arriva mai, ma il
+loro costo fa parte di quello reale del percorso.
+
+Per ogni percorso si misurano i percentili di latenza (p50, p90, p95,
+p99, max in millisecondi) e il numero di query SQL, callback comprese. I risultati si
+salvano in JSON e si confrontano con una baseline: le query sono
+deterministiche e vengono confrontate in modo esatto, le latenze con una
+tolleranza relativa e una soglia minima assoluta per ignorare il rumore.
+"""
+from __future__ import annotations
+
+import json
+import platform
+import time
+from datetime import timedelta
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from . import synthetic
+from .models import NotificaUtente, Risorsa
+from .services import BookingService, NotificationService, ResourceService, SystemService
+
+User = get_user_model()
+
+DEFAULT_REPEAT = 20
+DEFAULT_TOLERANCE = 1.5
+# Sotto questa differenza (ms) una variazione di latenza è considerata rumore
+NOISE_FLOOR_MS = 2.0
+PERCENTILES = (50, 90, 95, 99)
+
+
+class _Rollback(Exception):
+    """Usata per annullare la transazione del dataset a fine scala."""
+
+
+def percentile(samples, pct):
+    """Percentile con il metodo nearest-rank su una lista già ordinata."""
+    if not samples:
+        return 0.0
+    rank = max(1, -(-len(samples) * pct // 100))
+    return samples[int(rank) - 1]
+
+
+def summarize(timings, queries):
+    """Riduce i campioni di una misura a percentili e conteggio query."""
+    ordered = sorted(timings)
+    result = {f'p{p}': round(percentile(ordered, p) * 1000, 3) for p in PERCENTILES}
+    result['max'] = round(ordered[-1] * 1000, 3) if ordered else 0.0
+    result['queries'] = max(queries) if queries else 0
+    result['runs'] = len(ordered)
+    return result
+
+
+# =====================================================
+# CONTESTO E PERCORSI MISURATI
+# =====================================================
+
+class BenchmarkContext:
+    """Oggetti di riferimento del dataset, risolti una volta per scala."""
+
+    def __init__(self):
+        tag = 'SYN'
+        self.user = User.objects.filter(username__startswith='syn_u').order_by('pk').first()
+        resources = Risorsa.objects.filter(codice__startswith=f'{tag}-R').order_by('pk')
+        self.laboratorio = resources.filter(tipo='laboratorio').first() or resources.first()
+        self.carrello = resources.filter(tipo='carrello').first() or resources.first()
+        # Uno slot sicuramente libero (le prenotazioni sintetiche finiscono
+        # entro le 16) ma dentro la finestra dell'anno scolastico
+        day = timezone.localdate() + timedelta(days=1)
+        self.slot_start = synthetic._aware(day, 17)
+        self.slot_end = self.slot_start + timedelta(hours=1)
+        # Uno slot pieno di prenotazioni sintetiche, per il controllo conflitti
+        days = synthetic.school_days()
+        busy_day = days[len(days) // 2]
+        self.busy_start = synthetic._aware(busy_day, 9)
+        self.busy_end = synthetic._aware(busy_day, 12)
+        self.factory = RequestFactory()
+
+
+def bench_check_availability(ctx):
+    BookingService.check_resource_availability(ctx.carrello.pk, ctx.busy_start, ctx.busy_end, 1)
+
+
+def bench_create_booking(ctx):
+    ok, result = BookingService.create_booking(
+        ctx.user, ctx.laboratorio.pk, 1, ctx.slot_start, ctx.slot_end, scopo='Benchmark'
+    )
+    if not ok:
+        raise RuntimeError(result)
+
+
+def bench_available_resources(ctx):
+    list(ResourceService.get_available_resources(start=ctx.busy_start, end=ctx.busy_end))
+
+
+def bench_send_pending(ctx):
+    now = timezone.now()
+    NotificaUtente.objects.bulk_create([
+        NotificaUtente(
+            utente=ctx.user, tipo='benchmark', canale='email', titolo='Benchmark',
+            messaggio='Messaggio di prova', stato='pending', prossimo_tentativo=now,
+        )
+        for _ in range(10)
+    ])
+    NotificationService.send_pending_notifications()
+
+
+def bench_lookup_unica(ctx):
+    from .views import lookup_unica
+    lookup_unica(ctx.factory.get('/lookup_unica/', {'codice': 'RMIC8AB00X'}))
+
+
+def bench_system_stats(ctx):
+    SystemService.get_system_stats()
+
+
+# Nome -> (funzione, modifica il database?)
+BENCHMARKS = {
+    'check_resource_availability': (bench_check_availability, False),
+    'create_booking': (bench_create_booking, True),
+    'get_available_resources': (bench_available_resources, False),
+    'send_pending_notifications': (bench_send_pending, True),
+    'lookup_unica': (bench_lookup_unica, False),
+    'get_system_stats': (bench_system_stats, False),
+}
+
+
+# =====================================================
+# ESECUZIONE
+# =====================================================
+
+def run_benchmark(func, ctx, repeat, mutates):
+    """Esegue `func` `repeat` volte (più un giro di riscaldamento).
+
+    Le callback on_commit registrate da `func` vengono eseguite dentro la
+    misura, prima del rollback del savepoint che ne annulla anche le scritture.
+    """
+    timings, queries = [], []
+    for i in range(repeat + 1):
+        sid = transaction.savepoint() if mutates else None
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                with TestCase.captureOnCommitCallbacks(execute=True):
+                    func(ctx)
+                elapsed = time.perf_counter() - started
+        finally:
+            if sid is not None:
+                transaction.savepoint_rollback(sid)
+        if i == 0:
+            continue  # riscaldamento: cache, import e piani di esecuzione
+        timings.append(elapsed)
+        queries.append(len(captured.captured_queries))
+    return summarize(timings, queries)
+
+
+def run_scale(scale, repeat=DEFAULT_REPEAT, only=None, seed=synthetic.DEFAULT_SEED, sizes=None):
+    """Genera il dataset per `scale`, misura i percorsi e annulla tutto."""
+    sizes = sizes or synthetic.SCALES[scale]
+    results = {}
+    # Email in memoria e pipeline post-commit sincrona: misuriamo il servizio, non la rete
+    with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                           BOOKING_SIDE_EFFECTS_ASYNC=False):
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                counts = synthetic.generate(seed=seed, **sizes)
+                generation_s = time.perf_counter() - started
+                ctx = BenchmarkContext()
+                for name, (func, mutates) in BENCHMARKS.items():
+                    if only and name not in only:
+                        continue
+                    try:
+                        results[name] = run_benchmark(func, ctx, repeat, mutates)
+                    except Exception as e:
+                        results[name] = {'error': f'{type(e).__name__}: {e}'}
+                raise _Rollback
+        except _Rollback:
+            pass
+    return {'dataset': counts, 'generation_s': round(generation_s, 3), 'results': results}
+
+
+def run_suite(scales=('small',), repeat=DEFAULT_REPEAT, only=None, seed=synthetic.DEFAULT_SEED):
+    """Esegue i benchmark su più scale e restituisce il report completo."""
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'scales': {scale: run_scale(scale, repeat=repeat, only=only, seed=seed) for scale in scales},
+    }
+
+
+# =====================================================
+# BASELINE
+# =====================================================
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+        fh.write('\n')
+
+
+def load(path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE, metric='p95'):
+    """Confronta due report e restituisce la lista delle regressioni.
+
+    Una regressione è: più query della baseline, un errore dove prima non
+    c'era, oppure `metric` oltre `tolerance` volte la baseline e oltre
+    `NOISE_FLOOR_MS` in valore assoluto. Le scale o i percorsi assenti in
+    uno dei due report vengono ignorati.
+    """
+    regressions = []
+    for scale, data in current.get('scales', {}).items():
+        base_scale = baseline.get('scales', {}).get(scale)
+        if not base_scale:
+            continue
+        for name, result in data['results'].items():
+            base = base_scale['results'].get(name)
+            if not base:
+                continue
+            label = f'{scale}/{name}'
+            if 'error' in result:
+                if 'error' not in base:
+                    regressions.append(f"{label}: errore {result['error']}")
+                continue
+            if 'error' in base:
+                continue
+            if result['queries'] > base['queries']:
+                regressions.append(f"{label}: query {base['queries']} -> {result['queries']}")
+            now_ms, base_ms = result[metric], base[metric]
+            if now_ms > base_ms * tolerance and now_ms - base_ms > NOISE_FLOOR_MS:
+                regressions.append(f'{label}: {metric} {base_ms:.2f}ms -> {now_ms:.2f}ms')
+    return regressions
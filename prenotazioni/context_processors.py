@@ -0,0 +1,12 @@
+from django.utils.functional import SimpleLazyObject
+
+from .models import InformazioniScuola
+
+
+def scuola(request):
+    """Espone `school_info` (snapshot della scuola) a tutti i template.
+
+    La snapshot viene letta solo se il template la usa, e dopo la prima
+    volta arriva dalla copia in memoria del processo.
+    """
+    return {'school_info': SimpleLazyObject(InformazioniScuola.ottieni_snapshot)}
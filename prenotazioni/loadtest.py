@@ -0,0 +1,299 @@
+"""Prova di carico della "corsa" al primo slot del mattino.
+
+Simula molti docenti che, nello stesso istante, provano a prenotare le
+stesse risorse per la prima ora di un giorno di lezione. Ogni tentativo
+passa da `PrenotaResourceView` (form HTML) o da `BookingViewSet` (API
+REST), invocati in-process con `RequestFactory` da un pool di thread: si
+misurano vista, servizio e database, senza il resto dello stack
+middleware. Ogni thread usa la propria connessione al database
+configurato (SQLite o PostgreSQL), quindi i dati di prova vengono
+salvati davvero e rimossi alla fine con `synthetic.purge`.
+
+Metriche: throughput, percentili di latenza, tasso di errore e numero di
+doppie prenotazioni, calcolato con `ConflictAnalysisService` sulle sole
+risorse della prova.
+
+Poiché crea e cancella davvero utenti e risorse con il prefisso della
+prova, `run` rifiuta di partire se `DEBUG` è disattivo, a meno di un
+consenso esplicito (`allow_real_db`, `--consenti-db-reale`).
+"""
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, time as dtime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import synthetic
+from .benchmarks import percentile
+from .models import Risorsa, UbicazioneRisorsa
+from .services import ConflictAnalysisService
+
+TARGETS = ('view', 'api')
+DEFAULT_PREFIX = 'rush'
+DEFAULT_SEED = 7
+
+# Soglie predefinite del gate di regressione
+DEFAULT_MAX_ERROR_RATE = 0.01
+DEFAULT_MAX_DOUBLE_BOOKINGS = 0
+
+
+def rush_day():
+    """Primo giorno feriale prenotabile rispettando l'anticipo minimo del form."""
+    anticipo = getattr(settings, 'GIORNI_ANTICIPO_PRENOTAZIONE', 2)
+    day = timezone.localdate() + timedelta(days=anticipo + 1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def prepare(teachers=50, laboratori=3, carrelli=1, prefix=DEFAULT_PREFIX):
+    """Crea docenti e risorse della prova, con il prefisso indicato.
+
+    Restituisce (utenti, risorse). I codici risorsa seguono lo schema di
+    `synthetic` così `synthetic.purge(prefix)` rimuove tutto.
+    """
+    synthetic.generate(users=teachers, resources=0, devices=0, bookings=0, prefix=prefix)
+    tag = prefix.upper()
+    sede = UbicazioneRisorsa.objects.get(codice_meccanografico=f'{tag}SEDE')
+    resources = [
+        Risorsa(nome=f'Laboratorio corsa {i + 1}', codice=f'{tag}-R{i:05d}', tipo='laboratorio', localizzazione=sede)
+        for i in range(laboratori)
+    ] + [
+        Risorsa(nome=f'Carrello corsa {i + 1}', codice=f'{tag}-R{laboratori + i:05d}', tipo='carrello',
+                localizzazione=sede, capacita_massima=25)
+        for i in range(carrelli)
+    ]
+    Risorsa.objects.bulk_create(resources)
+    users = list(get_user_model().objects.filter(username__startswith=f'{prefix}_u').order_by('pk'))
+    resources = list(Risorsa.objects.filter(codice__startswith=f'{tag}-R').order_by('pk'))
+    return users, resources
+
+
+def build_jobs(users, resources, seed=DEFAULT_SEED):
+    """Un tentativo per docente su una risorsa a caso della prova."""
+    rng = random.Random(seed)
+    jobs = []
+    for user in users:
+        risorsa = rng.choice(resources)
+        quantita = rng.randint(5, 15) if risorsa.tipo == 'carrello' else 1
+        jobs.append((user, risorsa, quantita))
+    return jobs
+
+
+# =====================================================
+# TENTATIVI DI PRENOTAZIONE
+# =====================================================
+
+def _attempt_view(factory, user, risorsa, quantita, day):
+    from .views import PrenotaResourceView
+
+    request = factory.post('/api/prenota/', {
+        'risorsa': risorsa.pk,
+        'data': day.isoformat(),
+        'ora_inizio': '08:00',
+        'ora_fine': '09:00',
+        'quantita': quantita,
+        'priorita': 'normale',
+        'scopo': 'Prova di carico',
+    })
+    request.user = user
+    request._dont_enforce_csrf_checks = True
+    request._messages = CookieStorage(request)
+    response = PrenotaResourceView.as_view()(request)
+    if response.status_code == 302:
+        return 'created'
+    if response.status_code == 200:
+        return 'rejected'
+    return 'error'
+
+
+def _attempt_api(factory, user, risorsa, quantita, day):
+    from .views import BookingViewSet
+
+    inizio = timezone.make_aware(datetime.combine(day, dtime(8, 0)))
+    request = factory.post('/api/prenotazioni/', {
+        'risorsa': risorsa.pk,
+        'inizio': inizio.isoformat(),
+        'fine': (inizio + timedelta(hours=1)).isoformat(),
+        'quantita': quantita,
+        'scopo': 'Prova di carico',
+    }, format='json')
+    force_authenticate(request, user=user)
+    response = BookingViewSet.as_view({'post': 'create'})(request)
+    if response.status_code == 201:
+        return 'created'
+    if response.status_code == 400:
+        return 'rejected'
+    return 'error'
+
+
+ATTEMPTS = {
+    'view': (_attempt_view, RequestFactory),
+    'api': (_attempt_api, APIRequestFactory),
+}
+
+
+class _ErrorLogCounter(logging.Handler):
+    """Conta per thread i log di errore dei servizi.
+
+    `BookingService.create_booking` intercetta le eccezioni (es. database
+    bloccato) e le restituisce come un normale rifiuto: senza questo
+    conteggio finirebbero tra le prenotazioni rifiutate e non tra gli errori.
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.local = threading.local()
+
+    def emit(self, record):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+        self.local.last = record.getMessage()
+
+    def snapshot(self):
+        return getattr(self.local, 'count', 0)
+
+
+def run_rush(jobs, target='view', concurrency=10, day=None):
+    """Esegue i tentativi con `concurrency` thread partiti insieme.
+
+    Restituisce una lista di (esito, latenza_secondi, errore) e il tempo
+    totale dell'esecuzione.
+    """
+    attempt, factory_class = ATTEMPTS[target]
+    day = day or rush_day()
+    pending = list(reversed(jobs))
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+    results = []
+
+    def worker():
+        factory = factory_class()
+        local = []
+        try:
+            barrier.wait()
+            while True:
+                with lock:
+                    if not pending:
+                        break
+                    user, risorsa, quantita = pending.pop()
+                logged = errors_logged.snapshot()
+                started = time.perf_counter()
+                error = None
+                try:
+                    outcome = attempt(factory, user, risorsa, quantita, day)
+                except Exception as e:
+                    outcome, error = 'error', f'{type(e).__name__}: {e}'
+                if error is None and errors_logged.snapshot() > logged:
+                    outcome, error = 'error', errors_logged.local.last
+                local.append((outcome, time.perf_counter() - started, error))
+        finally:
+            with lock:
+                results.extend(local)
+            connection.close()
+
+    errors_logged = _ErrorLogCounter()
+    service_logger = logging.getLogger('prenotazioni.services')
+    service_logger.addHandler(errors_logged)
+    try:
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+    finally:
+        service_logger.removeHandler(errors_logged)
+    return results, time.perf_counter() - started
+
+
+def count_double_bookings(resources, day):
+    """Prenotazioni accettate oltre il limite sulle risorse della prova.
+
+    In ogni gruppo di conflitto la prima prenotazione è legittima, le altre
+    sono doppie prenotazioni.
+    """
+    ids = {r.pk for r in resources}
+    start = timezone.make_aware(datetime.combine(day, dtime(0, 0)))
+    groups = [
+        group for group in ConflictAnalysisService.iter_conflicts(date_from=start, date_to=start + timedelta(days=1))
+        if group['risorsa_id'] in ids
+    ]
+    return sum(len(group['prenotazioni']) - 1 for group in groups), len(groups)
+
+
+def summarize(results, wall_time, double_bookings, conflict_groups):
+    latencies = sorted(latency for _, latency, _ in results)
+    outcomes = Counter(outcome for outcome, _, _ in results)
+    total = len(results)
+    errors = Counter(error for _, _, error in results if error)
+    return {
+        'requests': total,
+        'created': outcomes['created'],
+        'rejected': outcomes['rejected'],
+        'errors': outcomes['error'],
+        'error_rate': round(outcomes['error'] / total, 4) if total else 0.0,
+        'throughput_rps': round(total / wall_time, 2) if wall_time > 0 else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'double_bookings': double_bookings,
+        'conflict_groups': conflict_groups,
+        'top_errors': [f'{count}x {message}' for message, count in errors.most_common(5)],
+    }
+
+
+def check_gate(summary, max_error_rate=DEFAULT_MAX_ERROR_RATE, max_double_bookings=DEFAULT_MAX_DOUBLE_BOOKINGS,
+               max_p95_ms=None):
+    """Restituisce la lista delle soglie superate (vuota se la prova passa)."""
+    failures = []
+    if summary['error_rate'] > max_error_rate:
+        failures.append(f"tasso di errore {summary['error_rate']:.2%} > {max_error_rate:.2%}")
+    if summary['double_bookings'] > max_double_bookings:
+        failures.append(f"doppie prenotazioni {summary['double_bookings']} > {max_double_bookings}")
+    if max_p95_ms is not None and summary['p95_ms'] > max_p95_ms:
+        failures.append(f"p95 {summary['p95_ms']:.1f}ms > {max_p95_ms:.1f}ms")
+    return failures
+
+
+def database_allowed(allow_real_db=False):
+    """True se la prova può scrivere sul database configurato."""
+    return bool(settings.DEBUG or allow_real_db)
+
+
+def run(target='view', teachers=50, laboratori=3, carrelli=1, concurrency=10, seed=DEFAULT_SEED,
+        prefix=DEFAULT_PREFIX, keep=False, allow_real_db=False):
+    """Prepara i dati, esegue la corsa, misura e ripulisce.
+
+    Senza `DEBUG` serve `allow_real_db=True`: la prova cancella gli utenti
+    `<prefix>_u*` e le risorse della prova sul database configurato.
+    """
+    if target not in TARGETS:
+        raise ValueError(f'Target non valido: {target}')
+    if not database_allowed(allow_real_db):
+        raise RuntimeError(
+            f"Prova di carico rifiutata: DEBUG è disattivo e il database "
+            f"'{connection.settings_dict.get('NAME')}' potrebbe essere quello reale"
+        )
+    synthetic.purge(prefix)
+    try:
+        users, resources = prepare(teachers, laboratori, carrelli, prefix)
+        day = rush_day()
+        results, wall_time = run_rush(build_jobs(users, resources, seed), target, concurrency, day)
+        double_bookings, groups = count_double_bookings(resources, day)
+        return summarize(results, wall_time, double_bookings, groups)
+    finally:
+        if not keep:
+            synthetic.purge(prefix)
@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prenotazioni import benchmarks, synthetic
+
+
+class Command(BaseCommand):
+    help = 'Misura latenza e query dei servizi critici su dataset sintetici e confronta con una baseline JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scala', action='append', choices=sorted(synthetic.SCALES), dest='scale',
+                            help='Scala del dataset (ripetibile, default: small)')
+        parser.add_argument('--ripetizioni', type=int, default=benchmarks.DEFAULT_REPEAT, dest='repeat')
+        parser.add_argument('--solo', action='append', choices=sorted(benchmarks.BENCHMARKS), dest='only',
+                            help='Esegue solo il percorso indicato (ripetibile)')
+        parser.add_argument('--seed', type=int, default=synthetic.DEFAULT_SEED)
+        parser.add_argument('--output', '-o', help='Salva il report JSON (es. come nuova baseline)')
+        parser.add_argument('--baseline', help='Report JSON con cui confrontare i risultati')
+        parser.add_argument('--tolleranza', type=float, default=benchmarks.DEFAULT_TOLERANCE, dest='tolerance',
+                            help='Rapporto massimo ammesso sul p95 rispetto alla baseline')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--ripetizioni deve essere almeno 1')
+        baseline = None
+        if options.get('baseline'):
+            try:
+                baseline = benchmarks.load(options['baseline'])
+            except (OSError, json.JSONDecodeError) as e:
+                raise CommandError(f'Baseline non leggibile: {e}')
+
+        scales = options.get('scale') or ['small']
+        report = benchmarks.run_suite(scales, repeat=options['repeat'], only=options.get('only'), seed=options['seed'])
+
+        for scale, data in report['scales'].items():
+            dataset = ', '.join(f'{k}={v}' for k, v in data['dataset'].items())
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{scale} ({dataset}; generato in {data["generation_s"]}s)'))
+            self.stdout.write(f'  {"percorso":<30} {"p50":>9} {"p95":>9} {"p99":>9} {"max":>9} {"query":>6}')
+            for name, result in data['results'].items():
+                if 'error' in result:
+                    self.stdout.write(self.style.ERROR(f'  {name:<30} {result["error"]}'))
+                    continue
+                self.stdout.write(
+                    f'  {name:<30} {result["p50"]:>9.2f} {result["p95"]:>9.2f} '
+                    f'{result["p99"]:>9.2f} {result["max"]:>9.2f} {result["queries"]:>6}'
+                )
+
+        if options.get('output'):
+            benchmarks.save(report, options['output'])
+            self.stdout.write(f'\nReport salvato in {options["output"]}')
+
+        if baseline is not None:
+            regressions = benchmarks.compare(report, baseline, tolerance=options['tolerance'])
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(self.style.ERROR(f'  REGRESSIONE {line}'))
+                raise CommandError(f'{len(regressions)} regressioni rispetto alla baseline')
+            self.stdout.write(self.style.SUCCESS('\nNessuna regressione rispetto alla baseline'))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from prenotazioni.services import ExportService
+from prenotazioni.utils import parse_date_strict
+
+
+class Command(BaseCommand):
+    help = 'Esporta in streaming (CSV o NDJSON) prenotazioni, log di sistema o notifiche'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(ExportService.DATASETS), help='Dati da esportare')
+        parser.add_argument('--formato', choices=ExportService.FORMATS, default='csv')
+        parser.add_argument('--dal', help='Data iniziale inclusa (YYYY-MM-DD)')
+        parser.add_argument('--al', help='Data finale inclusa (YYYY-MM-DD)')
+        parser.add_argument('--risorsa', type=int, help='ID risorsa')
+        parser.add_argument('--utente', type=int, help='ID utente')
+        parser.add_argument('--include-cancellate', action='store_true', help='Solo prenotazioni: include le cancellate')
+        parser.add_argument('--chunk-size', type=int, default=ExportService.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--output', '-o', help='File di destinazione (default: stdout)')
+
+    def handle(self, *args, **options):
+        dataset = options['dataset']
+        filters = {
+            'risorsa_id': options.get('risorsa'),
+            'utente_id': options.get('utente'),
+        }
+        for opt, key in (('dal', 'date_from'), ('al', 'date_to')):
+            if options.get(opt):
+                try:
+                    filters[key] = parse_date_strict(options[opt])
+                except ValueError:
+                    raise CommandError(f'Data non valida per --{opt}: {options[opt]}')
+        if dataset == 'prenotazioni':
+            filters['include_cancelled'] = options['include_cancellate']
+
+        try:
+            rows = ExportService.stream(dataset, fmt=options['formato'], chunk_size=options['chunk_size'], **filters)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        count = 0
+        out = open(options['output'], 'w', encoding='utf-8', newline='') if options.get('output') else None
+        try:
+            for line in rows:
+                if out:
+                    out.write(line)
+                else:
+                    self.stdout.write(line, ending='')
+                count += 1
+        finally:
+            if out:
+                out.close()
+
+        if options['formato'] == 'csv':
+            count -= 1  # intestazione
+        self.stderr.write(self.style.SUCCESS(f'Esportate {max(count, 0)} righe di {dataset}'))
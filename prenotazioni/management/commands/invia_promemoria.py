@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from prenotazioni.services import BookingReminderService
+
+
+class Command(BaseCommand):
+    help = 'Accoda i promemoria delle prenotazioni in arrivo (una volta, o in ciclo con --ciclo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orizzonti', help='Ore prima dell\'inizio separate da virgola (default: PROMEMORIA_ORIZZONTI_ORE)')
+        parser.add_argument('--ciclo', action='store_true', help='Resta attivo e ripete il passaggio a intervalli')
+        parser.add_argument('--intervallo', type=int, help='Secondi tra due passaggi (default: PROMEMORIA_INTERVALLO_SECONDI)')
+        parser.add_argument('--max-cicli', type=int, help='Con --ciclo, termina dopo questo numero di passaggi')
+        parser.add_argument('--batch-size', type=int, default=BookingReminderService.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Conta i promemoria dovuti senza accodarli')
+
+    def handle(self, *args, **options):
+        try:
+            hours = [float(h) for h in options['orizzonti'].split(',') if h.strip()] if options.get('orizzonti') else None
+            horizons = BookingReminderService.horizons(hours)
+        except ValueError as e:
+            raise CommandError(f'Orizzonti non validi: {e}')
+        interval = options.get('intervallo') or getattr(settings, 'PROMEMORIA_INTERVALLO_SECONDI', 300)
+        if interval < 1 or options['batch_size'] < 1:
+            raise CommandError('--intervallo e --batch-size devono essere almeno 1')
+
+        cycles = 0
+        while True:
+            started = time.monotonic()
+            try:
+                stats = BookingReminderService.run(horizons=horizons, batch_size=options['batch_size'],
+                                                   dry_run=options['dry_run'])
+            except Exception as e:
+                if not options['ciclo']:
+                    raise CommandError(f'Passaggio fallito: {e}')
+                # In modalità demone un errore (es. database non raggiungibile) non ferma il ciclo
+                self.stderr.write(self.style.ERROR(f'Passaggio fallito: {e}'))
+                stats = None
+            if stats is not None:
+                per_orizzonte = ', '.join(f'{k}={v}' for k, v in stats['per_orizzonte'].items())
+                verb = 'dovuti' if options['dry_run'] else 'accodati'
+                count = stats['dovuti'] if options['dry_run'] else stats['accodati']
+                self.stdout.write(f'{count} promemoria {verb} ({per_orizzonte}; senza email: {stats["senza_email"]}) '
+                                  f'in {time.monotonic() - started:.2f}s')
+
+            cycles += 1
+            if not options['ciclo'] or (options.get('max_cicli') and cycles >= options['max_cicli']):
+                break
+            close_old_connections()
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                break
@@ -0,0 +1,81 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prenotazioni import loadtest
+
+
+class Command(BaseCommand):
+    help = 'Prova di carico: molti docenti prenotano insieme il primo slot del mattino (gate di regressione)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', choices=loadtest.TARGETS, dest='targets',
+                            help='Percorso da provare: view (form HTML) o api (REST). Ripetibile, default: entrambi')
+        parser.add_argument('--docenti', type=int, default=50, dest='teachers')
+        parser.add_argument('--laboratori', type=int, default=3)
+        parser.add_argument('--carrelli', type=int, default=1)
+        parser.add_argument('--concorrenza', type=int, default=10, dest='concurrency', help='Thread paralleli')
+        parser.add_argument('--seed', type=int, default=loadtest.DEFAULT_SEED)
+        parser.add_argument('--max-errori', type=float, default=loadtest.DEFAULT_MAX_ERROR_RATE, dest='max_error_rate',
+                            help='Tasso di errore massimo (0-1)')
+        parser.add_argument('--max-doppie', type=int, default=loadtest.DEFAULT_MAX_DOUBLE_BOOKINGS,
+                            dest='max_double_bookings', help='Doppie prenotazioni ammesse')
+        parser.add_argument('--max-p95', type=float, dest='max_p95_ms', help='p95 massimo in millisecondi')
+        parser.add_argument('--output', '-o', help='Salva i risultati in JSON')
+        parser.add_argument('--mantieni', action='store_true', help='Non rimuove i dati della prova')
+        parser.add_argument('--consenti-db-reale', action='store_true', dest='allow_real_db',
+                            help='Esegue anche con DEBUG disattivo: crea e cancella dati sul database configurato')
+
+    def handle(self, *args, **options):
+        if options['teachers'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--docenti e --concorrenza devono essere almeno 1')
+        if options['laboratori'] + options['carrelli'] < 1:
+            raise CommandError('Serve almeno una risorsa')
+        if not loadtest.database_allowed(options['allow_real_db']):
+            raise CommandError(
+                'DEBUG è disattivo: la prova crea e cancella utenti e risorse sul database configurato. '
+                'Usare --consenti-db-reale solo su un database di prova.'
+            )
+
+        report, failures = {}, []
+        for target in options.get('targets') or loadtest.TARGETS:
+            summary = loadtest.run(
+                target=target,
+                teachers=options['teachers'],
+                laboratori=options['laboratori'],
+                carrelli=options['carrelli'],
+                concurrency=options['concurrency'],
+                seed=options['seed'],
+                keep=options['mantieni'],
+                allow_real_db=options['allow_real_db'],
+            )
+            report[target] = summary
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{target} ({options["concurrency"]} thread)'))
+            self.stdout.write(
+                f'  richieste {summary["requests"]}: create {summary["created"]}, '
+                f'rifiutate {summary["rejected"]}, errori {summary["errors"]} ({summary["error_rate"]:.2%})'
+            )
+            self.stdout.write(f'  throughput {summary["throughput_rps"]} req/s')
+            self.stdout.write(
+                f'  latenza p50 {summary["p50_ms"]}ms, p95 {summary["p95_ms"]}ms, '
+                f'p99 {summary["p99_ms"]}ms, max {summary["max_ms"]}ms'
+            )
+            self.stdout.write(f'  doppie prenotazioni {summary["double_bookings"]} in {summary["conflict_groups"]} gruppi')
+            for line in summary['top_errors']:
+                self.stdout.write(self.style.WARNING(f'  {line}'))
+
+            for failure in loadtest.check_gate(summary, options['max_error_rate'],
+                                               options['max_double_bookings'], options.get('max_p95_ms')):
+                failures.append(f'{target}: {failure}')
+
+        if options.get('output'):
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, indent=2)
+                fh.write('\n')
+
+        if failures:
+            for line in failures:
+                self.stderr.write(self.style.ERROR(f'  {line}'))
+            raise CommandError(f'Prova di carico fallita: {len(failures)} soglie superate')
+        self.stdout.write(self.style.SUCCESS('\nProva di carico superata'))
@@ -1,5 +1,9 @@
 import csv
+import os
+import time
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from prenotazioni.models import UbicazioneRisorsa
 
 
@@ -12,81 +16,119 @@ class Command(BaseCommand):
             action='store_true',
             help='Mostra cosa verrebbe fatto senza apportare modifiche',
         )
+        parser.add_argument(
+            '--csv',
+            dest='csv_path',
+            default=os.path.join(settings.BASE_DIR, 'backups', 'scuole_anagrafe.csv'),
+            help='Percorso del CSV (default: backups/scuole_anagrafe.csv)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Numero di righe per ogni INSERT/UPDATE multiplo',
+        )
 
     def handle(self, *args, **options):
         dry_run = options.get('dry_run', False)
-        csv_path = 'backups/scuole_anagrafe.csv'
-        
-        try:
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                rows = list(csv.DictReader(f))
-        except FileNotFoundError:
+        csv_path = options['csv_path']
+        batch_size = max(1, options['batch_size'])
+        verbose = options.get('verbosity', 1) >= 2
+
+        if not os.path.exists(csv_path):
             self.stdout.write(
                 self.style.ERROR(f'File {csv_path} non trovato')
             )
             return
 
-        self.stdout.write(f'Caricato CSV con {len(rows)} righe')
-
-        # Processa i dati: deduplicati per CODICESCUOLA per ottenere plessi unici
-        seen_codes = set()
-        unique_scuole = {}
-        
-        for row in rows:
-            codice = row['CODICESCUOLA'].strip()
-            if codice and codice not in seen_codes:
-                seen_codes.add(codice)
-                unique_scuole[codice] = row
+        started = time.monotonic()
 
-        self.stdout.write(f'Trovati {len(unique_scuole)} plessi unici nel CSV')
+        # Una sola query per conoscere i plessi già presenti: codice -> (pk, nome)
+        existing = {
+            codice: (pk, nome)
+            for pk, codice, nome in UbicazioneRisorsa.objects.exclude(
+                codice_meccanografico=''
+            ).order_by().values_list('pk', 'codice_meccanografico', 'nome').iterator(chunk_size=5000)
+        }
+        self.stdout.write(f'Plessi già presenti nel DB: {len(existing)}')
 
-        updates_count = 0
+        rows_read = 0
+        seen_codes = set()
+        to_create = []
+        to_update = []
         created_count = 0
+        updates_count = 0
+        unchanged_count = 0
 
-        for codice, data in unique_scuole.items():
-            nome = data.get('DENOMINAZIONESCUOLA', '').strip()[:100]
-            comune = data.get('DESCRIZIONECOMUNE', '').strip()
-            provincia = data.get('PROVINCIA', '').strip()
-            indirizzo = data.get('INDIRIZZOSCUOLA', '').strip()
+        def flush():
+            if dry_run:
+                to_create.clear()
+                to_update.clear()
+                return
+            if to_create:
+                # update_conflicts rende il caricamento idempotente anche se un
+                # altro processo ha inserito lo stesso codice nel frattempo.
+                UbicazioneRisorsa.objects.bulk_create(
+                    to_create,
+                    update_conflicts=True,
+                    unique_fields=['codice_meccanografico'],
+                    update_fields=['nome'],
+                )
+                to_create.clear()
+            if to_update:
+                UbicazioneRisorsa.objects.bulk_update(to_update, ['nome'])
+                to_update.clear()
 
-            # Prova a trovare record esistente per codice
-            ubicazione = UbicazioneRisorsa.objects.filter(
-                codice_meccanografico=codice
-            ).first()
+        with transaction.atomic():
+            with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+                # Lettura in streaming: nessuna lista con tutte le righe in memoria
+                for row in csv.DictReader(f):
+                    rows_read += 1
+                    codice = (row.get('CODICESCUOLA') or '').strip()
+                    # Deduplica per CODICESCUOLA per ottenere plessi unici
+                    if not codice or codice in seen_codes:
+                        continue
+                    seen_codes.add(codice)
 
-            if ubicazione:
-                # Aggiorna solo se nome è diverso
-                if ubicazione.nome != nome:
-                    ubicazione.nome = nome
-                    if not dry_run:
-                        ubicazione.save()
-                    updates_count += 1
-                    self.stdout.write(
-                        self.style.WARNING(f'Aggiornato: {codice} - {nome}')
-                    )
-            else:
-                # Crea nuovo record con i campi obbligatori
-                if not dry_run:
-                    try:
-                        UbicazioneRisorsa.objects.create(
+                    nome = (row.get('DENOMINAZIONESCUOLA') or '').strip()[:100]
+                    comune = (row.get('DESCRIZIONECOMUNE') or '').strip()
+
+                    if codice in existing:
+                        pk, nome_attuale = existing[codice]
+                        # Aggiorna solo se nome è diverso
+                        if nome_attuale == nome:
+                            unchanged_count += 1
+                            continue
+                        to_update.append(UbicazioneRisorsa(pk=pk, nome=nome))
+                        updates_count += 1
+                        if verbose:
+                            self.stdout.write(self.style.WARNING(f'Aggiornato: {codice} - {nome}'))
+                    else:
+                        # Crea nuovo record con i campi obbligatori
+                        to_create.append(UbicazioneRisorsa(
                             nome=nome,
                             codice_meccanografico=codice,
                             edificio=comune or 'Sede',
                             piano='1',
                             aula=nome[:50] if nome else 'Aula',
-                        )
+                        ))
                         created_count += 1
-                        if created_count % 500 == 0:
-                            self.stdout.write(f'  Creati {created_count}...')
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(f'Errore per {codice}: {e}')
-                        )
-                else:
-                    created_count += 1
+                        if verbose:
+                            self.stdout.write(f'Nuovo: {codice} - {nome}')
+
+                    if len(to_create) >= batch_size or len(to_update) >= batch_size:
+                        flush()
+                        self.stdout.write(f'  Elaborate {rows_read} righe...')
+            flush()
+
+        elapsed = time.monotonic() - started
+        rate = rows_read / elapsed if elapsed > 0 else 0
 
         mode = 'DRY RUN' if dry_run else 'ESEGUITO'
         self.stdout.write(self.style.SUCCESS(f'\n{mode}:'))
+        self.stdout.write(f'  Righe CSV lette: {rows_read} ({len(seen_codes)} plessi unici)')
         self.stdout.write(f'  Creati: {created_count}')
         self.stdout.write(f'  Aggiornati: {updates_count}')
+        self.stdout.write(f'  Invariati: {unchanged_count}')
+        self.stdout.write(f'  Tempo: {elapsed:.2f}s ({rate:.0f} righe/s)')
         self.stdout.write(f'  Total in DB: {UbicazioneRisorsa.objects.count()}')
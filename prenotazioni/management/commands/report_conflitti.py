@@ -0,0 +1,49 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from prenotazioni.services import ConflictAnalysisService
+from prenotazioni.utils import as_aware_datetime, parse_date_strict
+
+
+class Command(BaseCommand):
+    help = 'Rileva tutte le prenotazioni sovrapposte (o oltre capacità per i carrelli) con un unico passaggio sweep-line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dal', help='Data iniziale inclusa (YYYY-MM-DD)')
+        parser.add_argument('--al', help='Data finale inclusa (YYYY-MM-DD)')
+        parser.add_argument('--risorsa', type=int, help='Analizza solo questa risorsa (ID)')
+        parser.add_argument('--formato', choices=('testo', 'json'), default='testo')
+
+    def handle(self, *args, **options):
+        filters = {'risorsa_id': options.get('risorsa')}
+        for opt, key in (('dal', 'date_from'), ('al', 'date_to')):
+            if options.get(opt):
+                try:
+                    parsed = parse_date_strict(options[opt])
+                except ValueError:
+                    raise CommandError(f'Data non valida per --{opt}: {options[opt]}')
+                if opt == 'al':
+                    # Intervallo semiaperto: il giorno finale è incluso per intero
+                    parsed += timedelta(days=1)
+                filters[key] = as_aware_datetime(parsed)
+
+        started = time.monotonic()
+        groups = 0
+        for group in ConflictAnalysisService.iter_conflicts(**filters):
+            groups += 1
+            if options['formato'] == 'json':
+                self.stdout.write(json.dumps(group, cls=DjangoJSONEncoder, ensure_ascii=False))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"{group['risorsa']} (ID {group['risorsa_id']}): "
+                    f"{group['inizio']:%d/%m/%Y %H:%M} - {group['fine']:%d/%m/%Y %H:%M}, "
+                    f"picco {group['picco']}/{group['limite']}, "
+                    f"prenotazioni {', '.join(str(pk) for pk in group['prenotazioni'])}"
+                ))
+
+        elapsed = time.monotonic() - started
+        summary = f'{groups} gruppi in conflitto ({elapsed:.2f}s)'
+        self.stderr.write(self.style.SUCCESS(summary) if not groups else self.style.ERROR(summary))
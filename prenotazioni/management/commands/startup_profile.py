@@ -0,0 +1,68 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prenotazioni import startup
+
+
+class Command(BaseCommand):
+    help = ("Misura il cold start in un interprete nuovo: import per modulo (-X importtime), "
+            "django.setup(), handler WSGI e prima richiesta. Con --controlli esegue i controlli di avvio")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=startup.DEFAULT_URL, help='Percorso della prima richiesta')
+        parser.add_argument('--top', type=int, default=startup.DEFAULT_TOP, help='Moduli più lenti da mostrare')
+        parser.add_argument('--prefisso', action='append', dest='prefixes',
+                            help='Mostra solo i moduli con questo prefisso (ripetibile, es. prenotazioni)')
+        parser.add_argument('--json', action='store_true', help='Stampa il report completo in JSON')
+        parser.add_argument('--controlli', action='store_true',
+                            help='Esegue solo i controlli di avvio (database, superuser) ed esce')
+
+    def handle(self, *args, **options):
+        if options['controlli']:
+            return self._checks()
+
+        try:
+            report = startup.profile(url=options['url'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        if options['json']:
+            report['modules'] = {name: list(values) for name, values in report['modules'].items()}
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+            return
+
+        t = report['timings']
+        self.stdout.write(self.style.MIGRATE_HEADING('Avvio a freddo'))
+        self.stdout.write(f'  django.setup()          {t["setup_s"] * 1000:9.1f} ms')
+        self.stdout.write(f'  handler WSGI            {t["wsgi_s"] * 1000:9.1f} ms')
+        self.stdout.write(f'  prima richiesta         {t["first_request_s"] * 1000:9.1f} ms  ({report["url"]} -> {t["status"]})')
+        self.stdout.write(f'  seconda richiesta       {t["second_request_s"] * 1000:9.1f} ms')
+        self.stdout.write(f'  fino alla 1a risposta   {t["total_s"] * 1000:9.1f} ms  (processo: {report["process_s"] * 1000:.0f} ms)')
+
+        packages = sorted(report['packages'].items(), key=lambda item: -item[1])
+        self.stdout.write(self.style.MIGRATE_HEADING('\nImport per pacchetto (tempo proprio)'))
+        for name, own in packages[:10]:
+            self.stdout.write(f'  {name:<40} {own / 1000:9.1f} ms')
+        for name in startup.APP_PACKAGES:
+            if name in report['packages'] and name not in dict(packages[:10]):
+                self.stdout.write(f'  {name:<40} {report["packages"][name] / 1000:9.1f} ms')
+
+        modules = report['modules'].items()
+        if options.get('prefixes'):
+            modules = [(name, values) for name, values in modules
+                       if any(name == p or name.startswith(p + '.') for p in options['prefixes'])]
+        slowest = sorted(modules, key=lambda item: -item[1][1])[:max(0, options['top'])]
+        self.stdout.write(self.style.MIGRATE_HEADING('\nModuli più lenti (cumulativo / proprio)'))
+        for name, (own, cumulative) in slowest:
+            self.stdout.write(f'  {name:<50} {cumulative / 1000:9.1f} ms {own / 1000:9.1f} ms')
+
+    def _checks(self):
+        failed = 0
+        for name, ok, detail in startup.run_checks():
+            style = self.style.SUCCESS if ok else self.style.WARNING
+            self.stdout.write(style(f'{name}: {detail}'))
+            if not ok and name in ('database', 'conteggi'):
+                failed += 1
+        if failed:
+            raise CommandError('Controlli di avvio falliti')
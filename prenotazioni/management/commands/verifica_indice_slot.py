@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from prenotazioni import slot_index
+from prenotazioni.utils import parse_date_strict
+
+
+class Command(BaseCommand):
+    help = "Confronta l'indice di disponibilità per ora di lezione con gli intervalli esatti delle prenotazioni"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--da', help='Primo giorno (YYYY-MM-DD, default: oggi)')
+        parser.add_argument('--a', help='Ultimo giorno (YYYY-MM-DD, default: tra 14 giorni)')
+        parser.add_argument('--ripara', action='store_true', help='Riscrive i giorni non coerenti')
+        parser.add_argument('--ricostruisci', action='store_true',
+                            help='Ricostruisce dal database anche i giorni non in cache')
+
+    def _date(self, value, default):
+        if not value:
+            return default
+        try:
+            return parse_date_strict(value)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        da = self._date(options.get('da'), today)
+        a = self._date(options.get('a'), today + timedelta(days=14))
+        if a < da:
+            raise CommandError('--a precede --da')
+        if not slot_index.enabled():
+            self.stdout.write(self.style.WARNING('SLOT_INDEX_ENABLED non è attivo: si verifica solo il contenuto della cache'))
+        if 'locmem' in settings.CACHES['default']['BACKEND'].lower():
+            self.stdout.write(self.style.WARNING('Cache locale al processo: questo comando non vede l\'indice dei worker web'))
+
+        mismatches = slot_index.verify(da, a, repair=options['ripara'])
+        periodi = slot_index.periods()
+        for giorno, periodo, extra, missing in mismatches:
+            if periodo is None:
+                self.stdout.write(self.style.ERROR(f'  {giorno}: numero di periodi diverso dalla configurazione'))
+                continue
+            start, end = periodi[periodo]
+            self.stdout.write(self.style.ERROR(
+                f'  {giorno} {start:%H:%M}-{end:%H:%M}: occupati in più {extra or "-"}, mancanti {missing or "-"}'
+            ))
+
+        if options['ricostruisci']:
+            giorno = da
+            while giorno <= a:
+                slot_index.get_day(giorno)
+                giorno += timedelta(days=1)
+            self.stdout.write(f'Indice costruito dal {da} al {a}')
+
+        if mismatches and not options['ripara']:
+            raise CommandError(f'{len(mismatches)} periodi non coerenti con le prenotazioni')
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'{len(mismatches)} periodi non coerenti, riparati'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Indice coerente dal {da} al {a}'))
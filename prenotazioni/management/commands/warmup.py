@@ -0,0 +1,27 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prenotazioni import warmup
+
+
+class Command(BaseCommand):
+    help = 'Esegue i passi di warm-up dei worker (resolver, template, configurazione, query) e ne stampa i tempi'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, help='Tempo massimo in secondi (default: WARMUP_BUDGET_SECONDS)')
+        parser.add_argument('--solo', action='append', choices=[name for name, _ in warmup.STEPS], dest='only',
+                            help='Esegue solo il passo indicato (ripetibile)')
+        parser.add_argument('--json', action='store_true', help='Stampa il report in JSON')
+
+    def handle(self, *args, **options):
+        report = warmup.run(budget=options.get('budget'), only=options.get('only'))
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for step in report['steps']:
+                style = {'ok': self.style.SUCCESS, 'saltato': self.style.WARNING}.get(step['status'], self.style.ERROR)
+                self.stdout.write(style(f"  {step['step']:<20} {step['status']:<8} {step['ms']:9.1f} ms  {step['detail']}"))
+            self.stdout.write(f"Totale {report['total_ms']:.1f} ms (budget {report['budget_ms']:.0f} ms)")
+        if any(step['status'] == 'errore' for step in report['steps']):
+            raise CommandError('Alcuni passi di warm-up sono falliti')
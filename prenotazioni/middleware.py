@@ -1,3 +1,9 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
 from django.shortcuts import redirect
 from django.urls import reverse, resolve, Resolver404
 from django.utils import timezone
@@ -85,3 +91,179 @@ class ForcePasswordChangeMiddleware:
             pass
 
         return self.get_response(request)
+
+
+# =====================================================
+# PROFILAZIONE QUERY PER RICHIESTA
+# =====================================================
+
+_MISSING = object()
+
+profiling_logger = logging.getLogger('prenotazioni.profiling')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Sollevata in modalità strict (test) quando una view supera il budget di query."""
+
+
+class RequestProfile:
+    """Metriche raccolte durante una singola richiesta."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_query(self, sql, params, duration):
+        self.sql_count += 1
+        self.sql_time += duration
+        try:
+            self.statements[(sql, repr(params))] += 1
+        except Exception:
+            self.statements[(sql, None)] += 1
+
+    @property
+    def duplicates(self):
+        """Query identiche (stesso SQL e parametri) eseguite più di una volta."""
+        return sum(n - 1 for n in self.statements.values() if n > 1)
+
+    def summary(self, view_name=None, status=None):
+        return {
+            'view': view_name,
+            'status': status,
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'sql_duplicates': self.duplicates,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+        }
+
+
+@contextmanager
+def _count_cache_hits(profile):
+    """Conta hit/miss di `get`/`get_many` nel `profile` per la durata del blocco.
+
+    Avvolge le istanze di cache del contesto corrente (`caches` ne tiene una
+    per thread) con attributi d'istanza rimossi all'uscita: le classi dei
+    backend non vengono toccate e le richieste non profilate non passano
+    dal wrapper. Gli argomenti extra dei backend (es. `client=` di
+    django-redis) vengono inoltrati così come sono.
+    """
+    from django.core.cache import caches
+
+    wrapped = []
+    # I `get_many` di base chiamano `get` per ogni chiave: contati una volta sola
+    nested = [0]
+    for backend in caches.all():
+        if 'get' in vars(backend):
+            continue
+        original_get, original_get_many = backend.get, backend.get_many
+
+        def get(key, default=None, *args, _original=original_get, **kwargs):
+            value = _original(key, _MISSING, *args, **kwargs)
+            if nested[0]:
+                return default if value is _MISSING else value
+            if value is _MISSING:
+                profile.cache_misses += 1
+                return default
+            profile.cache_hits += 1
+            return value
+
+        def get_many(keys, *args, _original=original_get_many, **kwargs):
+            keys = list(keys)
+            nested[0] += 1
+            try:
+                result = _original(keys, *args, **kwargs)
+            finally:
+                nested[0] -= 1
+            profile.cache_hits += len(result)
+            profile.cache_misses += len(keys) - len(result)
+            return result
+
+        backend.get, backend.get_many = get, get_many
+        wrapped.append(backend)
+    try:
+        yield
+    finally:
+        for backend in wrapped:
+            del backend.get, backend.get_many
+
+
+class QueryBudgetMiddleware:
+    """Profilazione opzionale di query SQL, cache e tempo per richiesta.
+
+    Attiva se `QUERY_PROFILING_ENABLED` è True oppure, per gli utenti staff,
+    se la richiesta contiene l'header `X-Profile-Queries`. Le metriche vanno
+    nell'header `Server-Timing` e in una riga di log JSON su
+    `prenotazioni.profiling`.
+
+    `QUERY_BUDGETS` associa nomi di view (`namespace:nome`) al numero massimo
+    di query; se superato viene loggato un warning, oppure sollevato
+    `QueryBudgetExceeded` se `QUERY_BUDGET_STRICT` è True (utile nei test).
+    """
+
+    HEADER = 'HTTP_X_PROFILE_QUERIES'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _is_enabled(self, request):
+        from django.conf import settings
+        if getattr(settings, 'QUERY_PROFILING_ENABLED', False):
+            return True
+        if self.HEADER in request.META:
+            user = getattr(request, 'user', None)
+            return bool(user and user.is_authenticated and user.is_staff)
+        return False
+
+    def __call__(self, request):
+        if not self._is_enabled(request):
+            return self.get_response(request)
+
+        from django.db import connections
+
+        profile = RequestProfile()
+
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                profile.record_query(sql, params, time.perf_counter() - started)
+
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(wrapper))
+            stack.enter_context(_count_cache_hits(profile))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        data = self._report(profile.summary(view_name, response.status_code), request, response)
+        self._check_budget(data)
+        return response
+
+    def _report(self, data, request, response):
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={data["sql_ms"]};desc="SQL ({data["sql_count"]})"',
+            f'dbdup;desc="SQL duplicate ({data["sql_duplicates"]})"',
+            f'cache;desc="Cache hit {data["cache_hits"]} / miss {data["cache_misses"]}"',
+            f'total;dur={data["total_ms"]}',
+        ])
+        profiling_logger.info(json.dumps({'path': request.path, 'method': request.method, **data}))
+        return data
+
+    def _check_budget(self, data):
+        from django.conf import settings
+        budgets = getattr(settings, 'QUERY_BUDGETS', {}) or {}
+        budget = budgets.get(data['view'])
+        if budget is None or data['sql_count'] <= budget:
+            return
+        message = f"Budget query superato per {data['view']}: {data['sql_count']} > {budget}"
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        profiling_logger.warning(message)
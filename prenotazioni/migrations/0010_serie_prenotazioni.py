@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prenotazioni', '0009_alter_passwordhistory_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeriePrenotazioni',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('giorni_settimana', models.JSONField(default=list, help_text='Giorni della settimana (0 = lunedì ... 6 = domenica)')),
+                ('intervallo_settimane', models.PositiveSmallIntegerField(default=1, help_text='1 = ogni settimana, 2 = a settimane alterne')),
+                ('data_inizio', models.DateField()),
+                ('data_fine', models.DateField()),
+                ('ora_inizio', models.TimeField()),
+                ('ora_fine', models.TimeField()),
+                ('eccezioni', models.JSONField(blank=True, default=list, help_text='Date (YYYY-MM-DD) escluse dalla serie')),
+                ('quantita', models.PositiveIntegerField(default=1)),
+                ('scopo', models.CharField(blank=True, max_length=200)),
+                ('note', models.TextField(blank=True)),
+                ('creato_il', models.DateTimeField(auto_now_add=True)),
+                ('modificato_il', models.DateTimeField(auto_now=True)),
+                ('cancellato_il', models.DateTimeField(blank=True, null=True)),
+                ('risorsa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='serie_prenotazioni', to='prenotazioni.risorsa')),
+                ('utente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='serie_prenotazioni', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Serie Prenotazioni',
+                'verbose_name_plural': 'Serie Prenotazioni',
+                'ordering': ['-data_inizio'],
+            },
+        ),
+        migrations.AddField(
+            model_name='prenotazione',
+            name='serie',
+            field=models.ForeignKey(blank=True, help_text='Serie ricorrente di appartenenza, se presente', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occorrenze', to='prenotazioni.serieprenotazioni'),
+        ),
+    ]
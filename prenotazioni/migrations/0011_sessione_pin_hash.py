@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def hash_pending_pins(apps, schema_editor):
+    """Sostituisce con l'hash i PIN in chiaro delle sessioni ancora in attesa."""
+    from django.utils.crypto import get_random_string, salted_hmac
+
+    SessioneUtente = apps.get_model('prenotazioni', 'SessioneUtente')
+    pending = SessioneUtente.objects.filter(stato_sessione='in_attesa').exclude(pin_sessione='')
+    for session in pending.exclude(pin_sessione__startswith='hmac-sha256$').only('id', 'pin_sessione'):
+        salt = get_random_string(16)
+        digest = salted_hmac(salt, session.pin_sessione, algorithm='sha256').hexdigest()
+        SessioneUtente.objects.filter(pk=session.pk).update(pin_sessione=f'hmac-sha256${salt}${digest}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prenotazioni', '0010_serie_prenotazioni'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sessioneutente',
+            name='pin_sessione',
+            field=models.CharField(blank=True, help_text='Hash con sale del PIN di verifica', max_length=128, verbose_name='PIN Sessione'),
+        ),
+        migrations.AddIndex(
+            model_name='sessioneutente',
+            index=models.Index(condition=models.Q(('stato_sessione', 'in_attesa')), fields=['data_scadenza_sessione'], name='sessione_attesa_scad_idx'),
+        ),
+        migrations.RunPython(hash_pending_pins, reverse_code=migrations.RunPython.noop),
+    ]
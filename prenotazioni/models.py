@@ -11,11 +11,16 @@ Ristrutturazione completa del database con miglioramenti architetturali:
 - Gestione notifiche avanzata
 """
 
+from dataclasses import dataclass, fields
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 import uuid
-from django.db.models.signals import post_save, post_delete, post_migrate
+from django.db.models.signals import m2m_changed, post_save, post_delete, post_migrate
 from django.dispatch import receiver
 import logging
 
@@ -138,6 +143,38 @@ class ConfigurazioneSistema(models.Model):
             return default
 
 
+@dataclass(frozen=True)
+class SnapshotScuola:
+    """Copia immutabile di `InformazioniScuola`, condivisibile tra thread.
+
+    È quella usata da template ed email: non fa query e non può essere
+    modificata per errore da una richiesta.
+    """
+    id: int
+    nome_completo_scuola: str
+    nome_breve_scuola: str
+    codice_meccanografico_scuola: str
+    partita_iva_scuola: str
+    sito_web_scuola: str
+    email_istituzionale_scuola: str
+    telefono_scuola: str
+    fax_scuola: str
+    indirizzo_scuola: str
+    codice_postale_scuola: str
+    comune_scuola: str
+    provincia_scuola: str
+    regione_scuola: str
+    nazione_scuola: str
+    latitudine_scuola: Optional[Decimal]
+    longitudine_scuola: Optional[Decimal]
+    scuola_attiva: bool
+    data_modifica_scuola: Optional[datetime]
+    indirizzo_completo_scuola: str
+
+    def __str__(self):
+        return self.nome_breve_scuola or self.nome_completo_scuola
+
+
 class InformazioniScuola(models.Model):
     """
     Informazioni complete sulla scuola.
@@ -240,12 +277,70 @@ class InformazioniScuola(models.Model):
     def __str__(self):
         return self.nome_breve_scuola or self.nome_completo_scuola
 
+    # Snapshot in cache: condivisa tra processi (cache di Django) e copia
+    # locale al processo per `SNAPSHOT_TTL_LOCALE` secondi, così le letture
+    # ripetute (context processor, email in blocco) non costano nulla.
+    SNAPSHOT_CACHE_KEY = 'informazioni_scuola:v1'
+    SNAPSHOT_TTL_LOCALE = 30
+    _snapshot_locale = None  # (scadenza monotonic, snapshot o None)
+
     @classmethod
     def ottieni_istanza(cls):
-        """Ottiene l'unica istanza della scuola."""
+        """Ottiene l'unica istanza della scuola (modificabile; per la sola lettura usare `ottieni_snapshot`)."""
         instance, creata = cls.objects.get_or_create(id=1)
         return instance
 
+    def crea_snapshot(self):
+        valori = {f.name: getattr(self, f.name) for f in fields(SnapshotScuola)}
+        return SnapshotScuola(**valori)
+
+    @classmethod
+    def ottieni_snapshot(cls):
+        """Snapshot immutabile della scuola, o None se non è ancora configurata.
+
+        Non crea righe: a differenza di `ottieni_istanza` è sicuro da
+        chiamare in template, email e warm-up.
+        """
+        import time
+        from django.core.cache import cache
+
+        locale = cls._snapshot_locale
+        now = time.monotonic()
+        if locale is not None and locale[0] > now:
+            return locale[1]
+
+        cached = cache.get(cls.SNAPSHOT_CACHE_KEY)
+        if cached is None:
+            instance = cls.objects.filter(id=1).first()
+            # False distingue "nessuna scuola" da una chiave mancante
+            cached = instance.crea_snapshot() if instance else False
+            cache.set(cls.SNAPSHOT_CACHE_KEY, cached, None)
+        snapshot = cached or None
+        cls._snapshot_locale = (now + cls.SNAPSHOT_TTL_LOCALE, snapshot)
+        return snapshot
+
+    @classmethod
+    def invalida_snapshot(cls):
+        """Scarta la snapshot; gli altri processi la rileggono entro `SNAPSHOT_TTL_LOCALE`."""
+        from django.core.cache import cache
+
+        cls._snapshot_locale = None
+        cache.delete(cls.SNAPSHOT_CACHE_KEY)
+
+    def save(self, *args, **kwargs):
+        from django.db import transaction
+
+        super().save(*args, **kwargs)
+        # Dopo il commit: prima una lettura concorrente rimetterebbe in cache i dati vecchi
+        transaction.on_commit(InformazioniScuola.invalida_snapshot)
+
+    def delete(self, *args, **kwargs):
+        from django.db import transaction
+
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(InformazioniScuola.invalida_snapshot)
+        return result
+
     @property
     def indirizzo_completo_scuola(self):
         """Indirizzo formattato completo."""
@@ -496,10 +591,10 @@ class SessioneUtente(models.Model):
         verbose_name='Token Sessone Unico'
     )
     pin_sessione = models.CharField(
-        max_length=6,
+        max_length=128,
         blank=True,
         verbose_name='PIN Sessione',
-        help_text='Per verifiche PIN'
+        help_text='Hash con sale del PIN di verifica'
     )
 
     # RIMOSSO: i seguenti campi erano duplicati da User + ProfiloUtente
@@ -510,7 +605,60 @@ class SessioneUtente(models.Model):
     # - codice_fiscale_utente (usa ProfiloUtente.codice_fiscale)
     # - telefono_utente (usa ProfiloUtente.telefono)
     # - email_personale_utente (usa User.email)
-    
+
+    PIN_HASH_PREFIX = 'hmac-sha256'
+
+    class Meta:
+        indexes = [
+            # Solo le sessioni in attesa vengono verificate o fatte scadere:
+            # l'indice parziale resta piccolo anche con anni di storico.
+            models.Index(
+                fields=['data_scadenza_sessione'],
+                condition=models.Q(stato_sessione='in_attesa'),
+                name='sessione_attesa_scad_idx',
+            ),
+        ]
+
+    @classmethod
+    def hash_pin(cls, pin):
+        """Hash del PIN con sale casuale e SECRET_KEY, nel formato `prefisso$sale$hash`.
+
+        Un HMAC e non `make_password`: il PIN scade in poche ore e la
+        verifica deve restare veloce.
+        """
+        from django.utils.crypto import get_random_string, salted_hmac
+
+        salt = get_random_string(16)
+        digest = salted_hmac(salt, str(pin), algorithm='sha256').hexdigest()
+        return f'{cls.PIN_HASH_PREFIX}${salt}${digest}'
+
+    def pin_corretto(self, pin):
+        """Confronto a tempo costante del PIN con quello salvato (anche in chiaro, per le sessioni precedenti)."""
+        from django.utils.crypto import constant_time_compare, salted_hmac
+
+        if not self.pin_sessione:
+            return True
+        if pin is None:
+            return False
+        prefix, _, rest = self.pin_sessione.partition('$')
+        if prefix != self.PIN_HASH_PREFIX:
+            return constant_time_compare(str(pin), self.pin_sessione)
+        salt, _, digest = rest.partition('$')
+        return constant_time_compare(salted_hmac(salt, str(pin), algorithm='sha256').hexdigest(), digest)
+
+    def save(self, *args, **kwargs):
+        if self.pin_sessione and not self.pin_sessione.startswith(self.PIN_HASH_PREFIX + '$'):
+            self.pin_sessione = self.hash_pin(self.pin_sessione)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def in_attesa_valide(cls, now=None):
+        """Sessioni ancora verificabili: in attesa e non scadute."""
+        now = now or timezone.now()
+        return cls.objects.filter(stato_sessione='in_attesa').filter(
+            models.Q(data_scadenza_sessione__isnull=True) | models.Q(data_scadenza_sessione__gt=now)
+        )
+
     @property
     def sessione_scaduta(self):
         # Restituisce True se la sessione è scaduta. Se la data di scadenza
@@ -528,18 +676,24 @@ class SessioneUtente(models.Model):
         if not self.sessione_valida:
             return False, "Sessione non valida o scaduta"
 
-        if self.pin_sessione and pin != self.pin_sessione:
+        if not self.pin_corretto(pin):
             return False, "PIN non corretto"
 
+        # Transizione atomica: con due verifiche concorrenti una sola
+        # trova ancora la riga in attesa e non scaduta.
+        now = timezone.now()
+        if not SessioneUtente.in_attesa_valide(now).filter(pk=self.pk).update(
+            stato_sessione='verificato', data_verifica_sessione=now
+        ):
+            return False, "Sessione non valida o scaduta"
         self.stato_sessione = 'verificato'
-        self.data_verifica_sessione = timezone.now()
-        self.save()
+        self.data_verifica_sessione = now
         return True, "Verifica completata con successo"
 
     def scadenza_sessione(self):
         """Scadenza manuale della sessione."""
+        SessioneUtente.objects.filter(pk=self.pk).update(stato_sessione='scaduto')
         self.stato_sessione = 'scaduto'
-        self.save()
 
 
 # =====================================================
@@ -745,7 +899,7 @@ class Dispositivo(models.Model):
     @property
     def needs_maintenance(self):
         if self.prossima_manutenzione:
-            return timezone.now().date() >= self.prossima_manutenzione
+            return timezone.now() >= self.prossima_manutenzione
         return False
 
 
@@ -928,6 +1082,62 @@ class StatoPrenotazione(models.Model):
         return self.nome
 
 
+class SeriePrenotazioni(models.Model):
+    """
+    Serie di prenotazioni ricorrenti, con una regola in stile RRULE settimanale.
+
+    Le occorrenze sono normali `Prenotazione` collegate tramite `serie`;
+    la serie conserva la regola (giorni, intervallo, periodo, eccezioni)
+    per poterle modificare o annullare tutte insieme.
+    """
+    utente = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='serie_prenotazioni'
+    )
+    risorsa = models.ForeignKey(
+        'Risorsa',
+        on_delete=models.CASCADE,
+        related_name='serie_prenotazioni'
+    )
+
+    # Regola di ricorrenza
+    giorni_settimana = models.JSONField(
+        default=list,
+        help_text='Giorni della settimana (0 = lunedì ... 6 = domenica)'
+    )
+    intervallo_settimane = models.PositiveSmallIntegerField(
+        default=1,
+        help_text='1 = ogni settimana, 2 = a settimane alterne'
+    )
+    data_inizio = models.DateField()
+    data_fine = models.DateField()
+    ora_inizio = models.TimeField()
+    ora_fine = models.TimeField()
+    eccezioni = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='Date (YYYY-MM-DD) escluse dalla serie'
+    )
+
+    # Dati comuni a tutte le occorrenze
+    quantita = models.PositiveIntegerField(default=1)
+    scopo = models.CharField(max_length=200, blank=True)
+    note = models.TextField(blank=True)
+
+    creato_il = models.DateTimeField(auto_now_add=True)
+    modificato_il = models.DateTimeField(auto_now=True)
+    cancellato_il = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Serie Prenotazioni'
+        verbose_name_plural = 'Serie Prenotazioni'
+        ordering = ['-data_inizio']
+
+    def __str__(self):
+        return f"{self.utente.username} - {self.risorsa.nome} (dal {self.data_inizio:%d/%m/%Y} al {self.data_fine:%d/%m/%Y})"
+
+
 class PrenotazioneDispositivo(models.Model):
     """
     Tabella intermedia per tracciare dispositivi specifici in prenotazioni.
@@ -1019,6 +1229,13 @@ class Prenotazione(models.Model):
         on_delete=models.CASCADE,
         related_name='prenotazioni'
     )
+    serie = models.ForeignKey(
+        SeriePrenotazioni,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='occorrenze',
+        help_text='Serie ricorrente di appartenenza, se presente'
+    )
 
     # RIMOSSO: dispositivi_selezionati M2M
     # SOSTITUITO DA: PrenotazioneDispositivo (vedere modello sopra)
@@ -1401,6 +1618,13 @@ class NotificaUtente(models.Model):
     def __str__(self):
         return f"{self.utente.username} - {self.tipo} ({self.stato})"
 
+    # Numero massimo di tentativi di invio prima di marcare la notifica come fallita
+    MAX_TENTATIVI = 3
+
+    @property
+    def can_retry(self):
+        return self.tentativo_corrente < self.MAX_TENTATIVI
+
 
 # =====================================================
 # FILE E ALLEGATI
@@ -1523,33 +1747,27 @@ def save_user_profile_signal(sender, instance, **kwargs):
         instance.profilo_utente.save()
 
 
-def log_booking_action_signal(sender, instance, created, **kwargs):
-    """Log azioni prenotazioni."""
-    if created:
-        # Usa il nostro helper di log passando i campi corretti
-        try:
-            log_user_action(
-                user=instance.utente if hasattr(instance, 'utente') else None,
-                action_type='booking_created',
-                message=f"Prenotazione creata: {getattr(instance.risorsa, 'nome', '')}",
-                related_booking=instance
-            )
-        except Exception:
-            # Log full exception but do not block flow
-            logging.getLogger('prenotazioni').exception('Failed to log booking_created signal for booking %s', getattr(instance, 'id', None))
+def touch_risorsa_dispositivi_signal(sender, instance, action, reverse, pk_set, **kwargs):
+    """Aggiorna `modificato_il` delle risorse quando cambiano i loro dispositivi.
 
-def log_booking_deletion_signal(sender, instance, **kwargs):
-    """Log cancellazione prenotazioni."""
-    # Passa l'utente come primo argomento al helper `log_user_action`.
-    try:
-        log_user_action(
-            instance.utente,
-            'booking_cancelled',
-            f"Prenotazione cancellata: {instance.risorsa.nome}",
-            related_booking=instance
-        )
-    except Exception:
-        logging.getLogger('prenotazioni').exception('Failed to log booking_cancelled for booking %s', getattr(instance, 'id', None))
+    Le modifiche al M2M non toccano né la risorsa né il dispositivo: senza
+    questo l'ETag delle API risorse non vedrebbe lo scambio di un dispositivo.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        Risorsa.all_objects.filter(pk=instance.pk).update(modificato_il=timezone.now())
+    elif pk_set:
+        Risorsa.all_objects.filter(pk__in=pk_set).update(modificato_il=timezone.now())
+
+
+def invalidate_password_inputs_signal(sender, instance, **kwargs):
+    """Invalida le parole utente usate da zxcvbn quando cambiano nome, email o profilo."""
+    from .services import PasswordPolicyService
+
+    user_id = instance.utente_id if isinstance(instance, ProfiloUtente) else instance.pk
+    if user_id:
+        PasswordPolicyService.invalidate_user_inputs(user_id)
 
 
 # Signals registration helper
@@ -1561,5 +1779,8 @@ def connect_signals():
     """
     try:
         post_save.connect(create_user_profile_signal, sender=User)
+        post_save.connect(invalidate_password_inputs_signal, sender=User)
+        post_save.connect(invalidate_password_inputs_signal, sender=ProfiloUtente)
+        m2m_changed.connect(touch_risorsa_dispositivi_signal, sender=Risorsa.dispositivi.through)
     except Exception:
         logging.getLogger('prenotazioni').exception('Failed to connect signals')
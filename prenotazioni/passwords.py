@@ -1,13 +1,19 @@
 """Utility functions per la generazione di password sicure.
 
 Questo modulo espone `generate_strong_password` che crea password
-criptograficamente sicure che rispettano requisiti minimi di complessità.
+criptograficamente sicure che rispettano requisiti minimi di complessità,
+e `evaluate_password_strength`, il valutatore zxcvbn condiviso dal form
+di cambio password e dall'endpoint di controllo in tempo reale.
 """
 from __future__ import annotations
 
+import hashlib
 import secrets
 import string
-from typing import Optional
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
 
 
 _AMBIGUOUS = set('Il1O0')
@@ -60,3 +66,103 @@ def generate_strong_password(length: int = 16, avoid_ambiguous: bool = True) ->
     secrets.SystemRandom().shuffle(password_chars)
 
     return ''.join(password_chars)
+
+
+# ---------------------------------------------------------------------------
+# Valutazione della forza con zxcvbn
+# ---------------------------------------------------------------------------
+
+# Oltre questa lunghezza zxcvbn cresce in modo quadratico; i caratteri in più
+# possono solo aumentare il punteggio, quindi si valuta solo il prefisso.
+MAX_EVAL_LENGTH = 64
+_RESULT_CACHE_SIZE = 256
+_INPUTS_CACHE_SIZE = 128
+
+_lock = threading.Lock()
+_zxcvbn_modules = None
+_result_cache: "OrderedDict[str, Optional[dict]]" = OrderedDict()
+_inputs_cache: "OrderedDict[Tuple[str, ...], dict]" = OrderedDict()
+
+
+def _load_zxcvbn():
+    """Importa i moduli di zxcvbn una sola volta per processo (i dizionari
+    di frequenza vengono costruiti all'import e restano in memoria)."""
+    global _zxcvbn_modules
+    if _zxcvbn_modules is None:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)
+                from zxcvbn import feedback, matching, scoring, time_estimates
+        except ImportError:
+            _zxcvbn_modules = False
+        else:
+            _zxcvbn_modules = (matching, scoring, time_estimates, feedback)
+    return _zxcvbn_modules
+
+
+def warm_up() -> bool:
+    """Carica zxcvbn in anticipo; ritorna False se non è installato."""
+    return bool(_load_zxcvbn())
+
+
+def _lru_get(cache: OrderedDict, key):
+    with _lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return True, cache[key]
+    return False, None
+
+
+def _lru_put(cache: OrderedDict, key, value, size: int) -> None:
+    with _lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+
+def _ranked_dictionaries(matching, user_inputs: Tuple[str, ...]) -> dict:
+    """Dizionari di zxcvbn più quello degli input utente.
+
+    Si usa una copia invece di `zxcvbn.zxcvbn()`, che scrive gli input
+    utente nel dizionario globale del modulo e non è thread-safe.
+    """
+    found, dictionaries = _lru_get(_inputs_cache, user_inputs)
+    if not found:
+        dictionaries = dict(matching.RANKED_DICTIONARIES)
+        dictionaries['user_inputs'] = matching.build_ranked_dict(list(user_inputs))
+        _lru_put(_inputs_cache, user_inputs, dictionaries, _INPUTS_CACHE_SIZE)
+    return dictionaries
+
+
+def evaluate_password_strength(password: str, user_inputs: Iterable[str] = ()) -> Optional[dict]:
+    """Punteggio zxcvbn (0-4) con feedback, memoizzato per hash della password.
+
+    Returns:
+        dict con `score`, `warning`, `suggestions`; None se zxcvbn non è
+        installato.
+    """
+    modules = _load_zxcvbn()
+    if not modules:
+        return None
+    matching, scoring, time_estimates, feedback = modules
+
+    inputs = tuple(str(value).lower() for value in user_inputs if value)
+    # Nella cache finisce solo l'hash: la password non resta in memoria
+    key = hashlib.sha256('\x00'.join((password,) + inputs).encode('utf-8')).hexdigest()
+    found, result = _lru_get(_result_cache, key)
+    if found:
+        return dict(result, suggestions=list(result['suggestions']))
+
+    candidate = password[:MAX_EVAL_LENGTH]
+    matches = matching.omnimatch(candidate, _ranked_dictionaries(matching, inputs))
+    scored = scoring.most_guessable_match_sequence(candidate, matches)
+    score = time_estimates.guesses_to_score(scored['guesses'])
+    fb = feedback.get_feedback(score, scored['sequence']) or {}
+    result = {
+        'score': int(score),
+        'warning': fb.get('warning', ''),
+        'suggestions': list(fb.get('suggestions', [])),
+    }
+    _lru_put(_result_cache, key, result, _RESULT_CACHE_SIZE)
+    return dict(result, suggestions=list(result['suggestions']))
@@ -13,7 +13,8 @@ from django.contrib.auth import get_user_model
 from .models import (
     Risorsa, Dispositivo, Prenotazione, ConfigurazioneSistema, SessioneUtente,
     LogSistema, TemplateNotifica, NotificaUtente, ProfiloUtente,
-    UbicazioneRisorsa, CategoriaDispositivo, StatoPrenotazione, CaricamentoFile, InformazioniScuola
+    UbicazioneRisorsa, CategoriaDispositivo, StatoPrenotazione, CaricamentoFile, InformazioniScuola,
+    SeriePrenotazioni
 )
 
 User = get_user_model()
@@ -114,6 +115,8 @@ class UserSessionSerializer(serializers.ModelSerializer):
             'is_expired', 'is_valid'
         ]
         read_only_fields = ['id', 'user', 'token_sessione', 'data_creazione_sessione', 'data_scadenza_sessione', 'data_verifica_sessione', 'is_expired', 'is_valid']
+        # Il PIN è salvato come hash: si può impostare ma non leggere
+        extra_kwargs = {'pin_sessione': {'write_only': True}}
 
 
 class DeviceCategorySerializer(serializers.ModelSerializer):
@@ -130,23 +133,23 @@ class ResourceLocationSerializer(serializers.ModelSerializer):
 
 class DeviceSerializer(serializers.ModelSerializer):
     categoria = DeviceCategorySerializer(read_only=True)
-    display_name = serializers.CharField(read_only=True, source='display_name')
-    is_available = serializers.BooleanField(read_only=True, source='is_available')
-    needs_maintenance = serializers.BooleanField(read_only=True, source='needs_maintenance')
+    display_name = serializers.CharField(read_only=True)
+    is_available = serializers.BooleanField(read_only=True)
+    needs_maintenance = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Dispositivo
-        fields = ['id', 'nome', 'modello', 'marca', 'serie', 'codice_inventario', 'tipo', 'categoria', 'specifiche', 'stato', 'edificio', 'piano', 'aula', 'armadio', 'data_acquisto', 'data_scadenza_garanzia', 'valore_acquisto', 'note', 'ultimo_controllo', 'prossima_manutenzione', 'display_name', 'is_available', 'needs_maintenance', 'attivo', 'creato_il', 'modificato_il']
+        fields = ['id', 'nome', 'modello', 'marca', 'serie', 'codice_inventario', 'tipo', 'categoria', 'specifiche', 'stato', 'ubicazione', 'data_acquisto', 'data_scadenza_garanzia', 'valore_acquisto', 'note', 'ultimo_controllo', 'prossima_manutenzione', 'display_name', 'is_available', 'needs_maintenance', 'attivo', 'creato_il', 'modificato_il']
         read_only_fields = ['id', 'display_name', 'is_available', 'needs_maintenance', 'creato_il', 'modificato_il']
 
 
 class ResourceSerializer(serializers.ModelSerializer):
     localizzazione = ResourceLocationSerializer(read_only=True)
     dispositivi = DeviceSerializer(many=True, read_only=True)
-    is_laboratorio = serializers.BooleanField(read_only=True, source='is_laboratorio')
-    is_carrello = serializers.BooleanField(read_only=True, source='is_carrello')
-    is_aula = serializers.BooleanField(read_only=True, source='is_aula')
-    is_available_for_booking = serializers.BooleanField(read_only=True, source='is_available_for_booking')
+    is_laboratorio = serializers.BooleanField(read_only=True)
+    is_carrello = serializers.BooleanField(read_only=True)
+    is_aula = serializers.BooleanField(read_only=True)
+    is_available_for_booking = serializers.BooleanField(read_only=True)
     utilization_stats = serializers.SerializerMethodField()
 
     class Meta:
@@ -239,6 +242,62 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         return booking
 
 
+class BookingBulkItemSerializer(serializers.Serializer):
+    """Elemento di `bulk-create`: la risorsa è un id, risolto dal servizio
+    insieme a quelle degli altri elementi con una sola query."""
+    risorsa = serializers.IntegerField(min_value=1)
+    inizio = serializers.DateTimeField()
+    fine = serializers.DateTimeField()
+    quantita = serializers.IntegerField(min_value=1, default=1)
+    numero_persone = serializers.IntegerField(min_value=0, required=False)
+    priorita = serializers.ChoiceField(choices=Prenotazione.PRIORITA, required=False)
+    scopo = serializers.CharField(required=False, allow_blank=True)
+    note = serializers.CharField(required=False, allow_blank=True)
+    setup_needed = serializers.BooleanField(required=False)
+    cleanup_needed = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        if data['inizio'] >= data['fine']:
+            raise serializers.ValidationError("La data/ora di fine deve essere successiva all'inizio.")
+        return data
+
+
+class BookingBulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    tutto_o_niente = serializers.BooleanField(required=False, default=False)
+    motivo = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate_ids(self, value):
+        from .services import BulkBookingService
+        if len(value) > BulkBookingService.MAX_ELEMENTI:
+            raise serializers.ValidationError(f"Al massimo {BulkBookingService.MAX_ELEMENTI} prenotazioni per richiesta.")
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Id duplicati.")
+        return value
+
+
+class BookingSeriesSerializer(serializers.ModelSerializer):
+    giorni_settimana = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), allow_empty=False
+    )
+    eccezioni = serializers.ListField(child=serializers.DateField(), required=False, default=list)
+    occorrenze = serializers.IntegerField(write_only=True, required=False, min_value=1)
+    consenti_parziale = serializers.BooleanField(write_only=True, required=False, default=True)
+
+    class Meta:
+        model = SeriePrenotazioni
+        fields = ['id', 'risorsa', 'giorni_settimana', 'intervallo_settimane', 'data_inizio', 'data_fine', 'ora_inizio', 'ora_fine', 'eccezioni', 'quantita', 'scopo', 'note', 'occorrenze', 'consenti_parziale', 'creato_il', 'cancellato_il']
+        read_only_fields = ['id', 'creato_il', 'cancellato_il']
+
+
+class BookingSeriesUpdateSerializer(serializers.Serializer):
+    ora_inizio = serializers.TimeField(required=False)
+    ora_fine = serializers.TimeField(required=False)
+    quantita = serializers.IntegerField(required=False, min_value=1)
+    scopo = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    note = serializers.CharField(required=False, allow_blank=True)
+
+
 class SystemLogSerializer(serializers.ModelSerializer):
     utente = SimpleUserSerializer(read_only=True)
 
@@ -19,8 +19,11 @@ from django.template.loader import render_to_string
 # Import dei modelli usando alias coerenti con i nomi italiani
 from .models import (
     Risorsa, Dispositivo, Prenotazione, ConfigurazioneSistema as Configuration, SessioneUtente as UserSession,
-    LogSistema as SystemLog, TemplateNotifica as NotificationTemplate, NotificaUtente as Notification, CategoriaDispositivo as DeviceCategory, StatoPrenotazione as BookingStatus, InformazioniScuola, log_user_action
+    LogSistema as SystemLog, TemplateNotifica as NotificationTemplate, NotificaUtente as Notification, CategoriaDispositivo as DeviceCategory, StatoPrenotazione as BookingStatus, InformazioniScuola, log_user_action,
+    ProfiloUtente, PasswordHistory
 )
+from . import slot_index
+from .utils import as_aware_datetime
 # Alias for compatibility
 Resource = Risorsa
 Booking = Prenotazione
@@ -150,24 +153,29 @@ class UserSessionService:
     
     @classmethod
     def verify_session(cls, session_token, pin=None):
-        """Verifica sessione con eventuale PIN."""
+        """Verifica sessione con eventuale PIN.
+
+        Una lettura per token (indice univoco), il confronto a tempo
+        costante dell'hash e un solo UPDATE condizionato che porta la
+        sessione da in_attesa a verificato se non è scaduta.
+        """
+        from django.core.exceptions import ValidationError
+
         try:
-            session = UserSession.objects.get(token_sessione=session_token)
-        except UserSession.DoesNotExist:
+            session = UserSession.objects.select_related('utente_sessione').get(token_sessione=session_token)
+        except (UserSession.DoesNotExist, ValueError, ValidationError):
             return False, "Sessione non trovata"
 
-        if session.sessione_scaduta:
-            session.scadenza_sessione()
+        if session.stato_sessione == 'in_attesa' and session.sessione_scaduta:
+            UserSession.objects.filter(pk=session.pk, stato_sessione='in_attesa').update(stato_sessione='scaduto')
             return False, "Sessione scaduta"
 
         if session.stato_sessione != 'in_attesa':
             return False, "Sessione non valida"
 
-        # Verifica PIN se richiesto
-        if session.pin_sessione and pin != session.pin_sessione:
+        if not session.pin_corretto(pin):
             return False, "PIN non corretto"
 
-        # Verifica sessione tramite metodo del modello
         success, message = session.verifica_sessione(pin=pin)
         if success:
             try:
@@ -179,9 +187,9 @@ class UserSessionService:
     
     @classmethod
     def cleanup_expired_sessions(cls):
-        """Pulizia sessioni scadute."""
+        """Pulizia sessioni scadute: solo quelle ancora in attesa (indice parziale)."""
         expired_count = UserSession.objects.filter(
-            Q(data_scadenza_sessione__lt=timezone.now()) | Q(stato_sessione='scaduto')
+            stato_sessione='in_attesa', data_scadenza_sessione__lt=timezone.now()
         ).update(stato_sessione='scaduto')
 
         if expired_count > 0:
@@ -192,8 +200,8 @@ class UserSessionService:
     @classmethod
     def generate_pin(cls):
         """Genera PIN a 6 cifre."""
-        import random
-        return ''.join(random.choices('0123456789', k=6))
+        import secrets
+        return ''.join(secrets.choice('0123456789') for _ in range(6))
 
 
 class EmailService:
@@ -203,46 +211,82 @@ class EmailService:
     def send_email(cls, subject, message, recipient_list, template_name=None, context=None):
         """Invia email con supporto template."""
         # Instead of sending immediately, enqueue notifications for known User recipients.
-        # We expect `recipient_list` to contain user emails; try to resolve User instances.
+        cls.enqueue_bulk_email(subject, message, recipient_list, template_name=template_name, context=context)
+        return True, None
+
+    @classmethod
+    def enqueue_bulk_email(cls, subject, message, recipient_list, template_name=None, context=None, context_for_user=None):
+        """Accoda la stessa email per molti destinatari con un numero fisso di query.
+
+        `recipient_list` può contenere istanze User o indirizzi email: gli
+        indirizzi vengono risolti con un'unica query `email__in`. Il template
+        viene renderizzato una sola volta, a meno che `context_for_user`
+        (callable user -> dict) non fornisca un contesto per destinatario.
+
+        Returns:
+            tuple: (enqueued, skipped)
+        """
         from django.contrib.auth import get_user_model
         User = get_user_model()
 
-        if template_name and context:
-            html_message = render_to_string(f'emails/{template_name}.html', context)
-            plain_message = render_to_string(f'emails/{template_name}.txt', context)
-        else:
-            html_message = message
-            plain_message = message
-
-        enqueued = 0
+        users = []
+        emails = []
         for recipient in recipient_list:
             # recipient may be an email string or a User instance
-            user_obj = None
             if hasattr(recipient, 'email') and getattr(recipient, 'email', None):
-                user_obj = recipient
+                users.append(recipient)
+            elif recipient:
+                emails.append(recipient)
+
+        skipped = len(recipient_list) - len(users) - len(emails)
+        if emails:
+            by_email = {}
+            for user_obj in User.objects.filter(email__in=set(emails)).order_by('pk'):
+                by_email.setdefault(user_obj.email, user_obj)
+            for email in emails:
+                user_obj = by_email.get(email)
+                if user_obj is None:
+                    # If no User found for this email, log and skip enqueueing.
+                    logger.warning('No User found for email %s; skipping enqueue', email)
+                    skipped += 1
+                    continue
+                users.append(user_obj)
+
+        # Un solo messaggio per utente anche se compare più volte nella lista
+        unique_users = list({u.pk: u for u in users}.values())
+        skipped += len(users) - len(unique_users)
+
+        if template_name and (context or context_for_user):
+            if context_for_user is None:
+                html_message = render_to_string(f'emails/{template_name}.html', context)
+                messages_by_user = None
             else:
-                user_obj = User.objects.filter(email=recipient).first()
-
-            if not user_obj:
-                # If no User found for this email, log and skip enqueueing.
-                logger.warning('No User found for email %s; skipping enqueue', recipient)
-                continue
+                messages_by_user = {
+                    u.pk: render_to_string(f'emails/{template_name}.html', {**(context or {}), **context_for_user(u)})
+                    for u in unique_users
+                }
+                html_message = None
+        else:
+            html_message = message
+            messages_by_user = None
 
-            notif = NotificationService.enqueue_email_for_user(user_obj, subject, html_message)
-            if notif:
-                enqueued += 1
+        enqueued = NotificationService.enqueue_emails_for_users(
+            unique_users, subject, html_message, messages_by_user=messages_by_user
+        )
+        skipped += len(unique_users) - enqueued
 
         # Log enqueued notifications
         try:
             log_user_action(None, 'email_enqueued', f"Email enqueued for {enqueued} recipients", dettagli={
                 'subject': subject,
                 'recipients_count': enqueued,
+                'skipped_count': skipped,
                 'template': template_name
             })
         except Exception:
             pass
 
-        return True, None
+        return enqueued, skipped
 
     @classmethod
     def _send_via_backend(cls, subject, plain_message, html_message, recipient_email, from_email=None):
@@ -279,9 +323,9 @@ class EmailService:
     @classmethod
     def send_pin_email(cls, user, pin, session_type='login_pin'):
         """Invia email con PIN."""
-        school_info = SchoolInfo.ottieni_istanza() if hasattr(SchoolInfo, 'ottieni_istanza') else SchoolInfo
+        school_info = SchoolInfo.ottieni_snapshot()
 
-        school_breve = getattr(school_info, 'nome_breve_scuola', getattr(school_info, 'nome_breve', ''))
+        school_breve = school_info.nome_breve_scuola if school_info else ''
 
         subject = f"Codice PIN - {school_breve}"
         context = {
@@ -308,7 +352,7 @@ class EmailService:
             'booking': booking,
             'user': booking.utente,
             'resource': booking.risorsa,
-            'school_info': SchoolInfo.ottieni_istanza() if hasattr(SchoolInfo, 'ottieni_istanza') else SchoolInfo,
+            'school_info': SchoolInfo.ottieni_snapshot(),
         }
         
         return cls.send_email(
@@ -327,7 +371,7 @@ class EmailService:
             'booking': booking,
             'user': booking.utente,
             'resource': booking.risorsa,
-            'school_info': SchoolInfo.ottieni_istanza() if hasattr(SchoolInfo, 'ottieni_istanza') else SchoolInfo,
+            'school_info': SchoolInfo.ottieni_snapshot(),
             'hours_until': int((booking.inizio - timezone.now()).total_seconds() / 3600),
         }
         
@@ -340,6 +384,350 @@ class EmailService:
         )
 
 
+# =====================================================
+# POLICY PASSWORD
+# =====================================================
+
+class PasswordPolicyService:
+    """Verifica delle password: validatori Django, zxcvbn e storico.
+
+    I confronti con lo storico (un PBKDF2 completo ciascuno) girano in un
+    pool di thread con un budget di tempo complessivo e si fermano alla
+    prima corrispondenza. Gli input utente per zxcvbn (username, nome,
+    email, ...) sono in cache per utente, così il controllo live della
+    forza non interroga il database a ogni battuta.
+    """
+
+    USER_INPUTS_CACHE_TIMEOUT = 60 * 10
+    HISTORY_WORKERS = 4
+    _executor = None
+
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            cls._executor = ThreadPoolExecutor(max_workers=cls.HISTORY_WORKERS, thread_name_prefix='pwd-history')
+        return cls._executor
+
+    @classmethod
+    def min_score(cls):
+        return int(getattr(settings, 'PASSWORD_MIN_ZXCVBN_SCORE', 3))
+
+    @classmethod
+    def history_budget(cls):
+        """Tempo massimo (secondi) per i confronti con lo storico."""
+        return float(getattr(settings, 'PASSWORD_HISTORY_CHECK_BUDGET', 2.0))
+
+    @classmethod
+    def user_inputs(cls, user):
+        """Parole legate all'utente da penalizzare in zxcvbn (in cache per utente)."""
+        if user is None or not getattr(user, 'pk', None):
+            return []
+        from django.core.cache import cache
+        key = f'pwd_user_inputs:{user.pk}'
+        inputs = cache.get(key)
+        if inputs is None:
+            inputs = [user.username, user.first_name, user.last_name, user.email]
+            if user.email:
+                inputs.append(user.email.split('@')[0])
+            profilo = ProfiloUtente.objects.filter(utente_id=user.pk).values_list('nome_utente', 'cognome_utente').first()
+            if profilo:
+                inputs.extend(profilo)
+            inputs = [value.lower() for value in inputs if value]
+            cache.set(key, inputs, cls.USER_INPUTS_CACHE_TIMEOUT)
+        return inputs
+
+    @classmethod
+    def invalidate_user_inputs(cls, user_id):
+        """Scarta le parole in cache; chiamato dai segnali su User e ProfiloUtente."""
+        from django.core.cache import cache
+        cache.delete(f'pwd_user_inputs:{user_id}')
+
+    @classmethod
+    def evaluate(cls, password, user=None):
+        """Punteggio zxcvbn con feedback (valutatore condiviso in `passwords`).
+
+        Returns:
+            dict con `score`, `min_score`, `ok`, `warning`, `suggestions`;
+            None se zxcvbn non è disponibile.
+        """
+        from .passwords import evaluate_password_strength
+        result = evaluate_password_strength(password, cls.user_inputs(user))
+        if result is None:
+            return None
+        result['min_score'] = cls.min_score()
+        result['ok'] = result['score'] >= result['min_score']
+        return result
+
+    @classmethod
+    def is_in_history(cls, user, password, limit=None, budget=None):
+        """Verifica se `password` coincide con una delle ultime dello storico.
+
+        Returns:
+            True alla prima corrispondenza, False se nessuna coincide,
+            None se il budget di tempo è scaduto prima di concludere.
+        """
+        import time
+        from concurrent.futures import wait, FIRST_COMPLETED
+        from django.contrib.auth.hashers import check_password
+
+        limit = limit or int(getattr(settings, 'PASSWORD_HISTORY_COUNT', 5))
+        budget = cls.history_budget() if budget is None else budget
+        hashes = list(
+            PasswordHistory.objects.filter(utente_id=user.pk)
+            .order_by('-created_at').values_list('password_hash', flat=True)[:limit]
+        )
+        if not hashes:
+            return False
+
+        def compare(encoded):
+            try:
+                return check_password(password, encoded)
+            except Exception:
+                return False
+
+        executor = cls._get_executor()
+        pending = {executor.submit(compare, encoded) for encoded in hashes}
+        deadline = time.monotonic() + budget
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning('Controllo storico password oltre il budget (%.1fs) per utente %s', budget, user.pk)
+                    return None
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if any(future.result() for future in done):
+                    return True
+            return False
+        finally:
+            for future in pending:
+                future.cancel()
+
+    @classmethod
+    def validate(cls, password, user):
+        """Applica l'intera policy; solleva ValidationError con tutti i motivi."""
+        from django.core.exceptions import ValidationError
+        from django.contrib.auth.password_validation import validate_password
+
+        errors = []
+        try:
+            validate_password(password, user)
+        except ValidationError as e:
+            errors.extend(e.messages)
+
+        evaluation = cls.evaluate(password, user)
+        if evaluation is not None and not evaluation['ok']:
+            msg = 'Password troppo debole.'
+            if evaluation['warning']:
+                msg += f" {evaluation['warning']}"
+            if evaluation['suggestions']:
+                msg += ' ' + ' '.join(evaluation['suggestions'][:2])
+            errors.append(msg)
+
+        # Lo storico si controlla solo se la password supera gli altri
+        # controlli: evita hash costosi per password già rifiutate. Se il
+        # budget scade l'esito è ignoto e la password non passa.
+        if not errors:
+            in_history = cls.is_in_history(user, password)
+            if in_history is None:
+                errors.append('Impossibile verificare lo storico delle password, riprovare')
+            elif in_history:
+                errors.append('Questa password è già stata usata in precedenza')
+
+        if errors:
+            raise ValidationError(errors)
+
+
+# =====================================================
+# EFFETTI COLLATERALI PRENOTAZIONI
+# =====================================================
+
+class BookingSideEffects:
+    """Pipeline unica degli effetti collaterali di una prenotazione.
+
+    `dispatch()` accoda l'evento con `transaction.on_commit`: se la
+    transazione viene annullata non succede nulla. Dopo il commit gli hook
+    registrati per l'evento (audit, notifiche, ...) girano in ordine di
+    registrazione; con `BOOKING_SIDE_EFFECTS_ASYNC` attivo vengono eseguiti
+    da un unico thread in background, quindi anche gli eventi mantengono
+    l'ordine di commit. L'errore di un hook viene loggato e non blocca i
+    successivi.
+    """
+
+    EVENTS = ('booking_created', 'booking_modified', 'booking_cancelled')
+    _hooks = {event: [] for event in EVENTS}
+    # Varianti per lotti: hook -> hook_many(event, bookings, user, dettagli)
+    _batch_hooks = {}
+    _executor = None
+
+    MESSAGES = {
+        'booking_created': 'Prenotazione creata',
+        'booking_modified': 'Prenotazione modificata',
+        'booking_cancelled': 'Prenotazione cancellata',
+    }
+
+    @classmethod
+    def register(cls, event, hook, batch=None):
+        """Aggiunge `hook(event, booking, user, dettagli)` in coda agli hook dell'evento.
+
+        `batch(event, bookings, user, dettagli)`, se indicato, sostituisce
+        l'hook nelle operazioni su più prenotazioni (`dispatch_many`).
+        """
+        if event not in cls._hooks:
+            raise ValueError(f"Evento non supportato: {event}")
+        if hook not in cls._hooks[event]:
+            cls._hooks[event].append(hook)
+        if batch is not None:
+            cls._batch_hooks[hook] = batch
+        return hook
+
+    @classmethod
+    def is_async(cls):
+        return bool(getattr(settings, 'BOOKING_SIDE_EFFECTS_ASYNC', False))
+
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            # Un solo worker: gli eventi vengono eseguiti nell'ordine di commit
+            cls._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='booking-effects')
+        return cls._executor
+
+    @classmethod
+    def dispatch(cls, event, booking, user=None, dettagli=None):
+        """Pianifica gli effetti collaterali di `event` dopo il commit."""
+        from django.db import transaction
+
+        if event not in cls._hooks:
+            raise ValueError(f"Evento non supportato: {event}")
+        payload = {'booking_id': booking.pk, **(dettagli or {})}
+        user_id = getattr(user, 'pk', None)
+
+        def on_commit():
+            if cls.is_async():
+                cls._get_executor().submit(cls._run_in_worker, event, booking.pk, user_id, payload)
+            else:
+                cls.run(event, booking, user, payload)
+
+        transaction.on_commit(on_commit)
+
+    @classmethod
+    def dispatch_many(cls, event, bookings, user=None, dettagli=None):
+        """Come `dispatch`, per un lotto di prenotazioni della stessa operazione.
+
+        Gli hook con una variante per lotti (audit, notifiche) la eseguono
+        una volta sola; gli altri girano per ogni prenotazione.
+        """
+        from django.db import transaction
+
+        if event not in cls._hooks:
+            raise ValueError(f"Evento non supportato: {event}")
+        bookings = list(bookings)
+        if not bookings:
+            return
+        payload = dict(dettagli or {})
+        user_id = getattr(user, 'pk', None)
+
+        def on_commit():
+            if cls.is_async():
+                cls._get_executor().submit(cls._run_many_in_worker, event, [b.pk for b in bookings], user_id, payload)
+            else:
+                cls.run_many(event, bookings, user, payload)
+
+        transaction.on_commit(on_commit)
+
+    @classmethod
+    def _run_many_in_worker(cls, event, booking_ids, user_id, payload):
+        from django.contrib.auth import get_user_model
+        from django.db import close_old_connections
+        try:
+            bookings = list(Prenotazione.all_objects.select_related('utente', 'risorsa').filter(pk__in=booking_ids))
+            user = get_user_model().objects.filter(pk=user_id).first() if user_id else None
+            cls.run_many(event, bookings, user, payload)
+        except Exception:
+            logger.exception('Effetti collaterali %s non eseguiti per %s prenotazioni', event, len(booking_ids))
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def run_many(cls, event, bookings, user, dettagli):
+        """Esegue gli hook dell'evento su un lotto, nell'ordine di registrazione."""
+        for hook in list(cls._hooks[event]):
+            batch = cls._batch_hooks.get(hook)
+            if batch is not None:
+                try:
+                    batch(event, bookings, user, dettagli)
+                except Exception:
+                    logger.exception('Hook %s fallito per %s (%s prenotazioni)',
+                                     getattr(batch, '__name__', batch), event, len(bookings))
+                continue
+            for booking in bookings:
+                cls._run_hook(hook, event, booking, user, {'booking_id': booking.pk, **dettagli})
+
+    @classmethod
+    def _run_in_worker(cls, event, booking_id, user_id, payload):
+        from django.contrib.auth import get_user_model
+        from django.db import close_old_connections
+        try:
+            booking = Prenotazione.all_objects.select_related('utente', 'risorsa').get(pk=booking_id)
+            user = get_user_model().objects.filter(pk=user_id).first() if user_id else None
+            cls.run(event, booking, user, payload)
+        except Exception:
+            logger.exception('Effetti collaterali %s non eseguiti per prenotazione %s', event, booking_id)
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def run(cls, event, booking, user, dettagli):
+        """Esegue subito gli hook dell'evento, nell'ordine di registrazione."""
+        for hook in list(cls._hooks[event]):
+            cls._run_hook(hook, event, booking, user, dettagli)
+
+    @staticmethod
+    def _run_hook(hook, event, booking, user, dettagli):
+        try:
+            hook(event, booking, user, dettagli)
+        except Exception:
+            logger.exception('Hook %s fallito per %s (prenotazione %s)', getattr(hook, '__name__', hook), event, booking.pk)
+
+    # -- hook predefiniti --------------------------------------------------
+
+    @classmethod
+    def audit(cls, event, booking, user, dettagli):
+        """Una sola riga di audit per evento."""
+        log_user_action(user or booking.utente, event, f"{cls.MESSAGES[event]}: {booking.risorsa.nome}", dettagli=dettagli)
+
+    @classmethod
+    def audit_many(cls, event, bookings, user, dettagli):
+        """Le righe di audit di un lotto con un solo INSERT."""
+        from .models import LogSistema
+
+        LogSistema.objects.bulk_create([
+            LogSistema(
+                tipo_evento=event,
+                messaggio=f"{cls.MESSAGES[event]}: {booking.risorsa.nome}",
+                utente=user or booking.utente,
+                dettagli={'booking_id': booking.pk, **dettagli},
+            )
+            for booking in bookings
+        ], batch_size=NotificationService.BULK_BATCH_SIZE)
+
+    @classmethod
+    def notify_many(cls, event, bookings, user, dettagli):
+        """Notifiche di un lotto: un template e INSERT multipli."""
+        NotificationService.create_booking_notifications_bulk(bookings, NotificationService.BOOKING_TEMPLATES[event])
+
+    @classmethod
+    def notify(cls, event, booking, user, dettagli):
+        """Notifiche all'utente della prenotazione."""
+        handler = {
+            'booking_created': NotificationService.create_booking_notifications,
+            'booking_modified': NotificationService.create_booking_update_notifications,
+            'booking_cancelled': NotificationService.create_booking_cancellation_notifications,
+        }[event]
+        handler(booking)
+
+
 # =====================================================
 # SERVIZI PRENOTAZIONI
 # =====================================================
@@ -437,53 +825,59 @@ class BookingService:
     @classmethod
     def create_booking(cls, utente, risorsa_id, quantita, inizio, fine, **kwargs):
         """Crea nuova prenotazione con workflow avanzato."""
+        from django.db import transaction
+
         try:
-            # Verifica disponibilità
-            is_available, disponibile, errors = cls.check_resource_availability(
-                risorsa_id, inizio, fine, quantita
-            )
-            
-            if not is_available:
-                return False, errors[0] if errors else "Risorsa non disponibile."
-            
             # Verifica permessi utente - simplified since User model doesn't have permission methods
             if not getattr(utente, 'is_active', False):
                 return False, "Utente non attivo."
-            
-            # Crea prenotazione
-            risorsa = Risorsa.objects.get(id=risorsa_id)
-            
-            # Determina stato iniziale
-            initial_status = BookingStatus.objects.get_or_create(
-                nome='pending',
-                defaults={'descrizione': 'In Attesa', 'colore': '#ffc107'}
-            )[0]
-            
-            booking = Prenotazione.objects.create(
-                utente=utente,
-                risorsa=risorsa,
-                quantita=quantita,
-                inizio=inizio,
-                fine=fine,
-                stato=initial_status,
-                **kwargs
-            )
-            
-            # Log event
-            try:
-                log_user_action(utente, 'booking_created', f"Prenotazione creata: {getattr(risorsa, 'nome', '')}", dettagli={
-                    'booking_id': booking.id,
+
+            with transaction.atomic():
+                # Blocca la riga della risorsa fino al commit: richieste
+                # concorrenti sulla stessa risorsa non possono passare entrambe
+                # il controllo di disponibilità prima dell'inserimento
+                risorsa = Risorsa.objects.select_for_update().filter(id=risorsa_id).first()
+
+                # Verifica disponibilità
+                is_available, disponibile, errors = cls.check_resource_availability(
+                    risorsa_id, inizio, fine, quantita
+                )
+
+                if not is_available:
+                    return False, errors[0] if errors else "Risorsa non disponibile."
+
+                # Determina stato iniziale
+                initial_status = BookingStatus.objects.get_or_create(
+                    nome='pending',
+                    defaults={'descrizione': 'In Attesa', 'colore': '#ffc107'}
+                )[0]
+
+                booking = Prenotazione.objects.create(
+                    utente=utente,
+                    risorsa=risorsa,
+                    quantita=quantita,
+                    inizio=inizio,
+                    fine=fine,
+                    stato=initial_status,
+                    **kwargs
+                )
+
+                # Carrelli con dispositivi censiti: assegna i dispositivi
+                # concreti; senza dispositivi collegati vale solo la quantità
+                if risorsa.tipo == 'carrello':
+                    allocated, esito = DeviceService.allocate_devices(booking)
+                    if not allocated and risorsa.dispositivi.exists():
+                        transaction.set_rollback(True)
+                        return False, esito
+
+                # Audit e notifiche dopo il commit, in un'unica pipeline
+                BookingSideEffects.dispatch('booking_created', booking, utente, {
                     'resource': getattr(risorsa, 'nome', ''),
                     'quantity': quantita,
                     'start': inizio.isoformat(),
                     'end': fine.isoformat()
                 })
-            except Exception:
-                pass
-            
-            # Invia notifiche
-            NotificationService.create_booking_notifications(booking)
-            
+
             return True, booking
             
         except Exception as e:
@@ -499,43 +893,60 @@ class BookingService:
     
     @classmethod
     def update_booking(cls, booking_id, utente, inizio, fine, quantita, **kwargs):
-        """Aggiorna prenotazione esistente."""
+        """Aggiorna prenotazione esistente.
+
+        Per i carrelli, se cambiano orario o quantità, i dispositivi
+        assegnati vengono riassegnati nella stessa transazione: se non ce ne
+        sono abbastanza di liberi nel nuovo intervallo la modifica è annullata.
+        """
+        from django.db import transaction
+
         try:
-            booking = Prenotazione.objects.get(id=booking_id)
-            
-            # Controllo permessi - simplified since Booking model doesn't have permission methods
-            if booking.utente != utente:
-                return False, "Puoi modificare solo le tue prenotazioni."
-            
-            # Verifica disponibilità (escludendo questa prenotazione)
-            is_available, disponibile, errors = cls.check_resource_availability(
-                booking.risorsa.id, inizio, fine, quantita, exclude_booking_id=booking_id
-            )
-            
-            if not is_available:
-                return False, errors[0] if errors else "Risorsa non disponibile per il nuovo orario."
-            
-            # Aggiorna prenotazione
-            booking.inizio = inizio
-            booking.fine = fine
-            booking.quantita = quantita
-            
-            # Aggiorna altri campi
-            for key, value in kwargs.items():
-                if hasattr(booking, key):
-                    setattr(booking, key, value)
-            
-            booking.save()
-            
-            # Log event
-            try:
-                log_user_action(utente, 'booking_modified', f"Prenotazione modificata: {getattr(booking.risorsa, 'nome', '')}", dettagli={'booking_id': booking.id, 'changes': kwargs})
-            except Exception:
-                pass
-            
-            # Invia notifiche aggiornamento
-            NotificationService.create_booking_update_notifications(booking)
-            
+            with transaction.atomic():
+                booking = Prenotazione.objects.select_related('risorsa').get(id=booking_id)
+
+                # Controllo permessi - simplified since Booking model doesn't have permission methods
+                if booking.utente != utente:
+                    return False, "Puoi modificare solo le tue prenotazioni."
+
+                # Stesso blocco di create_booking: disponibilità e assegnazione
+                # dei dispositivi non si sovrappongono a richieste concorrenti
+                risorsa = Risorsa.objects.select_for_update().get(pk=booking.risorsa_id)
+
+                # Verifica disponibilità (escludendo questa prenotazione)
+                is_available, disponibile, errors = cls.check_resource_availability(
+                    risorsa.id, inizio, fine, quantita, exclude_booking_id=booking_id
+                )
+
+                if not is_available:
+                    return False, errors[0] if errors else "Risorsa non disponibile per il nuovo orario."
+
+                # Aggiorna prenotazione
+                previous = {'start': booking.inizio.isoformat(), 'end': booking.fine.isoformat()}
+                moved = (booking.inizio, booking.fine, booking.quantita) != (inizio, fine, quantita)
+                booking.inizio = inizio
+                booking.fine = fine
+                booking.quantita = quantita
+
+                # Aggiorna altri campi
+                for key, value in kwargs.items():
+                    if hasattr(booking, key):
+                        setattr(booking, key, value)
+
+                booking.save()
+
+                if moved and risorsa.tipo == 'carrello':
+                    allocated, esito = DeviceService.reallocate_devices(booking)
+                    if not allocated and risorsa.dispositivi.exists():
+                        transaction.set_rollback(True)
+                        return False, esito
+
+                # Audit e notifiche dopo il commit, in un'unica pipeline
+                BookingSideEffects.dispatch('booking_modified', booking, utente, {
+                    'changes': {key: str(value) for key, value in kwargs.items()},
+                    'previous': previous,
+                })
+
             return True, booking
             
         except Prenotazione.DoesNotExist:
@@ -563,14 +974,8 @@ class BookingService:
             success, message = True, f"Prenotazione cancellata con successo. Motivo: {reason}"
             
             if success:
-                # Log event
-                try:
-                    log_user_action(utente, 'booking_cancelled', f"Prenotazione cancellata: {getattr(booking.risorsa, 'nome', '')}", dettagli={'booking_id': booking.id, 'reason': reason})
-                except Exception:
-                    pass
-                
-                # Invia notifiche cancellazione
-                NotificationService.create_booking_cancellation_notifications(booking)
+                # Audit e notifiche dopo il commit, in un'unica pipeline
+                BookingSideEffects.dispatch('booking_cancelled', booking, utente, {'reason': reason})
             
             return success, message
             
@@ -619,6 +1024,677 @@ class BookingService:
         return query.exists()
 
 
+class ConflictAnalysisService:
+    """Analisi dei conflitti sull'intero calendario con un algoritmo sweep-line.
+
+    Le prenotazioni attive vengono lette in streaming ordinate per
+    `(risorsa, inizio)`; per ogni risorsa uno heap contiene solo le
+    prenotazioni ancora in corso nel punto di scansione. Costo
+    O(n log n) in tempo e O(prenotazioni attive) in memoria.
+
+    - Laboratori e altre risorse esclusive: conflitto se due prenotazioni
+      si sovrappongono.
+    - Carrelli: conflitto se la somma delle quantità supera
+      `capacita_massima` (+ `overbooking_limite` se l'overbooking è abilitato).
+    """
+
+    STATI_ESCLUSI = ('annullata', 'rinviata')
+
+    @classmethod
+    def resource_limit(cls, tipo, capacita_massima, allow_overbooking, overbooking_limite):
+        """Restituisce (limite, per_quantita) per una risorsa."""
+        if tipo == 'carrello' and capacita_massima:
+            extra = overbooking_limite if allow_overbooking else 0
+            return capacita_massima + extra, True
+        return 1, False
+
+    @classmethod
+    def get_queryset(cls, date_from=None, date_to=None, risorsa_id=None):
+        query = Prenotazione.objects.exclude(stato__in=cls.STATI_ESCLUSI)
+        if date_from:
+            query = query.filter(fine__gt=date_from)
+        if date_to:
+            query = query.filter(inizio__lt=date_to)
+        if risorsa_id:
+            query = query.filter(risorsa_id=risorsa_id)
+        return query.order_by('risorsa_id', 'inizio', 'pk').values_list(
+            'pk', 'risorsa_id', 'inizio', 'fine', 'quantita'
+        )
+
+    @classmethod
+    def iter_conflicts(cls, date_from=None, date_to=None, risorsa_id=None, chunk_size=2000):
+        """Genera un dizionario per ogni gruppo di prenotazioni in conflitto.
+
+        Un gruppo è un insieme massimale di prenotazioni sovrapposte a catena
+        sulla stessa risorsa in cui il carico supera il limite in almeno un
+        istante. `prenotazioni` contiene solo quelle coinvolte nel superamento.
+        """
+        import heapq
+
+        resources = {
+            row[0]: row[1:]
+            for row in Risorsa.all_objects.values_list(
+                'pk', 'nome', 'tipo', 'capacita_massima', 'allow_overbooking', 'overbooking_limite'
+            ).iterator()
+        }
+
+        current = None
+        active = []  # heap di (fine, pk, quantita)
+        load = 0
+        group = None
+
+        def close_group():
+            if group and group['prenotazioni']:
+                group['prenotazioni'] = sorted(group['prenotazioni'])
+                return group
+            return None
+
+        rows = cls.get_queryset(date_from, date_to, risorsa_id).iterator(chunk_size=chunk_size)
+        for pk, res_id, inizio, fine, quantita in rows:
+            if res_id != current:
+                finished = close_group()
+                if finished:
+                    yield finished
+                current = res_id
+                nome, tipo, capacita, allow_ob, ob_limite = resources.get(res_id, ('', '', 0, False, 0))
+                limit, per_quantita = cls.resource_limit(tipo, capacita, allow_ob, ob_limite)
+                active, load, group = [], 0, None
+
+            # Le prenotazioni terminate prima dell'inizio escono dallo sweep
+            while active and active[0][0] <= inizio:
+                _, _, q = heapq.heappop(active)
+                load -= q
+
+            if not active:
+                finished = close_group()
+                if finished:
+                    yield finished
+                group = {
+                    'risorsa_id': res_id, 'risorsa': nome, 'limite': limit,
+                    'inizio': inizio, 'fine': fine, 'picco': 0, 'prenotazioni': set(),
+                }
+
+            weight = (quantita or 1) if per_quantita else 1
+            heapq.heappush(active, (fine, pk, weight))
+            load += weight
+            group['fine'] = max(group['fine'], fine)
+            if load > limit:
+                group['prenotazioni'].update(item[1] for item in active)
+            group['picco'] = max(group['picco'], load)
+
+        finished = close_group()
+        if finished:
+            yield finished
+
+    @classmethod
+    def report(cls, **filters):
+        """Lista completa dei gruppi in conflitto."""
+        return list(cls.iter_conflicts(**filters))
+
+
+class RecurringBookingService:
+    """Serie di prenotazioni ricorrenti (settimanali o a settimane alterne).
+
+    L'espansione calcola tutte le date della serie in un colpo solo, per
+    aritmetica sulle settimane invece che giorno per giorno. Le occorrenze
+    vengono verificate insieme con una sola query sull'intervallo coperto
+    dalla serie e uno sweep in memoria, con le stesse regole di
+    `BookingService.check_resource_availability`; quelle accettate si
+    inseriscono con un unico `bulk_create`. Modifiche e annullamenti della
+    serie aggiornano tutte le occorrenze future con un solo UPDATE.
+    """
+
+    MAX_OCCORRENZE = 200
+
+    @classmethod
+    def expand(cls, data_inizio, data_fine, giorni_settimana, ora_inizio, ora_fine,
+               intervallo_settimane=1, eccezioni=(), occorrenze=None):
+        """Restituisce la lista ordinata di (inizio, fine) delle occorrenze.
+
+        Come in RRULE con FREQ=WEEKLY;INTERVAL=n le settimane si contano da
+        quella di `data_inizio`; `occorrenze` equivale a COUNT.
+        """
+        from datetime import datetime
+
+        step = timedelta(weeks=max(1, intervallo_settimane))
+        monday = data_inizio - timedelta(days=data_inizio.weekday())
+        excluded = {str(d) for d in eccezioni}
+        dates = []
+        for weekday in sorted(set(giorni_settimana)):
+            first = monday + timedelta(days=weekday)
+            if first < data_inizio:
+                first += step
+            if first > data_fine:
+                continue
+            count = (data_fine - first) // step + 1
+            dates.extend(first + step * k for k in range(count))
+        dates = sorted(d for d in dates if d.isoformat() not in excluded)
+        if occorrenze is not None:
+            dates = dates[:occorrenze]
+
+        tz = timezone.get_current_timezone()
+        return [
+            (timezone.make_aware(datetime.combine(d, ora_inizio), tz),
+             timezone.make_aware(datetime.combine(d, ora_fine), tz))
+            for d in dates
+        ]
+
+    @classmethod
+    def find_conflicts(cls, risorsa, occurrences, quantita, exclude_serie_id=None):
+        """Indici delle occorrenze non disponibili, con il motivo.
+
+        `occurrences` deve essere ordinata per inizio e senza sovrapposizioni
+        interne (vale per l'output di `expand`).
+        """
+        import heapq
+
+        if not occurrences or risorsa.tipo not in ('laboratorio', 'carrello'):
+            # Gli altri tipi non hanno vincoli, come in check_resource_availability
+            return {}
+        if risorsa.tipo == 'carrello' and not risorsa.capacita_massima:
+            return {i: "Carrello senza capacità definita." for i in range(len(occurrences))}
+
+        existing = Prenotazione.objects.filter(
+            risorsa=risorsa,
+            inizio__lt=occurrences[-1][1],
+            fine__gt=occurrences[0][0],
+            cancellato_il__isnull=True,
+        )
+        if exclude_serie_id:
+            existing = existing.exclude(serie_id=exclude_serie_id)
+        existing = list(existing.order_by('inizio').values_list('inizio', 'fine', 'quantita'))
+
+        conflicts = {}
+        active = []  # heap di (fine, inizio, quantita) delle prenotazioni esistenti
+        j = 0
+        for i, (inizio, fine) in enumerate(occurrences):
+            while j < len(existing) and existing[j][0] < fine:
+                heapq.heappush(active, (existing[j][1], existing[j][0], existing[j][2]))
+                j += 1
+            while active and active[0][0] <= inizio:
+                heapq.heappop(active)
+            if not active:
+                continue
+            if risorsa.tipo == 'laboratorio':
+                conflicts[i] = "Laboratorio già prenotato in questo periodo."
+            else:
+                disponibile = risorsa.capacita_massima - sum(item[2] for item in active)
+                if quantita > disponibile:
+                    conflicts[i] = f"Disponibilità insufficiente: richieste {quantita}, disponibili {disponibile}."
+        return conflicts
+
+    @classmethod
+    def _validate_rule(cls, data_inizio, data_fine, giorni_settimana, ora_inizio, ora_fine, intervallo_settimane):
+        if not giorni_settimana or any(not isinstance(g, int) or not 0 <= g <= 6 for g in giorni_settimana):
+            return "Indicare almeno un giorno della settimana (0 = lunedì ... 6 = domenica)."
+        if ora_inizio >= ora_fine:
+            return "L'orario di fine deve essere successivo a quello di inizio."
+        if data_fine < data_inizio:
+            return "La data di fine deve essere successiva a quella di inizio."
+        if intervallo_settimane < 1:
+            return "L'intervallo in settimane deve essere almeno 1."
+        return None
+
+    @classmethod
+    def _can_manage(cls, serie, utente):
+        return serie.utente_id == utente.pk or getattr(utente, 'is_staff', False)
+
+    @classmethod
+    def create_series(cls, utente, risorsa_id, data_inizio, data_fine, giorni_settimana, ora_inizio, ora_fine,
+                      intervallo_settimane=1, eccezioni=(), occorrenze=None, quantita=1, consenti_parziale=True,
+                      **kwargs):
+        """Crea la serie e tutte le occorrenze disponibili.
+
+        Con `consenti_parziale` le occorrenze in conflitto vengono saltate,
+        altrimenti un solo conflitto annulla l'intera serie.
+
+        Returns:
+            tuple: (success, serie oppure messaggio di errore, conflitti)
+            dove conflitti è una lista di (inizio, fine, motivo).
+        """
+        from django.db import transaction
+        from .models import SeriePrenotazioni
+
+        if not getattr(utente, 'is_active', False):
+            return False, "Utente non attivo.", []
+        error = cls._validate_rule(data_inizio, data_fine, giorni_settimana, ora_inizio, ora_fine, intervallo_settimane)
+        if error:
+            return False, error, []
+
+        occurrences = cls.expand(data_inizio, data_fine, giorni_settimana, ora_inizio, ora_fine,
+                                 intervallo_settimane, eccezioni, occorrenze)
+        now = timezone.now()
+        occurrences = [occ for occ in occurrences if occ[0] > now]
+        if not occurrences:
+            return False, "La serie non ha occorrenze future.", []
+        if len(occurrences) > cls.MAX_OCCORRENZE:
+            return False, f"La serie supera il limite di {cls.MAX_OCCORRENZE} occorrenze.", []
+
+        try:
+            with transaction.atomic():
+                # Stesso lock di create_booking: serializza le richieste sulla risorsa
+                risorsa = Risorsa.objects.select_for_update().filter(id=risorsa_id).first()
+                if risorsa is None:
+                    return False, "Risorsa non trovata.", []
+                if not risorsa.is_available_for_booking():
+                    return False, "Risorsa non disponibile.", []
+
+                found = cls.find_conflicts(risorsa, occurrences, quantita)
+                conflicts = [(occurrences[i][0], occurrences[i][1], motivo) for i, motivo in sorted(found.items())]
+                if conflicts and not consenti_parziale:
+                    return False, "Alcune occorrenze non sono disponibili.", conflicts
+                accepted = [occ for i, occ in enumerate(occurrences) if i not in found]
+                if not accepted:
+                    return False, "Nessuna occorrenza disponibile.", conflicts
+
+                serie = SeriePrenotazioni.objects.create(
+                    utente=utente,
+                    risorsa=risorsa,
+                    giorni_settimana=sorted(set(giorni_settimana)),
+                    intervallo_settimane=intervallo_settimane,
+                    data_inizio=data_inizio,
+                    data_fine=accepted[-1][0].date() if occorrenze else data_fine,
+                    ora_inizio=ora_inizio,
+                    ora_fine=ora_fine,
+                    eccezioni=sorted(str(d) for d in eccezioni),
+                    quantita=quantita,
+                    scopo=kwargs.get('scopo', ''),
+                    note=kwargs.get('note', ''),
+                )
+                # Stesso stato iniziale delle prenotazioni singole
+                initial_status = BookingStatus.objects.get_or_create(
+                    nome='pending',
+                    defaults={'descrizione': 'In Attesa', 'colore': '#ffc107'}
+                )[0]
+                bookings = Prenotazione.objects.bulk_create([
+                    Prenotazione(
+                        utente=utente, risorsa=risorsa, serie=serie, inizio=inizio, fine=fine,
+                        quantita=quantita, stato=initial_status.nome, **kwargs
+                    )
+                    for inizio, fine in accepted
+                ])
+
+                # Carrelli con dispositivi censiti: stessa assegnazione di create_booking,
+                # le occorrenze senza dispositivi liberi diventano conflitti
+                if risorsa.tipo == 'carrello' and risorsa.dispositivi.exists():
+                    failed = {}
+                    for booking in bookings:
+                        allocated, esito = DeviceService.allocate_devices(booking)
+                        if not allocated:
+                            failed[booking.pk] = (booking.inizio, booking.fine, esito)
+                    if failed:
+                        conflicts = sorted(conflicts + list(failed.values()), key=lambda c: c[0])
+                        bookings = [booking for booking in bookings if booking.pk not in failed]
+                        if not consenti_parziale or not bookings:
+                            transaction.set_rollback(True)
+                            message = ("Alcune occorrenze non sono disponibili." if not consenti_parziale
+                                       else "Nessuna occorrenza disponibile.")
+                            return False, message, conflicts
+                        Prenotazione.all_objects.filter(pk__in=failed).delete()
+                        if occorrenze:
+                            serie.data_fine = bookings[-1].inizio.date()
+                            serie.save(update_fields=['data_fine'])
+
+                BookingSideEffects.dispatch('booking_created', bookings[0], utente, {
+                    'resource': risorsa.nome,
+                    'series': serie.pk,
+                    'occurrences': len(bookings),
+                    'skipped': len(conflicts),
+                })
+            return True, serie, conflicts
+
+        except Exception as e:
+            logger.error(f"Errore creazione serie: {e}")
+            return False, str(e), []
+
+    @classmethod
+    def _future_occurrences(cls, serie, dal=None):
+        now = timezone.now()
+        return serie.occorrenze.filter(inizio__gte=max(dal, now) if dal else now, cancellato_il__isnull=True)
+
+    @classmethod
+    def update_series(cls, serie_id, utente, ora_inizio=None, ora_fine=None, quantita=None, **fields):
+        """Modifica orario, quantità, scopo o note di tutte le occorrenze future.
+
+        Lo spostamento di orario è un'unica UPDATE con `F('inizio') + delta`;
+        se cambiano orario o quantità le nuove occorrenze vengono prima
+        verificate contro le altre prenotazioni (esclusa la serie stessa).
+        Sui carrelli con dispositivi censiti le assegnazioni vengono poi
+        rifatte occorrenza per occorrenza: se una non trova dispositivi
+        liberi la modifica viene annullata e l'occorrenza riportata nei conflitti.
+
+        Returns:
+            tuple: (success, numero occorrenze aggiornate oppure messaggio, conflitti)
+        """
+        from datetime import date, datetime
+        from django.db import transaction
+        from django.db.models import F
+        from .models import SeriePrenotazioni
+
+        allowed = {key: value for key, value in fields.items() if key in ('scopo', 'note')}
+        try:
+            with transaction.atomic():
+                serie = SeriePrenotazioni.objects.select_for_update().select_related('risorsa').get(
+                    pk=serie_id, cancellato_il__isnull=True
+                )
+                if not cls._can_manage(serie, utente):
+                    return False, "Puoi modificare solo le tue serie.", []
+
+                new_start = ora_inizio or serie.ora_inizio
+                new_end = ora_fine or serie.ora_fine
+                new_qty = quantita or serie.quantita
+                if new_start >= new_end:
+                    return False, "L'orario di fine deve essere successivo a quello di inizio.", []
+
+                day = date(2000, 1, 3)
+                delta_start = datetime.combine(day, new_start) - datetime.combine(day, serie.ora_inizio)
+                delta_end = datetime.combine(day, new_end) - datetime.combine(day, serie.ora_fine)
+
+                future = cls._future_occurrences(serie)
+                moved = bool(delta_start or delta_end or new_qty != serie.quantita)
+                ids = []
+                if moved:
+                    rows = list(future.order_by('inizio').values_list('pk', 'inizio', 'fine'))
+                    ids = [pk for pk, _, _ in rows]
+                    occurrences = [(inizio + delta_start, fine + delta_end) for _, inizio, fine in rows]
+                    found = cls.find_conflicts(serie.risorsa, occurrences, new_qty, exclude_serie_id=serie.pk)
+                    if found:
+                        conflicts = [(occurrences[i][0], occurrences[i][1], m) for i, m in sorted(found.items())]
+                        return False, "Il nuovo orario non è disponibile per tutte le occorrenze.", conflicts
+
+                updated = future.update(
+                    inizio=F('inizio') + delta_start,
+                    fine=F('fine') + delta_end,
+                    quantita=new_qty,
+                    modificato_il=timezone.now(),
+                    **allowed
+                )
+
+                # Carrelli con dispositivi censiti: stessa riassegnazione di update_booking
+                risorsa = serie.risorsa
+                if moved and risorsa.tipo == 'carrello' and risorsa.dispositivi.exists():
+                    failed = []
+                    for booking in Prenotazione.objects.filter(pk__in=ids).order_by('inizio'):
+                        allocated, esito = DeviceService.reallocate_devices(booking)
+                        if not allocated:
+                            failed.append((booking.inizio, booking.fine, esito))
+                    if failed:
+                        transaction.set_rollback(True)
+                        return False, "Dispositivi insufficienti per alcune occorrenze.", failed
+
+                SeriePrenotazioni.objects.filter(pk=serie.pk).update(
+                    ora_inizio=new_start, ora_fine=new_end, quantita=new_qty,
+                    modificato_il=timezone.now(), **allowed
+                )
+                first = serie.occorrenze.filter(cancellato_il__isnull=True).order_by('inizio').first()
+                if first:
+                    BookingSideEffects.dispatch('booking_modified', first, utente, {
+                        'series': serie.pk, 'occurrences': updated,
+                    })
+            return True, updated, []
+
+        except SeriePrenotazioni.DoesNotExist:
+            return False, "Serie non trovata.", []
+        except Exception as e:
+            logger.error(f"Errore modifica serie: {e}")
+            return False, str(e), []
+
+    @classmethod
+    def cancel_series(cls, serie_id, utente, dal=None, reason=""):
+        """Annulla con un'unica UPDATE le occorrenze future (o quelle da `dal`).
+
+        Senza `dal` viene annullata anche la serie.
+        """
+        from django.db import transaction
+        from .models import SeriePrenotazioni
+
+        try:
+            with transaction.atomic():
+                serie = SeriePrenotazioni.objects.select_for_update().get(pk=serie_id, cancellato_il__isnull=True)
+                if not cls._can_manage(serie, utente):
+                    return False, "Puoi cancellare solo le tue serie."
+
+                now = timezone.now()
+                future = cls._future_occurrences(serie, dal)
+                first = future.order_by('inizio').first()
+                cancelled = future.update(cancellato_il=now, stato='annullata', modificato_il=now)
+                if dal is None:
+                    SeriePrenotazioni.objects.filter(pk=serie.pk).update(cancellato_il=now, modificato_il=now)
+                if first:
+                    BookingSideEffects.dispatch('booking_cancelled', first, utente, {
+                        'series': serie.pk, 'occurrences': cancelled, 'reason': reason,
+                    })
+            return True, cancelled
+
+        except SeriePrenotazioni.DoesNotExist:
+            return False, "Serie non trovata."
+        except Exception as e:
+            logger.error(f"Errore cancellazione serie: {e}")
+            return False, str(e)
+
+    @classmethod
+    def add_exception(cls, serie_id, utente, giorno):
+        """Esclude un giorno dalla serie annullandone l'occorrenza."""
+        from django.db import transaction
+        from .models import SeriePrenotazioni
+
+        with transaction.atomic():
+            try:
+                serie = SeriePrenotazioni.objects.select_for_update().get(pk=serie_id, cancellato_il__isnull=True)
+            except SeriePrenotazioni.DoesNotExist:
+                return False, "Serie non trovata."
+            if not cls._can_manage(serie, utente):
+                return False, "Puoi modificare solo le tue serie."
+            now = timezone.now()
+            cancelled = serie.occorrenze.filter(inizio__date=giorno, cancellato_il__isnull=True).update(
+                cancellato_il=now, stato='annullata', modificato_il=now
+            )
+            if giorno.isoformat() not in serie.eccezioni:
+                serie.eccezioni = sorted(serie.eccezioni + [giorno.isoformat()])
+                serie.save(update_fields=['eccezioni', 'modificato_il'])
+        return True, cancelled
+
+
+class BulkBookingService:
+    """Operazioni su molte prenotazioni in una sola richiesta.
+
+    Ogni operazione carica tutto quello che serve con una query per tipo di
+    dato (risorse, prenotazioni esistenti nell'intervallo, prenotazioni da
+    modificare), valida gli elementi in memoria e scrive con un solo
+    `bulk_create` o UPDATE dentro una transazione. Il risultato è un esito
+    per elemento; con `tutto_o_niente` un solo errore annulla il lotto.
+    Audit e notifiche passano da `BookingSideEffects.dispatch_many`.
+    """
+
+    MAX_ELEMENTI = 200
+
+    @staticmethod
+    def _esito(indice, booking=None, errore=None):
+        if errore:
+            return {'indice': indice, 'id': getattr(booking, 'pk', None), 'esito': 'errore', 'errore': errore}
+        return {'indice': indice, 'id': booking.pk, 'esito': 'ok'}
+
+    @staticmethod
+    def _check(risorsa, inizio, fine, quantita, existing):
+        """Stesse regole di `BookingService.check_resource_availability` sull'istantanea."""
+        if not risorsa.is_available_for_booking():
+            if risorsa.manutenzione:
+                return "Risorsa in manutenzione."
+            if risorsa.bloccato:
+                return "Risorsa temporaneamente bloccata."
+            return "Risorsa non disponibile."
+        overlapping = [q for start, end, q in existing if start < fine and end > inizio]
+        if risorsa.tipo == 'laboratorio' and overlapping:
+            return "Laboratorio già prenotato in questo periodo."
+        if risorsa.tipo == 'carrello':
+            if not risorsa.capacita_massima:
+                return "Carrello senza capacità definita."
+            disponibile = risorsa.capacita_massima - sum(overlapping)
+            if quantita > disponibile:
+                return f"Disponibilità insufficiente: richieste {quantita}, disponibili {disponibile}."
+        return None
+
+    @classmethod
+    def create_many(cls, utente, items, tutto_o_niente=False):
+        """Crea le prenotazioni `items` = [(indice, dati), ...].
+
+        `dati` ha le chiavi di `BookingService.create_booking` con
+        `risorsa` come id. Gli elementi sono validati in ordine contro le
+        prenotazioni esistenti e quelle già accettate nel lotto.
+
+        Returns:
+            (lista di esiti per elemento, lista di prenotazioni create)
+        """
+        from django.db import transaction
+
+        if not items:
+            return [], []
+        resource_ids = {dati['risorsa'] for _, dati in items}
+        with transaction.atomic():
+            # Come create_booking: le righe delle risorse restano bloccate fino al commit
+            risorse = {r.pk: r for r in Risorsa.objects.select_for_update().filter(pk__in=resource_ids)}
+            snapshot = {}
+            for risorsa_id, inizio, fine, quantita in Prenotazione.objects.filter(
+                risorsa_id__in=risorse,
+                inizio__lt=max(dati['fine'] for _, dati in items),
+                fine__gt=min(dati['inizio'] for _, dati in items),
+                cancellato_il__isnull=True,
+            ).values_list('risorsa_id', 'inizio', 'fine', 'quantita'):
+                snapshot.setdefault(risorsa_id, []).append((inizio, fine, quantita or 1))
+
+            results, accepted = [], []
+            for indice, dati in items:
+                risorsa = risorse.get(dati['risorsa'])
+                quantita = dati.get('quantita', 1)
+                errore = "Risorsa non trovata." if risorsa is None else cls._check(
+                    risorsa, dati['inizio'], dati['fine'], quantita, snapshot.get(risorsa.pk, ())
+                )
+                if errore:
+                    results.append(cls._esito(indice, errore=errore))
+                    continue
+                snapshot.setdefault(risorsa.pk, []).append((dati['inizio'], dati['fine'], quantita))
+                extra = {k: v for k, v in dati.items() if k not in ('risorsa', 'inizio', 'fine', 'quantita')}
+                accepted.append((indice, Prenotazione(
+                    utente=utente, risorsa=risorsa, inizio=dati['inizio'], fine=dati['fine'],
+                    quantita=quantita, **extra
+                )))
+                results.append(None)
+
+            if tutto_o_niente and len(accepted) < len(items):
+                return [r or cls._esito(indice, errore="Lotto annullato per errori in altri elementi.")
+                        for r, (indice, _) in zip(results, items)], []
+
+            initial_status = BookingStatus.objects.get_or_create(
+                nome='pending', defaults={'descrizione': 'In Attesa', 'colore': '#ffc107'}
+            )[0]
+            for _, booking in accepted:
+                booking.stato = initial_status.nome
+            created = Prenotazione.objects.bulk_create([booking for _, booking in accepted])
+
+            # Carrelli con dispositivi censiti: stessa assegnazione di create_booking
+            with_devices = set(Risorsa.dispositivi.through.objects.filter(
+                risorsa_id__in=[r.pk for r in risorse.values() if r.tipo == 'carrello']
+            ).values_list('risorsa_id', flat=True).distinct())
+            failed = {}
+            for indice, booking in accepted:
+                if booking.risorsa_id in with_devices:
+                    allocated, esito = DeviceService.allocate_devices(booking)
+                    if not allocated:
+                        failed[indice] = esito
+            if failed:
+                if tutto_o_niente:
+                    transaction.set_rollback(True)
+                    return [cls._esito(indice, errore=failed.get(indice, "Lotto annullato per errori in altri elementi."))
+                            for indice, _ in items], []
+                Prenotazione.all_objects.filter(pk__in=[b.pk for i, b in accepted if i in failed]).delete()
+
+            by_index = {indice: booking for indice, booking in accepted}
+            results = [
+                r or (cls._esito(indice, errore=failed[indice]) if indice in failed else cls._esito(indice, by_index[indice]))
+                for r, (indice, _) in zip(results, items)
+            ]
+            created = [booking for indice, booking in accepted if indice not in failed]
+            BookingSideEffects.dispatch_many('booking_created', created, utente, {'bulk': True})
+        return results, created
+
+    @classmethod
+    def _load(cls, ids, manager=None):
+        manager = manager or Prenotazione.all_objects
+        return {b.pk: b for b in manager.select_related('utente', 'risorsa').filter(pk__in=ids)}
+
+    @classmethod
+    def cancel_many(cls, utente, ids, reason="", tutto_o_niente=False):
+        """Annulla le prenotazioni `ids` con una sola UPDATE."""
+        from django.db import transaction
+        from django.db.models import F, Value
+        from django.db.models.functions import Concat
+
+        with transaction.atomic():
+            bookings = cls._load(ids)
+            results, ok = [], []
+            for indice, pk in enumerate(ids):
+                booking = bookings.get(pk)
+                if booking is None:
+                    errore = "Prenotazione non trovata."
+                elif booking.cancellato_il is not None:
+                    errore = "Prenotazione già cancellata."
+                elif not booking.can_be_cancelled_by(utente):
+                    errore = "Puoi cancellare solo le tue prenotazioni."
+                else:
+                    errore = None
+                    ok.append(booking)
+                results.append(cls._esito(indice, booking, errore) if errore else cls._esito(indice, booking))
+
+            if tutto_o_niente and len(ok) < len(ids):
+                return [r if r['esito'] == 'errore' else {**r, 'esito': 'errore', 'errore': "Lotto annullato per errori in altri elementi."}
+                        for r in results], []
+
+            now = timezone.now()
+            Prenotazione.all_objects.filter(pk__in=[b.pk for b in ok]).update(
+                cancellato_il=now, stato='annullata', modificato_il=now,
+                note_amministrative=Concat(F('note_amministrative'), Value(f"\nCancellata: {reason}")),
+            )
+            for booking in ok:
+                booking.cancellato_il, booking.stato = now, 'annullata'
+            BookingSideEffects.dispatch_many('booking_cancelled', ok, utente, {'reason': reason, 'bulk': True})
+        return results, ok
+
+    @classmethod
+    def approve_many(cls, utente, ids, tutto_o_niente=False):
+        """Approva le prenotazioni `ids` con una sola UPDATE (solo staff)."""
+        from django.db import transaction
+
+        with transaction.atomic():
+            bookings = cls._load(ids)
+            results, ok = [], []
+            for indice, pk in enumerate(ids):
+                booking = bookings.get(pk)
+                if booking is None:
+                    errore = "Prenotazione non trovata."
+                elif booking.cancellato_il is not None or booking.stato == 'annullata':
+                    errore = "Prenotazione cancellata."
+                elif booking.stato == 'approvata':
+                    errore = "Prenotazione già approvata."
+                else:
+                    errore = None
+                    ok.append(booking)
+                results.append(cls._esito(indice, booking, errore) if errore else cls._esito(indice, booking))
+
+            if tutto_o_niente and len(ok) < len(ids):
+                return [r if r['esito'] == 'errore' else {**r, 'esito': 'errore', 'errore': "Lotto annullato per errori in altri elementi."}
+                        for r in results], []
+
+            now = timezone.now()
+            Prenotazione.all_objects.filter(pk__in=[b.pk for b in ok]).update(
+                stato='approvata', approvazione_richiesta=True, approvato_da=utente,
+                data_approvazione=now, modificato_il=now,
+            )
+            for booking in ok:
+                booking.stato, booking.approvato_da, booking.data_approvazione = 'approvata', utente, now
+            BookingSideEffects.dispatch_many('booking_modified', ok, utente, {'changes': {'stato': 'approvata'}, 'bulk': True})
+        return results, ok
+
+
 # =====================================================
 # SERVIZIO NOTIFICHE
 # =====================================================
@@ -708,7 +1784,83 @@ class NotificationService:
         except Exception:
             logger.exception('Impossibile enqueuere notifica email per utente %s', getattr(user, 'id', None))
             return None
-    
+
+    # Dimensione dei blocchi per gli INSERT multipli delle notifiche
+    BULK_BATCH_SIZE = 500
+
+    @classmethod
+    def enqueue_emails_for_users(cls, users, subject, html_message, messages_by_user=None, related_booking=None, tipo='custom_email'):
+        """Variante bulk di `enqueue_email_for_user`: un INSERT ogni `BULK_BATCH_SIZE` utenti.
+
+        Se `messages_by_user` (dict user.pk -> html) è fornito, il messaggio
+        viene preso da lì invece che da `html_message`.
+        Restituisce il numero di notifiche create.
+        """
+        from django.db import transaction
+
+        now = timezone.now()
+        created = 0
+        try:
+            with transaction.atomic():
+                for start in range(0, len(users), cls.BULK_BATCH_SIZE):
+                    batch = [
+                        Notification(
+                            utente=user,
+                            template=None,
+                            tipo=tipo,
+                            canale='email',
+                            titolo=subject,
+                            messaggio=messages_by_user[user.pk] if messages_by_user is not None else html_message,
+                            dati_aggiuntivi={},
+                            stato='pending',
+                            tentativo_corrente=0,
+                            prossimo_tentativo=now,
+                            related_booking=related_booking
+                        )
+                        for user in users[start:start + cls.BULK_BATCH_SIZE]
+                    ]
+                    Notification.objects.bulk_create(batch)
+                    created += len(batch)
+        except Exception:
+            logger.exception('Impossibile enqueuere %s notifiche email', len(users))
+            return 0
+        return created
+
+    # Template per evento della pipeline delle prenotazioni
+    BOOKING_TEMPLATES = {
+        'booking_created': 'booking_created',
+        'booking_modified': 'booking_updated',
+        'booking_cancelled': 'booking_cancelled',
+    }
+
+    @classmethod
+    def create_booking_notifications_bulk(cls, bookings, template_name):
+        """Una notifica per prenotazione con un solo template e INSERT multipli.
+
+        Il messaggio è reso con lo stesso contesto delle notifiche singole.
+        Restituisce il numero di notifiche create.
+        """
+        template = NotificationTemplate.objects.filter(nome=template_name, attivo=True).first()
+        if template is None:
+            logger.warning(f"Template {template_name} non trovato o non attivo")
+            return 0
+
+        notifications = []
+        for booking in bookings:
+            context = {'booking': booking, 'user': booking.utente, 'resource': booking.risorsa}
+            notifications.append(Notification(
+                utente=booking.utente,
+                template=template,
+                tipo=template.evento,
+                canale=template.tipo,
+                titolo=template.render_template({'title': template.oggetto, **context}),
+                messaggio=template.render_template(context),
+                dati_aggiuntivi={'booking_id': booking.pk, 'resource': booking.risorsa.nome},
+                related_booking=booking,
+            ))
+        Notification.objects.bulk_create(notifications, batch_size=cls.BULK_BATCH_SIZE)
+        return len(notifications)
+
     @classmethod
     def create_booking_update_notifications(cls, booking):
         """Crea notifiche per aggiornamento prenotazione."""
@@ -803,13 +1955,156 @@ class NotificationService:
         notification.save()
 
 
+class BookingReminderService:
+    """Promemoria delle prenotazioni in arrivo, accodati come notifiche email.
+
+    Gli orizzonti (es. 24h e 1h prima dell'inizio) vengono da
+    `PROMEMORIA_ORIZZONTI_ORE`. Un solo passaggio sull'indice
+    (inizio, fine) trova le prenotazioni che iniziano entro l'orizzonte più
+    ampio; quelle che hanno già ricevuto il promemoria dell'orizzonte sono
+    escluse grazie a `notifiche_inviate`. Le altre vengono lavorate a
+    blocchi: una SELECT con lock (SKIP LOCKED dove supportato, così più
+    istanze non inviano doppioni), rendering con il template già
+    compilato, un `bulk_create` delle notifiche e un `bulk_update` dei
+    marcatori nella stessa transazione.
+
+    Se una prenotazione rientra in più orizzonti (creata a ridosso
+    dell'inizio o scheduler fermo) parte solo il promemoria più vicino e
+    gli altri vengono marcati come inviati.
+    """
+
+    DEFAULT_HORIZONS_HOURS = (24, 1)
+    BATCH_SIZE = 500
+    TEMPLATE_NAME = 'emails/booking_reminder.html'
+    NOTIFICATION_TYPE = 'booking_reminder'
+
+    @classmethod
+    def horizons(cls, hours=None):
+        """Orizzonti come timedelta, dal più ampio al più stretto."""
+        if hours is None:
+            hours = getattr(settings, 'PROMEMORIA_ORIZZONTI_ORE', None) or cls.DEFAULT_HORIZONS_HOURS
+        result = sorted({timedelta(hours=float(h)) for h in hours}, reverse=True)
+        if not result or result[-1] <= timedelta(0):
+            raise ValueError('Gli orizzonti dei promemoria devono essere positivi')
+        return result
+
+    @staticmethod
+    def marker(horizon):
+        """Voce di `notifiche_inviate` per l'orizzonte (es. promemoria_24h, promemoria_90m)."""
+        minutes = int(horizon.total_seconds() // 60)
+        return f'promemoria_{minutes // 60}h' if minutes % 60 == 0 else f'promemoria_{minutes}m'
+
+    @classmethod
+    def _due(cls, inizio, inviate, now, horizons):
+        """(orizzonte da inviare, marcatori da aggiungere) o None se non c'è nulla da fare."""
+        inviate = set(inviate or ())
+        remaining = inizio - now
+        reached = [h for h in horizons if remaining <= h]
+        if not reached or cls.marker(reached[-1]) in inviate:
+            return None
+        return reached[-1], [cls.marker(h) for h in reached if cls.marker(h) not in inviate]
+
+    @classmethod
+    def find_due(cls, now=None, horizons=None):
+        """Una query sull'intervallo di inizio: [(id, orizzonte)] dei promemoria da inviare."""
+        now = now or timezone.now()
+        horizons = horizons or cls.horizons()
+        rows = Booking.objects.filter(
+            inizio__gt=now, inizio__lte=now + horizons[0],
+        ).exclude(
+            stato__in=DeviceService.STATI_PRENOTAZIONE_LIBERI,
+        ).values_list('id', 'inizio', 'notifiche_inviate')
+        due = []
+        for pk, inizio, inviate in rows.iterator(chunk_size=2000):
+            if cls._due(inizio, inviate, now, horizons) is not None:
+                due.append(pk)
+        return due
+
+    @classmethod
+    def run(cls, now=None, horizons=None, batch_size=None, dry_run=False):
+        """Accoda i promemoria dovuti e restituisce le statistiche del passaggio."""
+        from django.db import connection, transaction
+        from django.template.loader import get_template
+
+        now = now or timezone.now()
+        horizons = horizons or cls.horizons()
+        batch_size = batch_size or cls.BATCH_SIZE
+        due = cls.find_due(now, horizons)
+        stats = {'dovuti': len(due), 'accodati': 0, 'senza_email': 0,
+                 'per_orizzonte': {cls.marker(h): 0 for h in horizons}}
+        if dry_run or not due:
+            return stats
+
+        template = get_template(cls.TEMPLATE_NAME)
+        school_info = SchoolInfo.ottieni_snapshot()
+        features = connection.features
+        for start in range(0, len(due), batch_size):
+            with transaction.atomic():
+                qs = Booking.objects.filter(pk__in=due[start:start + batch_size]).select_related('utente', 'risorsa')
+                if features.has_select_for_update_skip_locked and features.has_select_for_update_of:
+                    qs = qs.select_for_update(skip_locked=True, of=('self',))
+                notifications, updated = [], []
+                for booking in qs:
+                    # Ricontrollo sotto lock: un'altra istanza può averlo già inviato
+                    result = cls._due(booking.inizio, booking.notifiche_inviate, now, horizons)
+                    if result is None:
+                        continue
+                    horizon, markers = result
+                    booking.notifiche_inviate = list(booking.notifiche_inviate or []) + markers
+                    booking.ultimo_aggiornamento_notifica = now
+                    updated.append(booking)
+                    if not booking.utente.email:
+                        stats['senza_email'] += 1
+                        continue
+                    hours_until = max(1, round((booking.inizio - now).total_seconds() / 3600))
+                    notifications.append(Notification(
+                        utente=booking.utente,
+                        tipo=cls.NOTIFICATION_TYPE,
+                        canale='email',
+                        titolo=f"Promemoria Prenotazione - {booking.risorsa.nome}",
+                        messaggio=template.render({
+                            'booking': booking, 'user': booking.utente, 'resource': booking.risorsa,
+                            'school_info': school_info, 'hours_until': hours_until,
+                        }),
+                        dati_aggiuntivi={'booking_id': booking.pk, 'promemoria': cls.marker(horizon)},
+                        stato='pending',
+                        prossimo_tentativo=now,
+                        related_booking=booking,
+                    ))
+                    stats['per_orizzonte'][cls.marker(horizon)] += 1
+                Notification.objects.bulk_create(notifications, batch_size=NotificationService.BULK_BATCH_SIZE)
+                Booking.objects.bulk_update(updated, ['notifiche_inviate', 'ultimo_aggiornamento_notifica'])
+                stats['accodati'] += len(notifications)
+
+        if stats['accodati']:
+            logger.info('Promemoria accodati: %s', stats)
+        return stats
+
+
+# Hook predefiniti della pipeline: prima l'audit, poi le notifiche
+for _event in BookingSideEffects.EVENTS:
+    BookingSideEffects.register(_event, BookingSideEffects.audit, batch=BookingSideEffects.audit_many)
+    BookingSideEffects.register(_event, BookingSideEffects.notify, batch=BookingSideEffects.notify_many)
+
+
 # =====================================================
 # SERVIZI DISPOSITIVI E RISORSE
 # =====================================================
 
 class DeviceService:
-    """Servizio per gestione dispositivi."""
-    
+    """Servizio per gestione dispositivi.
+
+    I dispositivi concreti di una prenotazione sono le righe di
+    `PrenotazioneDispositivo`: un dispositivo è occupato in [inizio, fine)
+    se ha un'assegnazione attiva su una prenotazione valida che si
+    sovrappone all'intervallo.
+    """
+
+    # Assegnazioni che tengono occupato il dispositivo
+    STATI_ASSEGNAZIONE_ATTIVI = ('assegnato', 'in_preparazione')
+    # Prenotazioni che non occupano più i dispositivi assegnati
+    STATI_PRENOTAZIONE_LIBERI = ('annullata', 'rifiutata', 'completata')
+
     @classmethod
     def get_available_devices(cls, resource=None, device_type=None):
         """Ottiene dispositivi disponibili."""
@@ -821,32 +2116,151 @@ class DeviceService:
             query = query.filter(tipo=device_type)
         
         return query.select_related('categoria').order_by('marca', 'nome')
-    
+
+    @classmethod
+    def busy_assignments(cls, start, end, exclude_booking_id=None):
+        """Assegnazioni attive che si sovrappongono a [start, end)."""
+        from .models import PrenotazioneDispositivo
+
+        query = PrenotazioneDispositivo.objects.filter(
+            stato_assegnazione__in=cls.STATI_ASSEGNAZIONE_ATTIVI,
+            prenotazione__inizio__lt=end,
+            prenotazione__fine__gt=start,
+            prenotazione__cancellato_il__isnull=True,
+        ).exclude(prenotazione__stato__in=cls.STATI_PRENOTAZIONE_LIBERI)
+
+        if exclude_booking_id:
+            query = query.exclude(prenotazione_id=exclude_booking_id)
+        return query
+
     @classmethod
     def check_device_availability(cls, device, start, end, exclude_booking_id=None):
         """Controlla disponibilità dispositivo specifico."""
-        query = Prenotazione.objects.filter(
-            dispositivi_selezionati=device,
-            inizio__lt=end,
-            fine__gt=start,
-            cancellato_il__isnull=True
+        device_id = getattr(device, 'pk', device)
+        return not cls.busy_assignments(start, end, exclude_booking_id).filter(dispositivo_id=device_id).exists()
+
+    @classmethod
+    def free_devices(cls, risorsa, start, end, tipo=None, exclude_booking_id=None):
+        """Dispositivi della risorsa utilizzabili in [start, end), dal meno usurato.
+
+        Una sola query: l'occupazione è un NOT EXISTS sulle assegnazioni
+        sovrapposte, l'usura il numero di assegnazioni ricevute finora
+        (a parità, prima chi è stato assegnato meno di recente).
+        """
+        from django.db.models import Exists, F, Max, OuterRef
+
+        busy = cls.busy_assignments(start, end, exclude_booking_id).filter(dispositivo_id=OuterRef('pk'))
+        query = Dispositivo.objects.filter(risorse=risorsa, attivo=True, stato='disponibile')
+        if tipo:
+            query = query.filter(tipo=tipo)
+        return (
+            query.annotate(occupato=Exists(busy))
+            .filter(occupato=False)
+            .annotate(
+                num_assegnazioni=Count('assegnazioni_prenotazione'),
+                ultima_assegnazione=Max('assegnazioni_prenotazione__data_assegnazione'),
+            )
+            .order_by('num_assegnazioni', F('ultima_assegnazione').asc(nulls_first=True), 'pk')
         )
-        
-        if exclude_booking_id:
-            query = query.exclude(id=exclude_booking_id)
-        
-        return not query.exists()
-    
+
+    @classmethod
+    def allocate_devices(cls, prenotazione, quantita=None, tipo=None):
+        """Assegna alla prenotazione `quantita` dispositivi liberi della risorsa.
+
+        Sceglie i dispositivi meno usurati fra quelli liberi nell'intervallo
+        della prenotazione e crea le righe `PrenotazioneDispositivo` con un
+        solo `bulk_create`: per un carrello da 30 portatili servono due
+        query, non trenta. Va chiamato con la riga della risorsa bloccata (come fa
+        `BookingService.create_booking`) per evitare doppie assegnazioni.
+
+        Returns:
+            (success, lista di PrenotazioneDispositivo | messaggio)
+        """
+        from .models import PrenotazioneDispositivo
+
+        richiesti = prenotazione.quantita if quantita is None else quantita
+        if richiesti <= 0:
+            return True, []
+
+        candidati = list(
+            cls.free_devices(prenotazione.risorsa_id, prenotazione.inizio, prenotazione.fine, tipo,
+                             exclude_booking_id=prenotazione.pk)
+            .exclude(assegnazioni_prenotazione__prenotazione=prenotazione)[:richiesti]
+        )
+        if len(candidati) < richiesti:
+            return False, f"Dispositivi liberi insufficienti: {len(candidati)} su {richiesti} richiesti."
+
+        assegnazioni = PrenotazioneDispositivo.objects.bulk_create([
+            PrenotazioneDispositivo(prenotazione=prenotazione, dispositivo=dispositivo)
+            for dispositivo in candidati
+        ])
+        if slot_index.enabled():
+            from django.db import transaction
+            inizio, fine = prenotazione.inizio, prenotazione.fine
+            transaction.on_commit(lambda: slot_index.invalidate(inizio, fine))
+        return True, assegnazioni
+
+    @classmethod
+    def reallocate_devices(cls, prenotazione, tipo=None):
+        """Riassegna i dispositivi dopo uno spostamento o un cambio di quantità.
+
+        Le assegnazioni attive vengono eliminate, non restituite: per il
+        nuovo intervallo non sono mai state consegnate. Poi `allocate_devices`
+        sceglie di nuovo fra i dispositivi liberi. Va chiamato nella
+        transazione che ha salvato i nuovi orari, con la riga della risorsa
+        bloccata; se l'esito è negativo il chiamante fa rollback. I giorni
+        del vecchio intervallo nell'indice per ora li invalida l'hook della
+        pipeline su `booking_modified`.
+        """
+        prenotazione.dispositivi_assegnati.filter(
+            stato_assegnazione__in=cls.STATI_ASSEGNAZIONE_ATTIVI
+        ).delete()
+        return cls.allocate_devices(prenotazione, tipo=tipo)
+
+    @classmethod
+    def release_devices(cls, prenotazione, stato='restituito'):
+        """Chiude con una sola UPDATE le assegnazioni attive della prenotazione."""
+        released = prenotazione.dispositivi_assegnati.filter(
+            stato_assegnazione__in=cls.STATI_ASSEGNAZIONE_ATTIVI
+        ).update(stato_assegnazione=stato, data_restituzione=timezone.now())
+        if released and slot_index.enabled():
+            from django.db import transaction
+            transaction.on_commit(lambda: slot_index.invalidate(prenotazione.inizio, prenotazione.fine))
+        return released
+
+    @classmethod
+    def free_devices_in_periods(cls, risorsa, giorno, primo, ultimo):
+        """Pk dei dispositivi della risorsa liberi dal periodo `primo` a `ultimo`.
+
+        Con `SLOT_INDEX_ENABLED` l'occupazione viene dall'indice per ora di
+        lezione (operazioni bit a bit, nessun join); altrimenti dalla query
+        esatta sugli intervalli.
+        """
+        periodi = slot_index.periods()
+        if not 0 <= primo <= ultimo < len(periodi):
+            raise ValueError(f'Periodi non validi: {primo}-{ultimo} (disponibili 0-{len(periodi) - 1})')
+        if slot_index.enabled():
+            candidati = Dispositivo.objects.filter(
+                risorse=risorsa, attivo=True, stato='disponibile'
+            ).order_by('pk').values_list('pk', flat=True)
+            return slot_index.free_devices(list(candidati), giorno, primo, ultimo)
+
+        from datetime import datetime
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(giorno, periodi[primo][0]), tz)
+        end = timezone.make_aware(datetime.combine(giorno, periodi[ultimo][1]), tz)
+        return sorted(cls.free_devices(risorsa, start, end).values_list('pk', flat=True))
+
     @classmethod
     def get_device_usage_stats(cls, device, days=30):
         """Statistiche utilizzo dispositivo."""
         start_date = timezone.now() - timedelta(days=days)
         
         bookings = Prenotazione.objects.filter(
-            dispositivi_selezionati=device,
+            dispositivi_assegnati__dispositivo=device,
             inizio__gte=start_date,
             cancellato_il__isnull=True
-        )
+        ).only('inizio', 'fine')
 
         total_bookings = bookings.count()
         total_hours = 0
@@ -934,6 +2348,192 @@ class ResourceService:
         return None
 
 
+class AvailabilityMatrixService:
+    """Matrice di disponibilità delle risorse per la vista settimanale.
+
+    Per ogni risorsa attiva restituisce gli intervalli occupati codificati
+    a run-length: `[inizio, fine, usato, residuo]` in minuti dall'inizio
+    della matrice, un segmento per ogni tratto a occupazione costante.
+    `usato` è il numero di prenotazioni (laboratori) o la quantità
+    prenotata (carrelli), `residuo` la capacità che resta (None per i tipi
+    senza vincolo di capacità), con le stesse regole di
+    `BookingService.check_resource_availability`.
+
+    Il calcolo è per settimana (da lunedì): una query sulle risorse e una
+    sulle prenotazioni di tutte le settimane mancanti, raggruppate in
+    Python. Ogni settimana è in cache per (lunedì, tipo) e viene scartata
+    dopo il commit di ogni scrittura che la tocca.
+    """
+
+    CACHE_PREFIX = 'availability_matrix:v1'
+    CACHE_TIMEOUT = 60 * 10
+    MAX_SETTIMANE = 6
+
+    @staticmethod
+    def week_start(giorno):
+        return giorno - timedelta(days=giorno.weekday())
+
+    @classmethod
+    def _key(cls, monday, tipo):
+        return f'{cls.CACHE_PREFIX}:{monday.isoformat()}:{tipo or "tutti"}'
+
+    @staticmethod
+    def _midnight(giorno):
+        from datetime import datetime, time as dt_time
+        return timezone.make_aware(datetime.combine(giorno, dt_time.min))
+
+    @classmethod
+    def get_matrix(cls, da, a=None, tipo=None):
+        """Matrice dal lunedì della settimana di `da` alla fine di quella di `a`."""
+        from django.core.cache import cache
+
+        if tipo and tipo not in dict(Risorsa.TIPO_RISORSA):
+            raise ValueError(f"Tipo risorsa non valido: {tipo}")
+        first = cls.week_start(da)
+        last = cls.week_start(a or da)
+        if last < first:
+            raise ValueError("La data finale precede quella iniziale.")
+        mondays = [first + timedelta(weeks=k) for k in range((last - first).days // 7 + 1)]
+        if len(mondays) > cls.MAX_SETTIMANE:
+            raise ValueError(f"Al massimo {cls.MAX_SETTIMANE} settimane per richiesta.")
+
+        cached = cache.get_many([cls._key(monday, tipo) for monday in mondays])
+        weeks = {monday: cached.get(cls._key(monday, tipo)) for monday in mondays}
+        missing = [monday for monday, data in weeks.items() if data is None]
+        if missing:
+            built = cls._build_weeks(missing, tipo)
+            cache.set_many({cls._key(monday, tipo): data for monday, data in built.items()}, cls.CACHE_TIMEOUT)
+            weeks.update(built)
+
+        start = cls._midnight(first)
+        risorse = {}
+        for monday in mondays:
+            shift = int((cls._midnight(monday) - start).total_seconds() // 60)
+            for entry in weeks[monday]:
+                row = risorse.setdefault(entry['id'], {**entry, 'occupato': []})
+                row['occupato'].extend([s + shift, e + shift, used, left] for s, e, used, left in entry['occupato'])
+        return {
+            'da': start.isoformat(),
+            'a': cls._midnight(last + timedelta(weeks=1)).isoformat(),
+            'tipo': tipo,
+            'unita': 'minuti',
+            'risorse': list(risorse.values()),
+        }
+
+    @classmethod
+    def _build_weeks(cls, mondays, tipo=None):
+        """Calcola le settimane indicate con due query in tutto."""
+        risorse = Risorsa.objects.filter(attivo=True)
+        if tipo:
+            risorse = risorse.filter(tipo=tipo)
+        risorse = list(risorse.order_by('tipo', 'nome').values(
+            'id', 'nome', 'tipo', 'capacita_massima', 'manutenzione', 'bloccato'
+        ))
+        bounds = [(cls._midnight(monday), cls._midnight(monday + timedelta(weeks=1))) for monday in mondays]
+        rows = Prenotazione.objects.filter(
+            risorsa_id__in=[r['id'] for r in risorse],
+            inizio__lt=max(end for _, end in bounds),
+            fine__gt=min(start for start, _ in bounds),
+            cancellato_il__isnull=True,
+        ).values_list('risorsa_id', 'inizio', 'fine', 'quantita')
+
+        by_resource = {}
+        for risorsa_id, inizio, fine, quantita in rows:
+            by_resource.setdefault(risorsa_id, []).append((inizio, fine, quantita or 1))
+
+        weeks = {}
+        for monday, (week_start, week_end) in zip(mondays, bounds):
+            entries = []
+            for risorsa in risorse:
+                if risorsa['tipo'] == 'laboratorio':
+                    capacita, weight = 1, None
+                elif risorsa['tipo'] == 'carrello':
+                    capacita, weight = risorsa['capacita_massima'] or 0, 'quantita'
+                else:
+                    capacita, weight = None, None
+                intervals = [
+                    (max(inizio, week_start), min(fine, week_end), quantita if weight else 1)
+                    for inizio, fine, quantita in by_resource.get(risorsa['id'], ())
+                    if inizio < week_end and fine > week_start
+                ]
+                entries.append({
+                    'id': risorsa['id'],
+                    'nome': risorsa['nome'],
+                    'tipo': risorsa['tipo'],
+                    'capacita': capacita,
+                    'prenotabile': not (risorsa['manutenzione'] or risorsa['bloccato']),
+                    'occupato': cls._runs(intervals, week_start, capacita),
+                })
+            weeks[monday] = entries
+        return weeks
+
+    @staticmethod
+    def _runs(intervals, origin, capacita):
+        """Sweep sugli estremi: segmenti [inizio, fine, usato, residuo] a occupazione costante."""
+        deltas = {}
+        for inizio, fine, amount in intervals:
+            deltas[inizio] = deltas.get(inizio, 0) + amount
+            deltas[fine] = deltas.get(fine, 0) - amount
+        runs, used, previous = [], 0, None
+        for point in sorted(deltas):
+            if used > 0 and previous is not None and point > previous:
+                start = int((previous - origin).total_seconds() // 60)
+                end = int((point - origin).total_seconds() // 60)
+                if runs and runs[-1][1] == start and runs[-1][2] == used:
+                    runs[-1][1] = end
+                else:
+                    left = max(capacita - used, 0) if capacita is not None else None
+                    runs.append([start, end, used, left])
+            used += deltas[point]
+            previous = point
+        return runs
+
+    @classmethod
+    def invalidate(cls, inizio, fine):
+        """Scarta dalla cache le settimane toccate da [inizio, fine), per ogni tipo."""
+        from django.core.cache import cache
+
+        first = cls.week_start(timezone.localtime(inizio).date())
+        last = cls.week_start(timezone.localtime(fine).date())
+        tipi = [None] + [code for code, _ in Risorsa.TIPO_RISORSA]
+        keys = []
+        monday = first
+        while monday <= last:
+            keys.extend(cls._key(monday, tipo) for tipo in tipi)
+            monday += timedelta(weeks=1)
+        cache.delete_many(keys)
+
+    @classmethod
+    def on_booking_event(cls, event, booking, user, dettagli):
+        """Hook della pipeline: invalida le settimane della prenotazione.
+
+        Per le serie l'evento arriva una sola volta, quindi si scarta tutto
+        l'intervallo della serie; per gli spostamenti anche quello precedente.
+        """
+        from datetime import datetime
+
+        dettagli = dettagli or {}
+        inizio, fine = booking.inizio, booking.fine
+        if dettagli.get('series') and booking.serie_id:
+            from .models import SeriePrenotazioni
+            serie = SeriePrenotazioni.objects.filter(pk=booking.serie_id).values('data_inizio', 'data_fine').first()
+            if serie:
+                inizio = min(inizio, cls._midnight(serie['data_inizio']))
+                fine = max(fine, cls._midnight(serie['data_fine'] + timedelta(days=1)))
+        cls.invalidate(inizio, fine)
+        previous = dettagli.get('previous') or {}
+        if previous.get('start') and previous.get('end'):
+            cls.invalidate(datetime.fromisoformat(previous['start']), datetime.fromisoformat(previous['end']))
+
+
+# L'indice per ora di lezione si aggiorna su modifiche e annullamenti
+for _event in ('booking_modified', 'booking_cancelled'):
+    BookingSideEffects.register(_event, slot_index.on_booking_event)
+# La matrice settimanale va scartata a ogni scrittura
+for _event in BookingSideEffects.EVENTS:
+    BookingSideEffects.register(_event, AvailabilityMatrixService.on_booking_event)
+
+
 # =====================================================
 # SERVIZI SISTEMA E MONITORAGGIO
 # =====================================================
@@ -1110,6 +2710,415 @@ class SystemService:
         return alerts
 
 
+# =====================================================
+# EXPORT DATI
+# =====================================================
+
+class _Echo:
+    """Buffer fittizio per `csv.writer`: restituisce la riga invece di scriverla."""
+
+    def write(self, value):
+        return value
+
+
+class ExportService:
+    """Export in streaming (CSV/NDJSON) di prenotazioni, log e notifiche.
+
+    Le righe vengono lette con `values_list(...).iterator(chunk_size=...)`,
+    quindi senza istanziare modelli e con memoria costante.
+    """
+
+    FORMATS = ('csv', 'ndjson')
+    DEFAULT_CHUNK_SIZE = 2000
+
+    # dataset -> (manager, colonne, campo data, campo risorsa, campo utente)
+    DATASETS = {
+        'prenotazioni': (
+            Prenotazione.all_objects,
+            ['id', 'utente_id', 'utente__username', 'risorsa_id', 'risorsa__codice', 'risorsa__nome',
+             'inizio', 'fine', 'quantita', 'stato', 'priorita', 'scopo', 'creato_il', 'cancellato_il'],
+            'inizio', 'risorsa_id', 'utente_id',
+        ),
+        'log': (
+            SystemLog.objects,
+            ['id', 'timestamp', 'livello', 'tipo_evento', 'utente_id', 'utente__username',
+             'messaggio', 'dettagli', 'ip_address'],
+            'timestamp', None, 'utente_id',
+        ),
+        'notifiche': (
+            Notification.objects,
+            ['id', 'creato_il', 'utente_id', 'utente__username', 'tipo', 'canale', 'stato', 'titolo',
+             'related_booking_id', 'tentativo_corrente', 'inviata_il', 'errore_messaggio'],
+            'creato_il', 'related_booking__risorsa_id', 'utente_id',
+        ),
+    }
+
+    @classmethod
+    def get_queryset(cls, dataset, date_from=None, date_to=None, risorsa_id=None, utente_id=None, include_cancelled=False):
+        """QuerySet di tuple per il dataset richiesto.
+
+        `date_from`/`date_to` sono date incluse (o datetime). Solleva
+        ValueError per dataset o filtri non supportati.
+        """
+        if dataset not in cls.DATASETS:
+            raise ValueError(f"Dataset non supportato: {dataset}")
+        manager, columns, date_field, risorsa_field, utente_field = cls.DATASETS[dataset]
+
+        query = manager.all()
+        if dataset == 'prenotazioni' and not include_cancelled:
+            query = query.filter(cancellato_il__isnull=True)
+        if date_from:
+            query = query.filter(**{f'{date_field}__gte': as_aware_datetime(date_from)})
+        if date_to:
+            # Intervallo semiaperto: le date di fine sono incluse per intero
+            end = as_aware_datetime(date_to)
+            if not hasattr(date_to, 'hour'):
+                end += timedelta(days=1)
+            query = query.filter(**{f'{date_field}__lt': end})
+        if risorsa_id:
+            if risorsa_field is None:
+                raise ValueError(f"Il filtro per risorsa non è disponibile per '{dataset}'")
+            query = query.filter(**{risorsa_field: risorsa_id})
+        if utente_id:
+            query = query.filter(**{utente_field: utente_id})
+
+        return query.order_by('pk').values_list(*columns)
+
+    @classmethod
+    def columns(cls, dataset):
+        return cls.DATASETS[dataset][1]
+
+    @classmethod
+    def iter_rows(cls, queryset, chunk_size=None):
+        return queryset.iterator(chunk_size=chunk_size or cls.DEFAULT_CHUNK_SIZE)
+
+    @classmethod
+    def stream(cls, dataset, fmt='csv', chunk_size=None, **filters):
+        """Generatore di stringhe (una per riga) nel formato richiesto."""
+        import csv
+        import json
+        from django.core.serializers.json import DjangoJSONEncoder
+
+        if fmt not in cls.FORMATS:
+            raise ValueError(f"Formato non supportato: {fmt}")
+        queryset = cls.get_queryset(dataset, **filters)
+        columns = cls.columns(dataset)
+
+        def generate():
+            if fmt == 'csv':
+                writer = csv.writer(_Echo())
+                yield writer.writerow(columns)
+                for row in cls.iter_rows(queryset, chunk_size):
+                    yield writer.writerow([
+                        json.dumps(v, cls=DjangoJSONEncoder) if isinstance(v, (dict, list))
+                        else (v.isoformat() if hasattr(v, 'isoformat') else v)
+                        for v in row
+                    ])
+            else:
+                encoder = DjangoJSONEncoder(ensure_ascii=False)
+                for row in cls.iter_rows(queryset, chunk_size):
+                    yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+        return generate()
+
+
+# =====================================================
+# FEED CALENDARIO (ICS)
+# =====================================================
+
+class CalendarFeedService:
+    """Feed iCalendar per risorsa e per utente.
+
+    Il validatore (ETag) copre tutto ciò che il feed mostra: una query
+    aggregata dà `max(modificato_il)` e numero delle prenotazioni nella
+    finestra e `max(modificato_il)` delle loro risorse (nomi in SUMMARY e
+    LOCATION); il titolo entra nell'ETag così com'è; per il feed di una
+    risorsa una seconda query legge gli username mostrati, perché `User`
+    non ha un timestamp di modifica. Il corpo del feed è in cache sotto una
+    chiave che contiene il validatore: qualsiasi modifica cambia il
+    validatore e rende obsoleta la copia in cache. Niente Last-Modified:
+    un cambio di username non ha una data da confrontare.
+    """
+
+    KINDS = ('risorsa', 'utente')
+    PAST_DAYS = 30
+    FUTURE_DAYS = 180
+    CACHE_TIMEOUT = 60 * 60 * 24
+    SALT = 'prenotazioni.calendar-feed'
+
+    @classmethod
+    def _window(cls):
+        from datetime import datetime, time as dt_time
+        today = timezone.localdate()
+        start = timezone.make_aware(datetime.combine(today - timedelta(days=cls.PAST_DAYS), dt_time.min))
+        return start, start + timedelta(days=cls.PAST_DAYS + cls.FUTURE_DAYS)
+
+    @classmethod
+    def _queryset(cls, kind, obj_id):
+        if kind not in cls.KINDS:
+            raise ValueError(f"Feed non supportato: {kind}")
+        start, end = cls._window()
+        # all_objects: le cancellate restano nel feed come STATUS:CANCELLED
+        # così i client rimuovono l'evento invece di mantenerlo in eterno
+        return Prenotazione.all_objects.filter(
+            **{f'{kind}_id': obj_id}, inizio__lt=end, fine__gt=start
+        )
+
+    @classmethod
+    def validator(cls, kind, obj_id, title=''):
+        """Restituisce l'ETag del feed (`title` è il titolo mostrato)."""
+        import hashlib
+        from django.contrib.auth import get_user_model
+        from django.db.models import Max
+
+        start, end = cls._window()
+        agg = cls._queryset(kind, obj_id).aggregate(
+            last=Max('modificato_il'), total=Count('id'), risorse=Max('risorsa__modificato_il'),
+        )
+        shown = [title]
+        if kind == 'risorsa':
+            shown.extend(
+                get_user_model().objects.filter(
+                    prenotazioni__risorsa_id=obj_id, prenotazioni__inizio__lt=end, prenotazioni__fine__gt=start,
+                ).order_by('pk').values_list('username', flat=True).distinct()
+            )
+        stamps = '-'.join(str(int(value.timestamp() * 1000000)) if value else '0'
+                          for value in (agg['last'], agg['risorse']))
+        digest = hashlib.sha1('\n'.join(shown).encode('utf-8')).hexdigest()[:16]
+        return f'"{kind}-{obj_id}-{start:%Y%m%d}-{stamps}-{agg["total"]}-{digest}"'
+
+    @classmethod
+    def feed_token(cls, kind, obj_id):
+        """Token di accesso per i client calendario (che non hanno sessione)."""
+        from django.core import signing
+        return signing.Signer(salt=cls.SALT).sign(f'{kind}:{obj_id}').rsplit(':', 1)[1]
+
+    @classmethod
+    def check_token(cls, kind, obj_id, token):
+        from django.utils.crypto import constant_time_compare
+        return bool(token) and constant_time_compare(token, cls.feed_token(kind, obj_id))
+
+    @classmethod
+    def get_body(cls, kind, obj_id, etag, title):
+        """Corpo del feed, generato al massimo una volta per validatore."""
+        from django.core.cache import cache
+        key = f'ics:{kind}:{obj_id}:{etag.strip(chr(34))}'
+        body = cache.get(key)
+        if body is None:
+            body = cls.render(kind, obj_id, title)
+            cache.set(key, body, cls.CACHE_TIMEOUT)
+        return body
+
+    @staticmethod
+    def _escape(value):
+        return (str(value or '').replace('\\', '\\\\').replace(';', '\\;')
+                .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+    @staticmethod
+    def _fold(line):
+        """Piega le righe oltre i 75 ottetti (RFC 5545 §3.1)."""
+        raw = line.encode('utf-8')
+        if len(raw) <= 75:
+            return line
+        parts, current = [], b''
+        for char in line:
+            encoded = char.encode('utf-8')
+            if len(current) + len(encoded) > (75 if not parts else 74):
+                parts.append(current.decode('utf-8'))
+                current = b''
+            current += encoded
+        parts.append(current.decode('utf-8'))
+        return '\r\n '.join(parts)
+
+    @staticmethod
+    def _ics_datetime(value):
+        from datetime import timezone as dt_timezone
+        return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    @classmethod
+    def render(cls, kind, obj_id, title):
+        """Genera il documento iCalendar con una sola query sull'intervallo."""
+        rows = cls._queryset(kind, obj_id).order_by('inizio', 'pk').values_list(
+            'pk', 'inizio', 'fine', 'stato', 'scopo', 'quantita', 'modificato_il', 'cancellato_il',
+            'risorsa__nome', 'utente__username',
+        )
+        lines = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//Sistema Prenotazioni Scolastiche//IT',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            f'X-WR-CALNAME:{cls._escape(title)}',
+        ]
+        for pk, inizio, fine, stato, scopo, quantita, modificato, cancellato, risorsa, username in rows:
+            if cancellato or stato == 'annullata':
+                status = 'CANCELLED'
+            elif stato in ('bozza', 'in_attesa_approvazione'):
+                status = 'TENTATIVE'
+            else:
+                status = 'CONFIRMED'
+            summary = f'{risorsa} - {username}' if kind == 'risorsa' else risorsa
+            description = scopo or ''
+            if quantita and quantita > 1:
+                description = f'{description} (quantità: {quantita})'.strip()
+            lines.extend([
+                'BEGIN:VEVENT',
+                f'UID:prenotazione-{pk}@prenotazioni',
+                f'DTSTAMP:{cls._ics_datetime(modificato)}',
+                f'LAST-MODIFIED:{cls._ics_datetime(modificato)}',
+                f'SEQUENCE:{int(modificato.timestamp())}',
+                f'DTSTART:{cls._ics_datetime(inizio)}',
+                f'DTEND:{cls._ics_datetime(fine)}',
+                f'SUMMARY:{cls._escape(summary)}',
+                f'DESCRIPTION:{cls._escape(description)}',
+                f'LOCATION:{cls._escape(risorsa)}',
+                f'STATUS:{status}',
+                'END:VEVENT',
+            ])
+        lines.append('END:VCALENDAR')
+        return '\r\n'.join(cls._fold(line) for line in lines) + '\r\n'
+
+
+# =====================================================
+# DATABASE VIEWER
+# =====================================================
+
+class DatabaseViewerService:
+    """Sezioni del database viewer con paginazione keyset.
+
+    Ogni sezione legge solo le colonne mostrate (`values`) e pagina per
+    `pk` decrescente: la pagina successiva parte da `pk < cursore`, quindi
+    il costo non cresce con la profondità come con OFFSET.
+    """
+
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+
+    # sezione -> titolo, colonne (chiave, etichetta), campi di ricerca, filtri ammessi
+    SECTIONS = {
+        'utenti': {
+            'titolo': 'Utenti',
+            'colonne': [
+                ('id', 'ID'), ('username', 'Username'), ('first_name', 'Nome'), ('last_name', 'Cognome'),
+                ('email', 'Email'), ('profilo_utente__ruolo_utente', 'Ruolo'),
+                ('is_active', 'Attivo'), ('is_staff', 'Staff'),
+            ],
+            'ricerca': ['username', 'email', 'first_name', 'last_name'],
+            'filtri': {'is_active': 'bool', 'is_staff': 'bool', 'profilo_utente__ruolo_utente': 'str'},
+        },
+        'risorse': {
+            'titolo': 'Risorse',
+            'colonne': [
+                ('id', 'ID'), ('codice', 'Codice'), ('nome', 'Nome'), ('tipo', 'Tipo'),
+                ('localizzazione__nome', 'Ubicazione'), ('capacita_massima', 'Capacità'), ('attivo', 'Attivo'),
+            ],
+            'ricerca': ['nome', 'codice'],
+            'filtri': {'tipo': 'str', 'attivo': 'bool'},
+        },
+        'dispositivi': {
+            'titolo': 'Dispositivi',
+            'colonne': [
+                ('id', 'ID'), ('nome', 'Nome'), ('marca', 'Marca'), ('modello', 'Modello'), ('tipo', 'Tipo'),
+                ('categoria__nome', 'Categoria'), ('stato', 'Stato'), ('codice_inventario', 'Inventario'),
+            ],
+            'ricerca': ['nome', 'marca', 'modello', 'codice_inventario'],
+            'filtri': {'tipo': 'str', 'stato': 'str', 'categoria': 'int'},
+        },
+        'prenotazioni': {
+            'titolo': 'Prenotazioni',
+            'colonne': [
+                ('id', 'ID'), ('utente__username', 'Utente'), ('risorsa__nome', 'Risorsa'),
+                ('inizio', 'Inizio'), ('fine', 'Fine'), ('quantita', 'Quantità'), ('stato', 'Stato'),
+            ],
+            'ricerca': ['utente__username', 'risorsa__nome', 'scopo'],
+            'filtri': {'stato': 'str', 'risorsa': 'int', 'utente': 'int'},
+        },
+        'log': {
+            'titolo': 'Log di sistema',
+            'colonne': [
+                ('id', 'ID'), ('timestamp', 'Data'), ('livello', 'Livello'), ('tipo_evento', 'Evento'),
+                ('utente__username', 'Utente'), ('messaggio', 'Messaggio'),
+            ],
+            'ricerca': ['messaggio', 'tipo_evento'],
+            'filtri': {'livello': 'str', 'tipo_evento': 'str', 'utente': 'int'},
+        },
+    }
+
+    @classmethod
+    def _base_queryset(cls, section):
+        if section == 'utenti':
+            from django.contrib.auth import get_user_model
+            return get_user_model().objects.all()
+        if section == 'risorse':
+            return Risorsa.objects.all()
+        if section == 'dispositivi':
+            return Dispositivo.objects.all()
+        if section == 'prenotazioni':
+            return Prenotazione.objects.all()
+        if section == 'log':
+            return SystemLog.objects.all()
+        raise ValueError(f"Sezione non supportata: {section}")
+
+    @classmethod
+    def sections(cls):
+        """Metadati delle sezioni per il rendering iniziale (nessuna query)."""
+        return [
+            {'key': key, 'titolo': conf['titolo'], 'colonne': conf['colonne'], 'filtri': list(conf['filtri'])}
+            for key, conf in cls.SECTIONS.items()
+        ]
+
+    @staticmethod
+    def _parse_filter(kind, raw):
+        if kind == 'bool':
+            if raw.lower() in ('1', 'true', 'si', 'sì'):
+                return True
+            if raw.lower() in ('0', 'false', 'no'):
+                return False
+            raise ValueError(f"Valore booleano non valido: {raw}")
+        if kind == 'int':
+            if not raw.isdigit():
+                raise ValueError(f"Valore numerico non valido: {raw}")
+            return int(raw)
+        return raw
+
+    @classmethod
+    def page(cls, section, after=None, limit=None, q=None, filters=None):
+        """Restituisce una pagina della sezione.
+
+        `after` è il cursore (pk) ricevuto nella pagina precedente.
+        Solleva ValueError per sezioni, filtri o cursori non validi.
+        """
+        if section not in cls.SECTIONS:
+            raise ValueError(f"Sezione non supportata: {section}")
+        conf = cls.SECTIONS[section]
+        limit = min(max(int(limit or cls.DEFAULT_LIMIT), 1), cls.MAX_LIMIT)
+
+        query = cls._base_queryset(section)
+        for name, raw in (filters or {}).items():
+            if name not in conf['filtri']:
+                raise ValueError(f"Filtro non supportato per '{section}': {name}")
+            if raw in (None, ''):
+                continue
+            query = query.filter(**{name: cls._parse_filter(conf['filtri'][name], str(raw))})
+        if q:
+            search = Q()
+            for field in conf['ricerca']:
+                search |= Q(**{f'{field}__icontains': q})
+            query = query.filter(search)
+        if after is not None:
+            query = query.filter(pk__lt=int(after))
+
+        keys = [key for key, _ in conf['colonne']]
+        # Un elemento in più per sapere se esiste la pagina successiva
+        rows = list(query.order_by('-pk').values(*keys)[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'results': rows,
+            'next': rows[-1]['id'] if has_more else None,
+        }
+
+
 # =====================================================
 # INIZIALIZZAZIONE SISTEMA
 # =====================================================
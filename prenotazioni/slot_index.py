@@ -0,0 +1,229 @@
+"""Indice di disponibilità dei dispositivi per ora di lezione.
+
+La giornata scolastica è divisa in periodi fissi (`ORE_SCOLASTICHE`) e
+quasi tutte le prenotazioni vi si allineano. Per ogni giorno l'indice
+tiene una bitmap per periodo: un intero in cui il bit `k` è acceso se il
+dispositivo con pk `k` è occupato in quel periodo. "Quali di questi 60
+dispositivi sono liberi dalla 3a alla 5a ora?" diventa quindi un OR delle
+colonne dei periodi e un AND con la maschera dei candidati, senza join.
+
+Un periodo è occupato se una prenotazione lo copre anche solo in parte:
+l'indice non segnala mai libero un dispositivo occupato, al più il
+contrario per prenotazioni non allineate alle ore.
+
+Le colonne stanno nella cache di Django, una chiave per giorno e per
+generazione. Ogni scrittura (nuove assegnazioni, modifiche, annullamenti,
+restituzioni) incrementa dopo il commit la generazione dei giorni
+coinvolti, che vengono ricostruiti alla lettura successiva con una sola
+query. Nessuna lettura-modifica-scrittura sulle colonne: un lettore che
+ha costruito il giorno dal database appena prima del commit di
+un'assegnazione salva il risultato sotto la generazione vecchia, che
+nessuno legge più. Con più processi serve una cache condivisa (Redis,
+Memcached) con `incr` atomico; `verifica_indice_slot` confronta l'indice
+con gli intervalli esatti. L'indice è opzionale: si attiva con
+`SLOT_INDEX_ENABLED`.
+"""
+from __future__ import annotations
+
+import time as _time
+from datetime import datetime, time as dtime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+CACHE_PREFIX = 'slot_index:v2'
+DEFAULT_TIMEOUT = 24 * 3600
+
+
+def enabled():
+    return bool(getattr(settings, 'SLOT_INDEX_ENABLED', False))
+
+
+def _parse_time(value):
+    hours, minutes = value.strip().split(':')
+    return dtime(int(hours), int(minutes))
+
+
+def periods():
+    """Lista di (inizio, fine) dei periodi della giornata, in ora locale.
+
+    `ORE_SCOLASTICHE` accetta una lista di coppie di orari o stringhe
+    "HH:MM-HH:MM"; senza configurazione si usano ore intere tra
+    `BOOKING_START_HOUR` e `BOOKING_END_HOUR`.
+    """
+    configured = getattr(settings, 'ORE_SCOLASTICHE', None)
+    if configured:
+        result = []
+        for item in configured:
+            start, end = item.split('-') if isinstance(item, str) else item
+            result.append((_parse_time(start) if isinstance(start, str) else start,
+                           _parse_time(end) if isinstance(end, str) else end))
+        return result
+    first = _parse_time(getattr(settings, 'BOOKING_START_HOUR', '08:00')).hour
+    last = _parse_time(getattr(settings, 'BOOKING_END_HOUR', '18:00')).hour
+    return [(dtime(h), dtime(h + 1)) for h in range(first, last)]
+
+
+def _day_bounds(giorno, periodi):
+    tz = timezone.get_current_timezone()
+    return [
+        (timezone.make_aware(datetime.combine(giorno, start), tz),
+         timezone.make_aware(datetime.combine(giorno, end), tz))
+        for start, end in periodi
+    ]
+
+
+def _days(inizio, fine):
+    """Giorni locali toccati dall'intervallo [inizio, fine)."""
+    day = timezone.localtime(inizio).date()
+    last = timezone.localtime(fine - timedelta(microseconds=1)).date()
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def period_mask(inizio, fine, giorno, bounds=None):
+    """Bitmap dei periodi di `giorno` che si sovrappongono a [inizio, fine)."""
+    bounds = bounds or _day_bounds(giorno, periods())
+    mask = 0
+    for k, (start, end) in enumerate(bounds):
+        if inizio < end and fine > start:
+            mask |= 1 << k
+    return mask
+
+
+def _generation_key(giorno):
+    return f'{CACHE_PREFIX}:{giorno.isoformat()}:gen'
+
+
+def _generation(giorno):
+    """Generazione corrente del giorno, creata se manca.
+
+    Il valore iniziale è un timestamp in nanosecondi: se la chiave viene
+    espulsa dalla cache la nuova generazione non ripete una vecchia.
+    """
+    key = _generation_key(giorno)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def _key(giorno, generation=None):
+    if generation is None:
+        generation = _generation(giorno)
+    return f'{CACHE_PREFIX}:{giorno.isoformat()}:{generation}'
+
+
+def _timeout():
+    return getattr(settings, 'SLOT_INDEX_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def build_day(giorno):
+    """Colonne del giorno calcolate dagli intervalli esatti (una query)."""
+    from .services import DeviceService
+
+    bounds = _day_bounds(giorno, periods())
+    columns = [0] * len(bounds)
+    if not bounds:
+        return columns
+    rows = DeviceService.busy_assignments(bounds[0][0], bounds[-1][1]).values_list(
+        'dispositivo_id', 'prenotazione__inizio', 'prenotazione__fine'
+    )
+    for device_id, inizio, fine in rows:
+        bit = 1 << device_id
+        for k, (start, end) in enumerate(bounds):
+            if inizio < end and fine > start:
+                columns[k] |= bit
+    return columns
+
+
+def get_day(giorno):
+    """Colonne del giorno dalla cache, ricostruite se mancanti.
+
+    La chiave si legge prima di interrogare il database: se nel frattempo
+    un commit invalida il giorno, le colonne finiscono sotto la
+    generazione superata.
+    """
+    key = _key(giorno)
+    columns = cache.get(key)
+    if columns is None or len(columns) != len(periods()):
+        columns = build_day(giorno)
+        cache.set(key, columns, _timeout())
+    return columns
+
+
+def invalidate(inizio, fine):
+    """Passa a una nuova generazione i giorni toccati da [inizio, fine).
+
+    Vale per ogni scrittura, assegnazioni comprese: aggiornare i bit in
+    cache sarebbe una lettura-modifica-scrittura non atomica, e per
+    spegnerli bisognerebbe sapere se un'altra prenotazione occupa lo
+    stesso periodo.
+    """
+    for giorno in _days(inizio, fine):
+        key = _generation_key(giorno)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _time.time_ns(), None)
+
+
+def free_devices(device_ids, giorno, primo, ultimo):
+    """Dispositivi di `device_ids` liberi dal periodo `primo` a `ultimo` (inclusi, da 0)."""
+    columns = get_day(giorno)
+    if not 0 <= primo <= ultimo < len(columns):
+        raise ValueError(f'Periodi non validi: {primo}-{ultimo} (disponibili 0-{len(columns) - 1})')
+    busy = 0
+    for column in columns[primo:ultimo + 1]:
+        busy |= column
+    return [device_id for device_id in device_ids if not busy >> device_id & 1]
+
+
+def verify(da, a, repair=False):
+    """Confronta l'indice in cache con gli intervalli esatti, giorno per giorno.
+
+    Restituisce una lista di (giorno, periodo, dispositivi_in_più,
+    dispositivi_mancanti). Con `repair` i giorni sbagliati vengono
+    riscritti. I giorni non in cache non possono essere sbagliati.
+    """
+    mismatches = []
+    giorno = da
+    while giorno <= a:
+        key = _key(giorno)
+        cached = cache.get(key)
+        if cached is not None:
+            expected = build_day(giorno)
+            if len(cached) != len(expected):
+                mismatches.append((giorno, None, [], []))
+            else:
+                for k, (have, want) in enumerate(zip(cached, expected)):
+                    if have != want:
+                        mismatches.append((giorno, k, _bits(have & ~want), _bits(want & ~have)))
+            if repair and (len(cached) != len(expected) or cached != expected):
+                cache.set(key, expected, _timeout())
+        giorno += timedelta(days=1)
+    return mismatches
+
+
+def _bits(value):
+    result = []
+    k = 0
+    while value:
+        if value & 1:
+            result.append(k)
+        value >>= 1
+        k += 1
+    return result
+
+
+def on_booking_event(event, booking, user, dettagli):
+    """Hook della pipeline: invalida i giorni della prenotazione (e i precedenti se spostata)."""
+    if not enabled():
+        return
+    invalidate(booking.inizio, booking.fine)
+    previous = (dettagli or {}).get('previous') or {}
+    if previous.get('start') and previous.get('end'):
+        invalidate(datetime.fromisoformat(previous['start']), datetime.fromisoformat(previous['end']))
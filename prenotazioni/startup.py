@@ -0,0 +1,152 @@
+"""Avvio dei processi: controlli di salute e profilo del cold start.
+
+`PrenotazioniConfig.ready` gira in ogni processo (ogni worker gunicorn,
+ogni comando di gestione) e non deve toccare il database né avviare
+thread. I controlli che prima partivano da lì (connettività, conteggi)
+sono in `run_checks` e vanno eseguiti da un solo processo designato:
+l'entrypoint del container li lancia una volta con
+`manage.py startup_profile --controlli`, prima di avviare gunicorn.
+
+`profile` misura un avvio a freddo in un interprete separato con
+`-X importtime`: tempo di import per modulo, `django.setup()`,
+costruzione dell'handler WSGI e latenza della prima e della seconda
+richiesta. La differenza tra le due è il costo che paga il primo utente
+dopo un deploy o il riciclo di un worker.
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_URL = '/health/'
+DEFAULT_TOP = 25
+# Pacchetti dell'applicazione, evidenziati nel riepilogo per pacchetto
+APP_PACKAGES = ('prenotazioni', 'config')
+
+# Script eseguito nel processo figlio: i tempi vanno su stdout in JSON,
+# l'output di -X importtime su stderr.
+_CHILD_SCRIPT = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import django
+from django.conf import settings
+django.setup()
+t1 = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+t2 = time.perf_counter()
+from django.test import Client
+hosts = [h for h in settings.ALLOWED_HOSTS if h and not h.startswith('.') and h != '*']
+client = Client(SERVER_NAME=hosts[0] if hosts else 'localhost')
+url = sys.argv[1]
+t3 = time.perf_counter()
+status = client.get(url).status_code
+t4 = time.perf_counter()
+client.get(url)
+t5 = time.perf_counter()
+print(json.dumps({
+    'setup_s': t1 - t0, 'wsgi_s': t2 - t1, 'first_request_s': t4 - t3,
+    'second_request_s': t5 - t4, 'status': status, 'total_s': t4 - t0,
+}))
+'''
+
+
+# =====================================================
+# CONTROLLI DI AVVIO
+# =====================================================
+
+def run_checks():
+    """Controlli non distruttivi sul database; restituisce [(nome, ok, dettaglio)]."""
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+
+    from .models import Dispositivo
+
+    results = [('configurazione', True,
+                f"DEBUG={getattr(settings, 'DEBUG', False)}, SANITY_KEY_SET={bool(getattr(settings, 'SANITY_KEY', None))}")]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        results.append(('database', True, 'connessione OK'))
+    except Exception as e:
+        results.append(('database', False, str(e)))
+        return results
+
+    try:
+        superusers = get_user_model().objects.filter(is_superuser=True).count()
+        results.append(('superuser', superusers > 0,
+                        f'{superusers} superuser' if superusers else "nessun superuser: crearlo con 'manage.py createsuperuser'"))
+        results.append(('dispositivi', True, f'{Dispositivo.objects.count()} dispositivi'))
+    except Exception as e:
+        results.append(('conteggi', False, str(e)))
+    return results
+
+
+# =====================================================
+# PROFILO DEL COLD START
+# =====================================================
+
+def parse_importtime(lines):
+    """Righe di `-X importtime` -> {modulo: (self_us, cumulativo_us)}.
+
+    Un modulo importato più volte (non succede, ma l'output lo permette)
+    tiene la misura più alta.
+    """
+    modules = {}
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # intestazione
+        name = parts[2].strip()
+        own, cumulative = int(parts[0]), int(parts[1])
+        previous = modules.get(name)
+        if previous is None or cumulative > previous[1]:
+            modules[name] = (own, cumulative)
+    return modules
+
+
+def by_package(modules):
+    """Tempo di import proprio sommato per pacchetto di primo livello (µs)."""
+    totals = {}
+    for name, (own, _) in modules.items():
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + own
+    return totals
+
+
+def profile(url=DEFAULT_URL, python=None, env=None):
+    """Avvia un interprete nuovo, misura il cold start e restituisce il report."""
+    from django.conf import settings
+
+    child_env = dict(os.environ if env is None else env)
+    child_env.setdefault('DJANGO_SETTINGS_MODULE', os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'))
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [python or sys.executable, '-X', 'importtime', '-c', _CHILD_SCRIPT, url],
+        capture_output=True, text=True, env=child_env, cwd=str(settings.BASE_DIR),
+    )
+    wall = time.perf_counter() - started
+    timings = None
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith('{'):
+            timings = json.loads(line)
+            break
+    if proc.returncode != 0 or timings is None:
+        tail = '\n'.join(line for line in proc.stderr.splitlines() if not line.startswith('import time:'))[-2000:]
+        raise RuntimeError(f'Processo di profilo terminato con codice {proc.returncode}: {tail}')
+
+    modules = parse_importtime(proc.stderr.splitlines())
+    return {
+        'url': url,
+        'process_s': wall,
+        'timings': timings,
+        'modules': modules,
+        'packages': by_package(modules),
+    }
@@ -0,0 +1,301 @@
+"""Generatore di dati sintetici per benchmark e prove di carico.
+
+Crea con `bulk_create` un anno scolastico fittizio: utenti con profilo,
+risorse, dispositivi, prenotazioni e un arretrato di notifiche. Le
+prenotazioni, la tabella di gran lunga più grande, usano un inserimento
+diretto con `executemany` (vedi `_fast_insert`). Il generatore è deterministico: a parità di
+`seed` e di anno scolastico produce sempre gli stessi record, così i
+numeri dei benchmark sono confrontabili tra un'esecuzione e l'altra.
+
+Tutti i record creati usano il prefisso indicato (default ``syn``) in
+username, codici risorsa e codici inventario, per poterli riconoscere e
+rimuovere con `purge`.
+"""
+from __future__ import annotations
+
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Dispositivo, NotificaUtente, Prenotazione, ProfiloUtente, Risorsa, UbicazioneRisorsa
+
+User = get_user_model()
+
+DEFAULT_SEED = 42
+DEFAULT_BATCH_SIZE = 1000
+
+# Scale predefinite usate dai benchmark
+SCALES = {
+    'small': {'users': 50, 'resources': 10, 'devices': 50, 'bookings': 2000},
+    'medium': {'users': 200, 'resources': 40, 'devices': 300, 'bookings': 20000},
+    'large': {'users': 1000, 'resources': 150, 'devices': 1500, 'bookings': 100000},
+}
+
+TIPI_RISORSA = [('laboratorio', 5), ('carrello', 3), ('aula', 2)]
+TIPI_DISPOSITIVO = [('laptop', 5), ('tablet', 3), ('projector', 1), ('smartboard', 1)]
+MARCHE = ['Lenovo', 'HP', 'Dell', 'Apple', 'Acer', 'Epson']
+NOMI = ['Marco', 'Giulia', 'Luca', 'Francesca', 'Andrea', 'Chiara', 'Paolo', 'Sara', 'Stefano', 'Elena']
+COGNOMI = ['Rossi', 'Bianchi', 'Romano', 'Colombo', 'Ricci', 'Marino', 'Greco', 'Bruno', 'Gallo', 'Conti']
+RUOLI = [('docente', 85), ('assistente', 10), ('admin', 5)]
+
+# Ora di inizio: picco nelle prime ore, poche prenotazioni il pomeriggio.
+# Le prenotazioni sintetiche terminano entro le 16.
+ORE_INIZIO = [(8, 20), (9, 22), (10, 20), (11, 16), (12, 12), (13, 6), (14, 4)]
+# Peso per giorno della settimana (lunedì = 0): il venerdì si prenota meno
+PESI_GIORNO = [22, 22, 21, 20, 15]
+DURATE_ORE = [(1, 60), (2, 35), (3, 5)]
+DEFAULT_CANCELLATION_RATE = 0.08
+
+
+def school_year(anno=None):
+    """Restituisce (primo_giorno, ultimo_giorno) dell'anno scolastico.
+
+    `anno` è l'anno solare in cui inizia l'anno scolastico; se omesso si
+    usa quello in corso (da settembre a giugno).
+    """
+    if anno is None:
+        today = timezone.localdate()
+        anno = today.year if today.month >= 9 else today.year - 1
+    return date(anno, 9, 15), date(anno + 1, 6, 10)
+
+
+def school_days(anno=None):
+    """Giorni di lezione (lunedì-venerdì, escluse le vacanze di Natale)."""
+    first, last = school_year(anno)
+    natale = (date(first.year, 12, 23), date(first.year + 1, 1, 6))
+    days = []
+    current = first
+    while current <= last:
+        if current.weekday() < 5 and not natale[0] <= current <= natale[1]:
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def _sample(rng, choices, k):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights, k=k)
+
+
+def _aware(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+def _popularity(rng, n):
+    """Pesi a coda lunga: pochi utenti/risorse concentrano molte prenotazioni."""
+    return [rng.paretovariate(1.5) for _ in range(n)]
+
+
+def _fast_insert(model, fields, rows, constants, batch_size, now):
+    """Inserisce `rows` con `executemany`, senza istanziare i modelli.
+
+    Per centinaia di migliaia di righe `bulk_create` passa quasi tutto il
+    tempo a preparare campo per campo valori che qui sono già pronti: le
+    colonne variabili arrivano in `rows` (nell'ordine di `fields`, già
+    adattate al database), tutte le altre prendono il valore di
+    `constants` o il default del modello, preparati una sola volta.
+    """
+    variable = [model._meta.get_field(name) for name in fields]
+    fixed_fields, fixed_values = [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field in variable:
+            continue
+        if field.name in constants:
+            value = constants[field.name]
+        elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            value = now
+        else:
+            value = field.get_default()
+        fixed_fields.append(field)
+        fixed_values.append(field.get_db_prep_save(value, connection))
+
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(field.column) for field in variable + fixed_fields)
+    placeholders = ', '.join(['%s'] * (len(variable) + len(fixed_fields)))
+    sql = f'INSERT INTO {qn(model._meta.db_table)} ({columns}) VALUES ({placeholders})'
+    fixed_values = tuple(fixed_values)
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            cursor.executemany(sql, [row + fixed_values for row in rows[offset:offset + batch_size]])
+    return len(rows)
+
+
+def generate(users=50, resources=10, devices=50, bookings=2000, notifications=0,
+             cancellation_rate=DEFAULT_CANCELLATION_RATE, seed=DEFAULT_SEED,
+             anno=None, prefix='syn', batch_size=DEFAULT_BATCH_SIZE, profiles=True):
+    """Popola il database con un anno scolastico sintetico.
+
+    Le prenotazioni seguono distribuzioni realistiche: più frequenti nelle
+    prime ore e a inizio settimana, concentrate su pochi utenti e poche
+    risorse molto richieste. Quelle già passate risultano completate, una
+    quota `cancellation_rate` è annullata prima dell'inizio. Il risultato
+    può contenere sovrapposizioni: servono proprio a esercitare i
+    controlli di disponibilità.
+
+    `notifications` crea un arretrato di notifiche email in coda (con una
+    parte già fallita) legate a prenotazioni a caso.
+
+    Returns:
+        dict con il numero di record creati per ciascun modello.
+    """
+    rng = random.Random(seed)
+    tag = prefix.upper()
+    days = school_days(anno)
+    now = timezone.now()
+    counts = {'users': 0, 'profiles': 0, 'resources': 0, 'devices': 0, 'bookings': 0,
+              'cancelled': 0, 'notifications': 0}
+
+    with transaction.atomic():
+        sede, _ = UbicazioneRisorsa.objects.get_or_create(
+            codice_meccanografico=f'{tag}SEDE',
+            defaults={'nome': 'Sede sintetica', 'edificio': 'A', 'piano': '0', 'aula': 'Sintetica'},
+        )
+
+        # Password inutilizzabile: niente hashing costoso per migliaia di utenti
+        password = make_password(None)
+        nomi = [(rng.choice(NOMI), rng.choice(COGNOMI)) for _ in range(users)]
+        new_users = User.objects.bulk_create(
+            [
+                User(
+                    username=f'{prefix}_u{i:05d}',
+                    email=f'{prefix}_u{i:05d}@example.com',
+                    first_name=nome,
+                    last_name=cognome,
+                    password=password,
+                )
+                for i, (nome, cognome) in enumerate(nomi)
+            ],
+            batch_size=batch_size,
+        )
+        counts['users'] = len(new_users)
+
+        if profiles:
+            ruoli = _sample(rng, RUOLI, len(new_users))
+            ProfiloUtente.objects.bulk_create(
+                [
+                    ProfiloUtente(utente=user, nome_utente=nome, cognome_utente=cognome, ruolo_utente=ruolo,
+                                  utente_verificato=True, first_login=False)
+                    for user, (nome, cognome), ruolo in zip(new_users, nomi, ruoli)
+                ],
+                batch_size=batch_size,
+            )
+            counts['profiles'] = len(new_users)
+
+        new_resources = []
+        for i in range(resources):
+            tipo = _weighted(rng, TIPI_RISORSA)
+            new_resources.append(Risorsa(
+                nome=f'{tipo.title()} {i + 1}',
+                codice=f'{tag}-R{i:05d}',
+                tipo=tipo,
+                localizzazione=sede,
+                capacita_massima=rng.randint(20, 30) if tipo == 'carrello' else None,
+                postazioni_disponibili=rng.randint(15, 30),
+            ))
+        new_resources = Risorsa.objects.bulk_create(new_resources, batch_size=batch_size)
+        counts['resources'] = len(new_resources)
+
+        Dispositivo.objects.bulk_create(
+            [
+                Dispositivo(
+                    nome=f'Dispositivo {i + 1}',
+                    marca=rng.choice(MARCHE),
+                    codice_inventario=f'{tag}-D{i:06d}',
+                    tipo=_weighted(rng, TIPI_DISPOSITIVO),
+                    ubicazione=sede,
+                )
+                for i in range(devices)
+            ],
+            batch_size=batch_size,
+        )
+        counts['devices'] = devices
+
+        if new_users and new_resources and days and bookings:
+            # Estrazioni vettoriali: una sola chiamata a rng.choices per dimensione
+            booking_users = rng.choices(new_users, weights=_popularity(rng, len(new_users)), k=bookings)
+            booking_resources = rng.choices(new_resources, weights=_popularity(rng, len(new_resources)), k=bookings)
+            booking_days = rng.choices(days, weights=[PESI_GIORNO[d.weekday()] for d in days], k=bookings)
+            booking_hours = _sample(rng, ORE_INIZIO, bookings)
+            booking_durations = _sample(rng, DURATE_ORE, bookings)
+
+            adapt = connection.ops.adapt_datetimefield_value
+            # Gli slot distinti sono poche migliaia: conversione e adattamento
+            # al database si fanno una volta sola per slot
+            slots = {}
+            rows = []
+            for utente, risorsa, day, hour, durata in zip(
+                    booking_users, booking_resources, booking_days, booking_hours, booking_durations):
+                slot = slots.get((day, hour, durata))
+                if slot is None:
+                    inizio = _aware(day, hour)
+                    fine = inizio + timedelta(hours=min(durata, 16 - hour))
+                    slot = slots[day, hour, durata] = (inizio, fine, adapt(inizio), adapt(fine))
+                inizio, fine, db_inizio, db_fine = slot
+                cancellato_il = None
+                if rng.random() < cancellation_rate:
+                    stato = 'annullata'
+                    cancellato_il = min(now, inizio - timedelta(hours=rng.randint(2, 72)))
+                    counts['cancelled'] += 1
+                elif fine <= now:
+                    stato = 'completata'
+                else:
+                    stato = 'approvata' if rng.random() < 0.85 else 'in_attesa_approvazione'
+                rows.append((
+                    utente.pk, risorsa.pk, db_inizio, db_fine,
+                    rng.randint(1, 10) if risorsa.tipo == 'carrello' else 1,
+                    rng.randint(10, 28), stato, adapt(cancellato_il),
+                ))
+            counts['bookings'] = _fast_insert(
+                Prenotazione,
+                ['utente', 'risorsa', 'inizio', 'fine', 'quantita', 'numero_persone', 'stato', 'cancellato_il'],
+                rows, {'scopo': 'Lezione'}, batch_size, now,
+            )
+
+        if notifications and new_users:
+            booking_ids = list(
+                Prenotazione.all_objects.filter(risorsa__in=new_resources).order_by('pk').values_list('pk', 'utente_id')
+            )
+            batch = []
+            for _ in range(notifications):
+                booking_id, utente_id = rng.choice(booking_ids) if booking_ids else (None, rng.choice(new_users).pk)
+                failed = rng.random() < 0.1
+                batch.append(NotificaUtente(
+                    utente_id=utente_id,
+                    related_booking_id=booking_id,
+                    tipo='booking_reminder',
+                    canale='email',
+                    titolo='Promemoria prenotazione',
+                    messaggio='Promemoria generato per prove di carico.',
+                    stato='failed' if failed else 'pending',
+                    tentativo_corrente=NotificaUtente.MAX_TENTATIVI if failed else 0,
+                    prossimo_tentativo=now - timedelta(minutes=rng.randint(0, 24 * 60)),
+                ))
+                if len(batch) >= batch_size:
+                    NotificaUtente.objects.bulk_create(batch)
+                    counts['notifications'] += len(batch)
+                    batch = []
+            if batch:
+                NotificaUtente.objects.bulk_create(batch)
+                counts['notifications'] += len(batch)
+
+    return counts
+
+
+def purge(prefix='syn'):
+    """Rimuove i record creati da `generate` con il prefisso indicato."""
+    tag = prefix.upper()
+    with transaction.atomic():
+        Prenotazione.all_objects.filter(risorsa__codice__startswith=f'{tag}-R').delete()
+        Risorsa.all_objects.filter(codice__startswith=f'{tag}-R').delete()
+        Dispositivo.all_objects.filter(codice_inventario__startswith=f'{tag}-D').delete()
+        User.objects.filter(username__startswith=f'{prefix}_u').delete()
+        UbicazioneRisorsa.objects.filter(codice_meccanografico=f'{tag}SEDE').delete()
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from prenotazioni.models import Dispositivo, Prenotazione, PrenotazioneDispositivo, Risorsa
+
+User = get_user_model()
+
+
+class PrenotazioneChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='root', email='root@example.com', password=None)
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.lab = Risorsa.objects.create(nome='Lab', codice='LAB', tipo='laboratorio')
+        self.devices = [
+            Dispositivo.objects.create(nome=f'Notebook {i}', marca='Acme', codice_inventario=f'INV{i}', tipo='notebook')
+            for i in range(3)
+        ]
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=3)
+        self.url = reverse('admin:prenotazioni_prenotazione_changelist')
+        self.client.force_login(self.admin)
+
+    def _add_bookings(self, n):
+        for i in range(n):
+            inizio = self.start + timedelta(hours=2 * i)
+            booking = Prenotazione.objects.create(utente=self.user, risorsa=self.lab, inizio=inizio, fine=inizio + timedelta(hours=1))
+            for device in self.devices:
+                PrenotazioneDispositivo.objects.create(prenotazione=booking, dispositivo=device, quantita=2)
+
+    def _changelist_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_independent_of_page_size(self):
+        self._add_bookings(2)
+        few, _ = self._changelist_queries()
+        self._add_bookings(20)
+        many, _ = self._changelist_queries()
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 10)
+
+    def test_annotated_columns(self):
+        self._add_bookings(1)
+        inizio = self.start + timedelta(minutes=30)
+        Prenotazione.objects.create(utente=self.user, risorsa=self.lab, inizio=inizio, fine=inizio + timedelta(hours=1))
+
+        _, response = self._changelist_queries()
+        self.assertContains(response, 'Notebook 0 +2 (6 pz)')
+        self.assertContains(response, 'Nessuno')
+        self.assertEqual(response.content.decode().count('⚠️ 1 conflitti'), 2)
+
+    def test_change_form_renders(self):
+        self._add_bookings(1)
+        booking = Prenotazione.objects.get()
+        response = self.client.get(reverse('admin:prenotazioni_prenotazione_change', args=[booking.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Nessun conflitto')
@@ -0,0 +1,108 @@
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from prenotazioni.models import Prenotazione, Risorsa
+from prenotazioni.services import AvailabilityMatrixService, BookingService, RecurringBookingService
+
+User = get_user_model()
+
+MONDAY = date(2030, 9, 2)
+
+
+class AvailabilityMatrixTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.lab = Risorsa.objects.create(nome='Lab', codice='LAB1', tipo='laboratorio')
+        self.cart = Risorsa.objects.create(nome='Carrello', codice='CAR1', tipo='carrello', capacita_massima=30)
+        self.aula = Risorsa.objects.create(nome='Aula magna', codice='AULA', tipo='aula', manutenzione=True)
+        Risorsa.objects.create(nome='Dismesso', codice='OLD', tipo='laboratorio', attivo=False)
+
+    def _at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(MONDAY + timedelta(days=day), time(hour, minute)))
+
+    def _book(self, risorsa, start, end, quantita=1):
+        return Prenotazione.objects.create(utente=self.user, risorsa=risorsa, inizio=start, fine=end,
+                                           quantita=quantita, stato='approvata')
+
+    def _row(self, matrix, risorsa):
+        return next(r for r in matrix['risorse'] if r['id'] == risorsa.pk)
+
+    def test_run_length_segments_and_remaining_capacity(self):
+        self._book(self.cart, self._at(0, 8), self._at(0, 10), quantita=10)
+        self._book(self.cart, self._at(0, 9), self._at(0, 11), quantita=15)
+        self._book(self.lab, self._at(1, 8), self._at(1, 9))
+        self._book(self.lab, self._at(1, 9), self._at(1, 10))
+        cancelled = self._book(self.lab, self._at(2, 8), self._at(2, 9))
+        Prenotazione.objects.filter(pk=cancelled.pk).update(cancellato_il=timezone.now())
+
+        matrix = AvailabilityMatrixService.get_matrix(MONDAY + timedelta(days=3))
+        self.assertEqual(matrix['da'], self._at(0, 0).isoformat())
+        self.assertEqual([r['nome'] for r in matrix['risorse']], ['Aula magna', 'Carrello', 'Lab'])
+
+        cart = self._row(matrix, self.cart)
+        self.assertEqual(cart['capacita'], 30)
+        self.assertEqual(cart['occupato'], [[480, 540, 10, 20], [540, 600, 25, 5], [600, 660, 15, 15]])
+        # Prenotazioni contigue con la stessa occupazione diventano un solo segmento
+        self.assertEqual(self._row(matrix, self.lab)['occupato'], [[1440 + 480, 1440 + 600, 1, 0]])
+        self.assertFalse(self._row(matrix, self.aula)['prenotabile'])
+
+    def test_weeks_are_cached_and_built_with_two_queries(self):
+        self._book(self.lab, self._at(0, 8), self._at(0, 9))
+        self._book(self.lab, self._at(7, 8), self._at(7, 9))
+        with CaptureQueriesContext(connection) as ctx:
+            matrix = AvailabilityMatrixService.get_matrix(MONDAY, MONDAY + timedelta(days=13))
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(self._row(matrix, self.lab)['occupato'], [[480, 540, 1, 0], [10080 + 480, 10080 + 540, 1, 0]])
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = AvailabilityMatrixService.get_matrix(MONDAY, MONDAY + timedelta(days=13))
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(again, matrix)
+
+        labs = AvailabilityMatrixService.get_matrix(MONDAY, tipo='laboratorio')
+        self.assertEqual([r['id'] for r in labs['risorse']], [self.lab.pk])
+
+    def test_booking_writes_invalidate_the_week(self):
+        start = timezone.localdate() + timedelta(days=14)
+        AvailabilityMatrixService.get_matrix(start)
+        inizio = timezone.make_aware(datetime.combine(start, time(10)))
+        with self.captureOnCommitCallbacks(execute=True):
+            success, booking = BookingService.create_booking(self.user, self.cart.id, 5, inizio, inizio + timedelta(hours=1))
+        self.assertTrue(success, booking)
+        self.assertEqual(len(self._row(AvailabilityMatrixService.get_matrix(start), self.cart)['occupato']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BookingService.cancel_booking(booking.pk, self.user)
+        self.assertEqual(self._row(AvailabilityMatrixService.get_matrix(start), self.cart)['occupato'], [])
+
+    def test_series_invalidates_every_week_it_covers(self):
+        start = timezone.localdate() + timedelta(days=14)
+        later = start + timedelta(weeks=3)
+        AvailabilityMatrixService.get_matrix(later)
+        with self.captureOnCommitCallbacks(execute=True):
+            RecurringBookingService.create_series(
+                utente=self.user, risorsa_id=self.lab.id, data_inizio=start, data_fine=later + timedelta(days=6),
+                giorni_settimana=[later.weekday()], ora_inizio=time(8), ora_fine=time(9),
+            )
+        self.assertEqual(len(self._row(AvailabilityMatrixService.get_matrix(later), self.lab)['occupato']), 1)
+
+    def test_endpoint(self):
+        self._book(self.lab, self._at(0, 8), self._at(0, 9))
+        self.client.force_login(self.user)
+        response = self.client.get('/api/availability-matrix/', {'from': MONDAY.isoformat(), 'tipo': 'laboratorio'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['risorse'][0]['occupato'], [[480, 540, 1, 0]])
+
+        self.assertEqual(self.client.get('/api/availability-matrix/', {'from': 'ieri'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/availability-matrix/', {'from': '2024-02-30'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/availability-matrix/', {'to': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/availability-matrix/', {'tipo': 'astronave'}).status_code, 400)
+        response = self.client.get('/api/availability-matrix/', {'from': MONDAY.isoformat(), 'to': '2031-01-01'})
+        self.assertEqual(response.status_code, 400)
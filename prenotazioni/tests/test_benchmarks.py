@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from prenotazioni import benchmarks, synthetic
+from prenotazioni.models import LogSistema, NotificaUtente, Prenotazione, Risorsa
+
+User = get_user_model()
+
+TINY = {'users': 5, 'resources': 4, 'devices': 6, 'bookings': 60}
+
+
+class SyntheticDatasetTests(TestCase):
+    def test_generation_is_deterministic(self):
+        synthetic.generate(seed=7, **TINY)
+        first = list(Prenotazione.all_objects.order_by('pk').values_list('risorsa__codice', 'inizio', 'quantita'))
+        synthetic.purge()
+        self.assertFalse(Risorsa.all_objects.filter(codice__startswith='SYN-R').exists())
+
+        synthetic.generate(seed=7, **TINY)
+        second = list(Prenotazione.all_objects.order_by('pk').values_list('risorsa__codice', 'inizio', 'quantita'))
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), TINY['bookings'])
+
+    def test_bookings_fall_on_school_days(self):
+        synthetic.generate(**TINY)
+        days = set(synthetic.school_days())
+        for inizio in Prenotazione.all_objects.values_list('inizio', flat=True):
+            self.assertIn(timezone.localtime(inizio).date(), days)
+
+
+class BenchmarkRunTests(TestCase):
+    def test_run_scale_reports_every_path_and_rolls_back(self):
+        report = benchmarks.run_scale('small', repeat=2, sizes=TINY)
+
+        self.assertEqual(set(report['results']), set(benchmarks.BENCHMARKS))
+        for name, result in report['results'].items():
+            self.assertNotIn('error', result, name)
+            self.assertEqual(result['runs'], 2)
+            self.assertLessEqual(result['p50'], result['max'])
+        self.assertEqual(report['dataset']['bookings'], TINY['bookings'])
+        self.assertFalse(User.objects.filter(username__startswith='syn_u').exists())
+        self.assertFalse(NotificaUtente.objects.exists())
+
+    def test_on_commit_callbacks_are_measured(self):
+        ran = []
+
+        def func(ctx):
+            transaction.on_commit(lambda: ran.append(LogSistema.objects.create(tipo_evento='bench', messaggio='x')))
+
+        result = benchmarks.run_benchmark(func, None, repeat=2, mutates=True)
+        self.assertEqual(len(ran), 3)
+        self.assertEqual(result['queries'], 1)
+        self.assertFalse(LogSistema.objects.filter(tipo_evento='bench').exists())
+
+    def test_percentile_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual(benchmarks.percentile(samples, 50), 50)
+        self.assertEqual(benchmarks.percentile(samples, 99), 99)
+        self.assertEqual(benchmarks.percentile([3], 95), 3)
+
+
+class BaselineCompareTests(TestCase):
+    def _report(self, p95, queries, error=None):
+        result = {'error': error} if error else {'p95': p95, 'queries': queries}
+        return {'scales': {'small': {'results': {'create_booking': result}}}}
+
+    def test_flags_extra_queries_and_slowdowns(self):
+        baseline = self._report(10.0, 5)
+        self.assertEqual(benchmarks.compare(self._report(11.0, 5), baseline), [])
+        self.assertEqual(len(benchmarks.compare(self._report(10.0, 6), baseline)), 1)
+        self.assertEqual(len(benchmarks.compare(self._report(30.0, 5), baseline)), 1)
+
+    def test_ignores_noise_below_floor(self):
+        self.assertEqual(benchmarks.compare(self._report(0.9, 3), self._report(0.3, 3)), [])
+
+    def test_new_error_is_a_regression(self):
+        regressions = benchmarks.compare(self._report(0, 0, error='RuntimeError: x'), self._report(1.0, 3))
+        self.assertEqual(len(regressions), 1)
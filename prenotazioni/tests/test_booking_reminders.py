@@ -0,0 +1,130 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from prenotazioni.models import InformazioniScuola, NotificaUtente, Prenotazione, Risorsa
+from prenotazioni.services import BookingReminderService
+
+User = get_user_model()
+
+
+class BookingReminderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        InformazioniScuola.invalida_snapshot()
+        self.addCleanup(InformazioniScuola.invalida_snapshot)
+        self.now = timezone.now().replace(microsecond=0)
+        self.user = User.objects.create_user(username='docente', email='docente@example.com', first_name='Anna')
+        self.lab = Risorsa.objects.create(nome='Lab Fisica', codice='LABF', tipo='laboratorio')
+        self.horizons = BookingReminderService.horizons([24, 1])
+
+    def _booking(self, starts_in, user=None, **extra):
+        inizio = self.now + starts_in
+        booking = Prenotazione(utente=user or self.user, risorsa=self.lab, inizio=inizio,
+                               fine=inizio + timedelta(hours=1), stato=extra.pop('stato', 'approvata'), **extra)
+        Prenotazione.objects.bulk_create([booking])
+        return Prenotazione.all_objects.get(inizio=inizio, utente=user or self.user)
+
+    def _run(self, now=None, **kwargs):
+        return BookingReminderService.run(now=now or self.now, horizons=self.horizons, **kwargs)
+
+    def test_markers(self):
+        self.assertEqual([BookingReminderService.marker(h) for h in self.horizons], ['promemoria_24h', 'promemoria_1h'])
+        self.assertEqual(BookingReminderService.marker(timedelta(minutes=90)), 'promemoria_90m')
+        with self.assertRaises(ValueError):
+            BookingReminderService.horizons([0])
+
+    def test_each_horizon_is_sent_once(self):
+        booking = self._booking(timedelta(hours=20))
+
+        stats = self._run()
+        self.assertEqual(stats['accodati'], 1)
+        self.assertEqual(stats['per_orizzonte'], {'promemoria_24h': 1, 'promemoria_1h': 0})
+        notification = NotificaUtente.objects.get(related_booking=booking)
+        self.assertEqual(notification.tipo, 'booking_reminder')
+        self.assertEqual(notification.stato, 'pending')
+        self.assertIn('Lab Fisica', notification.titolo)
+        self.assertIn('Anna', notification.messaggio)
+        self.assertIn('20', notification.messaggio)
+
+        # Passaggio successivo: niente doppioni
+        self.assertEqual(self._run(now=self.now + timedelta(minutes=5))['accodati'], 0)
+
+        # A 45 minuti dall'inizio parte il secondo promemoria
+        stats = self._run(now=booking.inizio - timedelta(minutes=45))
+        self.assertEqual(stats['per_orizzonte']['promemoria_1h'], 1)
+        booking.refresh_from_db()
+        self.assertEqual(booking.notifiche_inviate, ['promemoria_24h', 'promemoria_1h'])
+        self.assertEqual(NotificaUtente.objects.filter(related_booking=booking).count(), 2)
+
+    def test_late_booking_gets_only_the_closest_reminder(self):
+        booking = self._booking(timedelta(minutes=30))
+
+        stats = self._run()
+        self.assertEqual(stats['per_orizzonte'], {'promemoria_24h': 0, 'promemoria_1h': 1})
+        booking.refresh_from_db()
+        self.assertEqual(sorted(booking.notifiche_inviate), ['promemoria_1h', 'promemoria_24h'])
+
+    def test_excluded_bookings(self):
+        self._booking(timedelta(hours=30))                       # oltre l'orizzonte
+        self._booking(-timedelta(minutes=10))                    # già iniziata
+        self._booking(timedelta(hours=2), stato='annullata')
+        self._booking(timedelta(hours=3), cancellato_il=self.now)
+
+        self.assertEqual(BookingReminderService.find_due(self.now, self.horizons), [])
+        self.assertEqual(self._run()['accodati'], 0)
+
+    def test_users_without_email_are_marked_but_not_enqueued(self):
+        booking = self._booking(timedelta(hours=2), user=User.objects.create_user(username='senza'))
+
+        stats = self._run()
+        self.assertEqual((stats['accodati'], stats['senza_email']), (0, 1))
+        booking.refresh_from_db()
+        self.assertIn('promemoria_24h', booking.notifiche_inviate)
+
+    def test_query_count_is_independent_of_volume(self):
+        users = [User.objects.create_user(username=f'u{i}', email=f'u{i}@example.com') for i in range(30)]
+        for i, user in enumerate(users):
+            self._booking(timedelta(hours=2, minutes=i), user=user)
+        InformazioniScuola.ottieni_snapshot()
+
+        # ricerca e, per blocco, lettura + insert notifiche + update marcatori (più il savepoint)
+        with self.assertNumQueries(6):
+            stats = self._run(batch_size=100)
+        self.assertEqual(stats['accodati'], 30)
+
+    def test_dry_run_does_not_write(self):
+        self._booking(timedelta(hours=2))
+
+        stats = self._run(dry_run=True)
+        self.assertEqual((stats['dovuti'], stats['accodati']), (1, 0))
+        self.assertFalse(NotificaUtente.objects.exists())
+
+
+class ReminderCommandTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='docente', email='docente@example.com')
+        lab = Risorsa.objects.create(nome='Lab', codice='LAB', tipo='laboratorio')
+        inizio = timezone.now() + timedelta(hours=3)
+        Prenotazione.objects.bulk_create([Prenotazione(utente=user, risorsa=lab, inizio=inizio,
+                                                       fine=inizio + timedelta(hours=1), stato='approvata')])
+
+    def test_one_shot_and_loop(self):
+        out = StringIO()
+        call_command('invia_promemoria', '--orizzonti', '24,1', stdout=out)
+        self.assertIn('1 promemoria accodati', out.getvalue())
+
+        out = StringIO()
+        call_command('invia_promemoria', '--ciclo', '--max-cicli', '2', '--intervallo', '1', stdout=out)
+        self.assertEqual(out.getvalue().count('0 promemoria accodati'), 2)
+        self.assertEqual(NotificaUtente.objects.count(), 1)
+
+    def test_invalid_horizons(self):
+        with self.assertRaises(CommandError):
+            call_command('invia_promemoria', '--orizzonti', 'domani', stdout=StringIO())
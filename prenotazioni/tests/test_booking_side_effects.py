@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from prenotazioni.models import LogSistema, Risorsa
+from prenotazioni.services import BookingService, BookingSideEffects
+
+User = get_user_model()
+
+
+@override_settings(BOOKING_SIDE_EFFECTS_ASYNC=False)
+class BookingSideEffectsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.lab = Risorsa.objects.create(nome='Lab', codice='LAB', tipo='laboratorio')
+        self.inizio = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=3)
+
+    def _create(self):
+        return BookingService.create_booking(self.user, self.lab.id, 1, self.inizio, self.inizio + timedelta(hours=1))
+
+    def test_one_audit_row_per_event_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            success, booking = self._create()
+        self.assertTrue(success)
+        self.assertFalse(LogSistema.objects.filter(tipo_evento='booking_created').exists())
+
+        for callback in callbacks:
+            callback()
+        logs = LogSistema.objects.filter(tipo_evento='booking_created')
+        self.assertEqual(logs.count(), 1)
+        self.assertEqual(logs.get().dettagli['booking_id'], booking.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BookingService.cancel_booking(booking.id, self.user, reason='gita')
+        self.assertEqual(LogSistema.objects.filter(tipo_evento='booking_cancelled').count(), 1)
+
+    def test_rollback_discards_side_effects(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self._create()
+                    raise RuntimeError('annulla')
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertFalse(LogSistema.objects.filter(tipo_evento='booking_created').exists())
+
+    def test_hooks_run_in_order_and_failures_are_isolated(self):
+        calls = []
+
+        def failing(event, booking, user, dettagli):
+            calls.append('failing')
+            raise ValueError('boom')
+
+        def extra(event, booking, user, dettagli):
+            calls.append(('extra', event, dettagli['booking_id']))
+
+        original = list(BookingSideEffects._hooks['booking_created'])
+        self.addCleanup(BookingSideEffects._hooks.__setitem__, 'booking_created', original)
+        BookingSideEffects.register('booking_created', failing)
+        BookingSideEffects.register('booking_created', extra)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            _, booking = self._create()
+        self.assertEqual(calls, ['failing', ('extra', 'booking_created', booking.id)])
+        self.assertEqual(LogSistema.objects.filter(tipo_evento='booking_created').count(), 1)
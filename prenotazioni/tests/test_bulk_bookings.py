@@ -0,0 +1,140 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from prenotazioni.models import LogSistema, NotificaUtente, Prenotazione, Risorsa, TemplateNotifica
+
+User = get_user_model()
+
+
+class BulkBookingApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.other = User.objects.create_user(username='collega', email='collega@example.com')
+        self.admin = User.objects.create_user(username='segreteria', email='s@example.com', is_staff=True)
+        self.labs = [Risorsa.objects.create(nome=f'Lab {i}', codice=f'LAB{i}', tipo='laboratorio') for i in range(3)]
+        self.cart = Risorsa.objects.create(nome='Carrello', codice='CAR1', tipo='carrello', capacita_massima=20)
+        for nome, evento in (('booking_created', 'booking_created'), ('booking_updated', 'booking_updated'),
+                             ('booking_cancelled', 'booking_cancelled')):
+            TemplateNotifica.objects.create(nome=nome, tipo='email', evento=evento, oggetto='Prenotazione',
+                                            contenuto='Prenotazione di $resource')
+        self.day = timezone.localdate() + timedelta(days=7)
+        self.client = APIClient()
+
+    def _at(self, hour, day_offset=0):
+        return timezone.make_aware(datetime.combine(self.day + timedelta(days=day_offset), time(hour)))
+
+    def _item(self, risorsa, hour, day_offset=0, **extra):
+        return {'risorsa': risorsa.pk, 'inizio': self._at(hour, day_offset).isoformat(),
+                'fine': self._at(hour + 1, day_offset).isoformat(), **extra}
+
+    def _post(self, url, payload, user=None):
+        self.client.force_authenticate(user or self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, payload, format='json')
+
+    def test_bulk_create_reports_each_item(self):
+        Prenotazione.objects.create(utente=self.other, risorsa=self.cart, inizio=self._at(10), fine=self._at(11),
+                                    quantita=15, stato='approvata')
+        response = self._post('/api/prenotazioni/bulk-create/', {'prenotazioni': [
+            self._item(self.labs[0], 8),
+            self._item(self.labs[0], 8),              # in conflitto con l'elemento precedente
+            self._item(self.cart, 10, quantita=10),   # supera la capacità residua
+            self._item(self.cart, 10, quantita=5),
+            {'risorsa': self.labs[1].pk, 'inizio': self._at(9).isoformat(), 'fine': self._at(8).isoformat()},
+            self._item(self.labs[1], 8, scopo='Verifica'),
+        ]})
+        self.assertEqual(response.status_code, 207, response.content)
+        body = response.json()
+        self.assertEqual([r['esito'] for r in body['risultati']], ['ok', 'errore', 'errore', 'ok', 'errore', 'ok'])
+        self.assertIn('già prenotato', body['risultati'][1]['errore'])
+        self.assertIn('disponibili 5', body['risultati'][2]['errore'])
+        self.assertIn('non_field_errors', body['risultati'][4]['errore'])
+        self.assertEqual((body['ok'], body['errori']), (3, 3))
+
+        created = Prenotazione.objects.filter(utente=self.user)
+        self.assertEqual(created.count(), 3)
+        self.assertEqual(set(created.values_list('stato', flat=True)), {'pending'})
+        self.assertEqual(Prenotazione.objects.get(pk=body['risultati'][5]['id']).scopo, 'Verifica')
+        self.assertEqual(NotificaUtente.objects.filter(utente=self.user, tipo='booking_created').count(), 3)
+        self.assertEqual(LogSistema.objects.filter(tipo_evento='booking_created').count(), 3)
+
+    def test_all_or_nothing_writes_nothing_on_error(self):
+        response = self._post('/api/prenotazioni/bulk-create/', {'tutto_o_niente': True, 'prenotazioni': [
+            self._item(self.labs[0], 8), self._item(self.labs[0], 8),
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['esito'] for r in response.json()['risultati']], ['errore', 'errore'])
+        self.assertFalse(Prenotazione.objects.exists())
+        self.assertFalse(NotificaUtente.objects.exists())
+
+        response = self._post('/api/prenotazioni/bulk-create/', {'tutto_o_niente': True, 'prenotazioni': [
+            self._item(self.labs[0], 8), self._item(self.labs[1], 8),
+        ]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Prenotazione.objects.count(), 2)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def run(n, day_offset):
+            items = [self._item(self.labs[i % 3], 8 + i // 3, day_offset) for i in range(n)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self._post('/api/prenotazioni/bulk-create/', {'prenotazioni': items})
+            self.assertEqual(response.status_code, 201, response.content)
+            return len(ctx.captured_queries)
+
+        run(3, 0)  # crea lo stato 'pending'
+        self.assertEqual(run(6, 1), run(27, 2))
+
+    def test_bulk_approve_is_one_update_and_staff_only(self):
+        bookings = [
+            Prenotazione.objects.create(utente=self.user, risorsa=self.labs[i % 3], inizio=self._at(8, i),
+                                        fine=self._at(9, i), stato='pending')
+            for i in range(12)
+        ]
+        Prenotazione.objects.filter(pk=bookings[0].pk).update(stato='approvata')
+        ids = [b.pk for b in bookings] + [999999]
+
+        self.assertEqual(self._post('/api/prenotazioni/bulk-approve/', {'ids': ids}).status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=False):
+                response = self.client.post('/api/prenotazioni/bulk-approve/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 207)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "prenotazioni_prenotazione"')]
+        self.assertEqual(len(updates), 1)
+        results = response.json()['risultati']
+        self.assertEqual(results[0]['errore'], 'Prenotazione già approvata.')
+        self.assertEqual(results[-1]['errore'], 'Prenotazione non trovata.')
+        self.assertEqual(Prenotazione.objects.filter(stato='approvata', approvato_da=self.admin).count(), 11)
+
+    def test_bulk_cancel_checks_ownership(self):
+        mine = Prenotazione.objects.create(utente=self.user, risorsa=self.labs[0], inizio=self._at(8), fine=self._at(9))
+        theirs = Prenotazione.objects.create(utente=self.other, risorsa=self.labs[1], inizio=self._at(8), fine=self._at(9))
+
+        response = self._post('/api/prenotazioni/bulk-cancel/', {'ids': [mine.pk, theirs.pk], 'motivo': 'Gita'})
+        self.assertEqual(response.status_code, 207)
+        mine = Prenotazione.all_objects.get(pk=mine.pk)
+        self.assertIsNotNone(mine.cancellato_il)
+        self.assertEqual(mine.stato, 'annullata')
+        self.assertIn('Gita', mine.note_amministrative)
+        self.assertIsNone(Prenotazione.objects.get(pk=theirs.pk).cancellato_il)
+        self.assertEqual(NotificaUtente.objects.filter(tipo='booking_cancelled').count(), 1)
+
+        response = self._post('/api/prenotazioni/bulk-cancel/', {'ids': [mine.pk]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['risultati'][0]['errore'], 'Prenotazione già cancellata.')
+
+        response = self._post('/api/prenotazioni/bulk-cancel/', {'ids': [theirs.pk]}, user=self.admin)
+        self.assertEqual(response.status_code, 200)
+
+    def test_rejects_oversized_or_empty_requests(self):
+        self.assertEqual(self._post('/api/prenotazioni/bulk-create/', {'prenotazioni': []}).status_code, 400)
+        too_many = [self._item(self.labs[0], 8)] * 201
+        self.assertEqual(self._post('/api/prenotazioni/bulk-create/', {'prenotazioni': too_many}).status_code, 400)
+        self.assertEqual(self._post('/api/prenotazioni/bulk-cancel/', {'ids': [1, 1]}).status_code, 400)
@@ -0,0 +1,40 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+
+from prenotazioni.services import EmailService
+from prenotazioni.models import NotificaUtente
+
+User = get_user_model()
+
+
+class BulkEmailEnqueueTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'staff{i}', email=f'staff{i}@example.com')
+            for i in range(30)
+        ]
+
+    def _count_queries(self, recipients):
+        with CaptureQueriesContext(connection) as ctx:
+            EmailService.enqueue_bulk_email('Avviso', 'Testo avviso', recipients)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_recipients(self):
+        few = self._count_queries([u.email for u in self.users[:3]])
+        many = self._count_queries([u.email for u in self.users])
+        self.assertEqual(few, many)
+
+    def test_counts_unknown_and_duplicate_recipients_as_skipped(self):
+        recipients = [self.users[0].email, 'nessuno@example.com', self.users[1], self.users[0].email]
+        enqueued, skipped = EmailService.enqueue_bulk_email('Avviso', 'Testo avviso', recipients)
+
+        self.assertEqual(enqueued, 2)
+        self.assertEqual(skipped, 2)
+        notifiche = NotificaUtente.objects.filter(canale='email', stato='pending')
+        self.assertEqual(notifiche.count(), 2)
+        self.assertEqual(set(notifiche.values_list('utente_id', flat=True)), {self.users[0].id, self.users[1].id})
+
+    def test_send_email_keeps_legacy_return_value(self):
+        self.assertEqual(EmailService.send_email('Avviso', 'Testo', [self.users[0].email]), (True, None))
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from prenotazioni.models import Prenotazione, Risorsa
+from prenotazioni.services import CalendarFeedService
+
+User = get_user_model()
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.other = User.objects.create_user(username='altro', email='altro@example.com')
+        self.lab = Risorsa.objects.create(nome='Laboratorio, Chimica', codice='CHIM', tipo='laboratorio')
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=2)
+        self.booking = Prenotazione.objects.create(
+            utente=self.user, risorsa=self.lab, inizio=start, fine=start + timedelta(hours=2),
+            stato='approvata', scopo='Esperimento; titolazione',
+        )
+        self.url = reverse('prenotazioni:calendar_feed_risorsa', args=[self.lab.pk])
+
+    def test_resource_feed_contains_escaped_event(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn(f'UID:prenotazione-{self.booking.pk}@prenotazioni', body)
+        self.assertIn('SUMMARY:Laboratorio\\, Chimica - docente', body)
+        self.assertIn('DESCRIPTION:Esperimento\; titolazione', body)
+        self.assertIn('STATUS:CONFIRMED', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+    def test_conditional_get_returns_304_until_booking_changes(self):
+        self.client.force_login(self.user)
+        etag = self.client.get(self.url)['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        feed_queries = [q for q in ctx.captured_queries if 'FROM "prenotazioni_prenotazione"' in q['sql']]
+        self.assertEqual(len(feed_queries), 1)
+
+        self.booking.cancel(self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('STATUS:CANCELLED', response.content.decode())
+
+    def test_related_renames_change_etag(self):
+        self.client.force_login(self.user)
+        etag = self.client.get(self.url)['ETag']
+
+        self.lab.nome = 'Laboratorio di Chimica'
+        self.lab.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Laboratorio di Chimica', response.content.decode())
+
+        etag = response['ETag']
+        User.objects.filter(pk=self.user.pk).update(username='docente.rossi')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('docente.rossi', response.content.decode())
+
+        # Feed utente: cambia anche se la risorsa viene rinominata
+        url = reverse('prenotazioni:calendar_feed_utente', args=[self.user.pk])
+        etag = self.client.get(url)['ETag']
+        Risorsa.objects.filter(pk=self.lab.pk).update(nome='Chimica', modificato_il=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_user_feed_access(self):
+        url = reverse('prenotazioni:calendar_feed_utente', args=[self.user.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, {'token': 'sbagliato'}).status_code, 403)
+
+        token = CalendarFeedService.feed_token('utente', self.user.pk)
+        self.assertEqual(self.client.get(url, {'token': token}).status_code, 200)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from prenotazioni.models import Dispositivo, Risorsa, touch_risorsa_dispositivi_signal
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='docente', email='d@example.com'))
+        self.devices = [
+            Dispositivo.objects.create(nome=f'iPad {i}', marca='Apple', codice_inventario=f'IPD{i:03d}', tipo='tablet')
+            for i in range(3)
+        ]
+        self.cart = Risorsa.objects.create(nome='Carrello iPad', codice='CAR1', tipo='carrello', capacita_massima=25)
+        self.cart.dispositivi.set(self.devices[:2])
+        Risorsa.objects.create(nome='Lab', codice='LAB1', tipo='laboratorio')
+
+    def _get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_device_list_and_detail_revalidate(self):
+        response = self._get('/api/dispositivi/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertIn('ubicazione', response.json()['results'][0])
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._get('/api/dispositivi/', etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        detail = self._get(f'/api/dispositivi/{self.devices[0].pk}/')
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(self._get(f'/api/dispositivi/{self.devices[0].pk}/', detail['ETag']).status_code, 304)
+        self.assertNotEqual(detail['ETag'], etag)
+
+    def test_changes_invalidate_etag_and_cached_body(self):
+        etag = self._get('/api/dispositivi/')['ETag']
+        device = self.devices[0]
+        device.nome = 'iPad rinominato'
+        device.save()
+
+        response = self._get('/api/dispositivi/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('iPad rinominato', [d['nome'] for d in response.json()['results']])
+
+        # Cancellazione logica: cambia il numero di righe
+        etag = response['ETag']
+        Dispositivo.objects.filter(pk=self.devices[2].pk).update(attivo=False)
+        response = self._get('/api/dispositivi/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_if_modified_since_alone_never_returns_stale_304(self):
+        self._get('/api/dispositivi/')
+        since = http_date(timezone.now().timestamp() + 60)
+
+        Dispositivo.objects.filter(pk=self.devices[2].pk).update(attivo=False)
+        response = self.client.get('/api/dispositivi/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_cached_body_skips_serialization_queries(self):
+        first = self._get('/api/risorse/')
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self._get('/api/risorse/')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_filters_have_their_own_etag(self):
+        all_etag = self._get('/api/risorse/')['ETag']
+        carts = self._get('/api/risorse/?tipo=carrello')
+        self.assertEqual([r['codice'] for r in carts.json()['results']], ['CAR1'])
+        self.assertNotEqual(carts['ETag'], all_etag)
+
+    def test_nested_devices_change_resource_etag(self):
+        response = self._get(f'/api/risorse/{self.cart.pk}/')
+        self.assertEqual(len(response.json()['dispositivi']), 2)
+        etag = response['ETag']
+
+        self.cart.dispositivi.add(self.devices[2])
+        response = self._get(f'/api/risorse/{self.cart.pk}/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['dispositivi']), 3)
+
+        etag = response['ETag']
+        device = self.devices[0]
+        device.stato = 'manutenzione'
+        device.save()
+        self.assertEqual(self._get(f'/api/risorse/{self.cart.pk}/', etag).status_code, 200)
+
+    def test_m2m_signal_touches_resource(self):
+        old = timezone.now() - timedelta(days=1)
+        Risorsa.objects.filter(pk=self.cart.pk).update(modificato_il=old)
+        touch_risorsa_dispositivi_signal(Risorsa.dispositivi.through, self.devices[0], 'post_add', True, {self.cart.pk})
+        self.cart.refresh_from_db()
+        self.assertGreater(self.cart.modificato_il, old)
+
+    def test_anonymous_requests_are_rejected(self):
+        anonymous = APIClient()
+        for url in ('/api/dispositivi/', f'/api/dispositivi/{self.devices[0].pk}/',
+                    '/api/risorse/', f'/api/risorse/{self.cart.pk}/'):
+            self.assertIn(anonymous.get(url).status_code, (401, 403), url)
+
+    def test_missing_object_is_404(self):
+        self.assertEqual(self._get('/api/dispositivi/999999/').status_code, 404)
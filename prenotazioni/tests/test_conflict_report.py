@@ -0,0 +1,79 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from prenotazioni.models import Prenotazione, Risorsa
+from prenotazioni.services import ConflictAnalysisService
+
+User = get_user_model()
+
+
+class ConflictReportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.lab = Risorsa.objects.create(nome='Lab', codice='LAB', tipo='laboratorio')
+        self.cart = Risorsa.objects.create(nome='Carrello', codice='CAR', tipo='carrello', capacita_massima=10)
+        self.t0 = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=5)
+
+    def _book(self, risorsa, start_h, end_h, quantita=1, **kwargs):
+        return Prenotazione.objects.create(
+            utente=self.user, risorsa=risorsa, quantita=quantita,
+            inizio=self.t0 + timedelta(hours=start_h), fine=self.t0 + timedelta(hours=end_h), **kwargs
+        )
+
+    def test_exclusive_resource_overlaps(self):
+        a = self._book(self.lab, 0, 2)
+        b = self._book(self.lab, 1, 3)
+        self._book(self.lab, 3, 4)  # adiacente: nessun conflitto
+        c = self._book(self.lab, 10, 12)
+        d = self._book(self.lab, 11, 12)
+        self._book(self.lab, 11, 12, stato='annullata')
+
+        groups = ConflictAnalysisService.report()
+        self.assertEqual([g['prenotazioni'] for g in groups], [sorted([a.pk, b.pk]), sorted([c.pk, d.pk])])
+        self.assertEqual(groups[0]['picco'], 2)
+
+    def test_cart_quantities_and_overbooking(self):
+        self._book(self.cart, 0, 2, quantita=6)
+        self._book(self.cart, 1, 3, quantita=4)
+        self.assertEqual(ConflictAnalysisService.report(), [])
+
+        extra = self._book(self.cart, 1, 2, quantita=2)
+        groups = ConflictAnalysisService.report()
+        self.assertEqual(len(groups), 1)
+        self.assertEqual((groups[0]['picco'], groups[0]['limite']), (12, 10))
+        self.assertIn(extra.pk, groups[0]['prenotazioni'])
+
+        self.cart.allow_overbooking = True
+        self.cart.overbooking_limite = 2
+        self.cart.save()
+        self.assertEqual(ConflictAnalysisService.report(), [])
+
+    def test_query_count_is_constant(self):
+        for i in range(10):
+            self._book(self.lab, i, i + 2)
+        with CaptureQueriesContext(connection) as ctx:
+            groups = ConflictAnalysisService.report()
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(len(groups[0]['prenotazioni']), 10)
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+
+    def test_command_outputs_json(self):
+        self._book(self.lab, 0, 2)
+        self._book(self.lab, 1, 3)
+        out = StringIO()
+        call_command('report_conflitti', '--formato', 'json', '--risorsa', str(self.lab.pk), stdout=out, stderr=StringIO())
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+        self.assertIn('"limite": 1', out.getvalue())
+
+    def test_command_rejects_impossible_dates(self):
+        for date in ('2024-02-30', 'ieri'):
+            with self.subTest(date=date), self.assertRaises(CommandError):
+                call_command('report_conflitti', '--dal', date, stdout=StringIO(), stderr=StringIO())
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from prenotazioni.models import Risorsa
+
+User = get_user_model()
+
+
+class DatabaseViewerTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        for i in range(7):
+            Risorsa.objects.create(nome=f'Lab {i}', codice=f'LAB{i}', tipo='laboratorio')
+        Risorsa.objects.create(nome='Aula magna', codice='AULA', tipo='aula')
+        self.client.force_login(self.admin)
+
+    def _data(self, section, **params):
+        return self.client.get(reverse('prenotazioni:database_viewer_data', args=[section]), params)
+
+    def test_page_renders_without_loading_tables(self):
+        response = self.client.get(reverse('prenotazioni:database_viewer'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'data-section="dispositivi"')
+        self.assertNotContains(response, 'Aula magna')
+
+    def test_keyset_pagination_walks_all_rows_once(self):
+        seen = []
+        after = None
+        while True:
+            params = {'limit': 3}
+            if after:
+                params['after'] = after
+            data = self._data('risorse', **params).json()
+            seen.extend(row['id'] for row in data['results'])
+            after = data['next']
+            if after is None:
+                break
+        self.assertEqual(seen, sorted(Risorsa.objects.values_list('id', flat=True), reverse=True))
+
+    def test_query_count_does_not_depend_on_page_depth(self):
+        first = self._data('risorse', limit=2).json()
+        with CaptureQueriesContext(connection) as shallow:
+            self._data('risorse', limit=2)
+        with CaptureQueriesContext(connection) as deep:
+            self._data('risorse', limit=2, after=first['next'])
+        self.assertEqual(len(shallow.captured_queries), len(deep.captured_queries))
+
+    def test_search_and_filters(self):
+        data = self._data('risorse', q='magna').json()
+        self.assertEqual([r['codice'] for r in data['results']], ['AULA'])
+        data = self._data('risorse', tipo='laboratorio', limit=100).json()
+        self.assertEqual(len(data['results']), 7)
+        self.assertEqual(set(data['results'][0]), {'id', 'codice', 'nome', 'tipo', 'localizzazione__nome', 'capacita_massima', 'attivo'})
+
+    def test_invalid_requests(self):
+        self.assertEqual(self._data('risorse', colore='rosso').status_code, 400)
+        self.assertEqual(self._data('utenti', is_active='forse').status_code, 400)
+        self.assertEqual(self._data('segreti').status_code, 404)
+
+    def test_every_section_loads(self):
+        for section in ('utenti', 'risorse', 'dispositivi', 'prenotazioni', 'log'):
+            with self.subTest(section=section):
+                self.assertEqual(self._data(section).status_code, 200)
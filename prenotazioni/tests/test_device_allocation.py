@@ -0,0 +1,216 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from prenotazioni.models import Dispositivo, Prenotazione, PrenotazioneDispositivo, Risorsa, SeriePrenotazioni
+from prenotazioni.services import BookingService, DeviceService, RecurringBookingService
+
+User = get_user_model()
+
+
+class DeviceAllocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.cart = Risorsa.objects.create(nome='Carrello 1', codice='CAR1', tipo='carrello', capacita_massima=30)
+        self.laptops = [
+            Dispositivo.objects.create(nome=f'Notebook {i}', marca='Acme', codice_inventario=f'INV{i:03d}', tipo='laptop')
+            for i in range(30)
+        ]
+        self.cart.dispositivi.set(self.laptops)
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=3)
+
+    def _booking(self, quantita, offset_hours=0, hours=2):
+        inizio = self.start + timedelta(hours=offset_hours)
+        return Prenotazione.objects.create(utente=self.user, risorsa=self.cart, inizio=inizio,
+                                           fine=inizio + timedelta(hours=hours), quantita=quantita, stato='approvata')
+
+    def test_full_cart_is_allocated_in_two_queries(self):
+        booking = self._booking(30)
+        with CaptureQueriesContext(connection) as ctx:
+            success, assegnazioni = DeviceService.allocate_devices(booking)
+        self.assertTrue(success)
+        self.assertEqual(len(assegnazioni), 30)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(booking.dispositivi_assegnati.values('dispositivo').distinct().count(), 30)
+
+    def test_overlapping_bookings_get_disjoint_devices(self):
+        first = self._booking(20)
+        DeviceService.allocate_devices(first)
+        second = self._booking(10, offset_hours=1)
+        success, _ = DeviceService.allocate_devices(second)
+        self.assertTrue(success)
+
+        first_ids = set(first.dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+        second_ids = set(second.dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+        self.assertFalse(first_ids & second_ids)
+
+        third = self._booking(1, offset_hours=1)
+        success, message = DeviceService.allocate_devices(third)
+        self.assertFalse(success)
+        self.assertIn('0 su 1', message)
+        self.assertFalse(third.dispositivi_assegnati.exists())
+
+    def test_devices_are_freed_by_cancellation_return_and_time(self):
+        booking = self._booking(30)
+        DeviceService.allocate_devices(booking)
+        device = self.laptops[0]
+        end = booking.fine
+        self.assertFalse(DeviceService.check_device_availability(device, booking.inizio, end))
+        self.assertTrue(DeviceService.check_device_availability(device, end, end + timedelta(hours=1)))
+        self.assertTrue(DeviceService.check_device_availability(device, booking.inizio, end, exclude_booking_id=booking.pk))
+
+        self.assertEqual(DeviceService.release_devices(booking), 30)
+        self.assertTrue(DeviceService.check_device_availability(device, booking.inizio, end))
+
+        other = self._booking(30)
+        DeviceService.allocate_devices(other)
+        Prenotazione.objects.filter(pk=other.pk).update(stato='annullata')
+        self.assertTrue(DeviceService.check_device_availability(device, booking.inizio, end))
+
+    def test_wear_is_balanced_across_devices(self):
+        for day in range(3):
+            booking = self._booking(10, offset_hours=24 * day)
+            DeviceService.allocate_devices(booking)
+        usage = PrenotazioneDispositivo.objects.values_list('dispositivo_id', flat=True)
+        self.assertEqual(len(set(usage)), 30)
+
+        self.laptops[5].stato = 'manutenzione'
+        self.laptops[5].save()
+        booking = self._booking(30, offset_hours=24 * 4)
+        success, message = DeviceService.allocate_devices(booking)
+        self.assertFalse(success)
+        self.assertIn('29 su 30', message)
+
+    def test_create_booking_allocates_cart_devices(self):
+        success, booking = BookingService.create_booking(self.user, self.cart.id, 12, self.start,
+                                                         self.start + timedelta(hours=1))
+        self.assertTrue(success, booking)
+        self.assertEqual(booking.dispositivi_assegnati.count(), 12)
+
+        # La capacità residua del carrello basta, ma 10 portatili liberi sono in manutenzione
+        Dispositivo.objects.filter(pk__in=[d.pk for d in self.laptops[-10:]]).update(stato='manutenzione')
+        success, message = BookingService.create_booking(self.user, self.cart.id, 18, self.start,
+                                                         self.start + timedelta(hours=1))
+        self.assertFalse(success)
+        self.assertIn('8 su 18', message)
+        self.assertEqual(Prenotazione.objects.count(), 1)
+
+    def test_cart_without_devices_keeps_quantity_check(self):
+        legacy = Risorsa.objects.create(nome='Carrello storico', codice='CAR2', tipo='carrello', capacita_massima=10)
+        success, booking = BookingService.create_booking(self.user, legacy.id, 5, self.start,
+                                                         self.start + timedelta(hours=1))
+        self.assertTrue(success, booking)
+        self.assertFalse(booking.dispositivi_assegnati.exists())
+
+    def test_usage_stats_follow_assignments(self):
+        booking = self._booking(2)
+        Prenotazione.objects.filter(pk=booking.pk).update(inizio=timezone.now() - timedelta(days=1),
+                                                          fine=timezone.now() - timedelta(days=1) + timedelta(hours=2))
+        DeviceService.allocate_devices(Prenotazione.objects.get(pk=booking.pk))
+        device = booking.dispositivi_assegnati.first().dispositivo
+        stats = DeviceService.get_device_usage_stats(device)
+        self.assertEqual(stats['total_bookings'], 1)
+        self.assertAlmostEqual(stats['total_hours'], 2)
+
+    def _assign(self, booking, devices):
+        PrenotazioneDispositivo.objects.bulk_create([
+            PrenotazioneDispositivo(prenotazione=booking, dispositivo=device) for device in devices
+        ])
+
+    def test_moving_booking_onto_other_devices_reallocates(self):
+        moved = self._booking(10)
+        other = self._booking(10, offset_hours=24)
+        self._assign(moved, self.laptops[:10])
+        self._assign(other, self.laptops[:10])
+
+        success, booking = BookingService.update_booking(moved.pk, self.user, other.inizio, other.fine, 10)
+        self.assertTrue(success, booking)
+        moved_ids = set(moved.dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+        other_ids = set(other.dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+        self.assertEqual(len(moved_ids), 10)
+        self.assertFalse(moved_ids & other_ids)
+
+        # Più portatili richiesti: le assegnazioni seguono la quantità
+        success, booking = BookingService.update_booking(moved.pk, self.user, other.inizio, other.fine, 15)
+        self.assertTrue(success, booking)
+        self.assertEqual(moved.dispositivi_assegnati.count(), 15)
+
+    def test_failed_reallocation_rolls_back_the_move(self):
+        moved = self._booking(10)
+        other = self._booking(10, offset_hours=24)
+        self._assign(moved, self.laptops[:10])
+        self._assign(other, self.laptops[10:20])
+        Dispositivo.objects.filter(pk__in=[d.pk for d in self.laptops[20:]]).update(stato='manutenzione')
+
+        success, message = BookingService.update_booking(moved.pk, self.user, other.inizio, other.fine, 12)
+        self.assertFalse(success)
+        self.assertIn('su 12', message)
+        moved.refresh_from_db()
+        self.assertEqual((moved.inizio, moved.quantita), (self.start, 10))
+        self.assertEqual(set(moved.dispositivi_assegnati.values_list('dispositivo_id', flat=True)),
+                         {d.pk for d in self.laptops[:10]})
+
+    def _cart_series(self, giorno, **kwargs):
+        return RecurringBookingService.create_series(
+            utente=self.user, risorsa_id=self.cart.id, data_inizio=giorno, data_fine=giorno + timedelta(weeks=3),
+            giorni_settimana=[giorno.weekday()], ora_inizio=time(8), ora_fine=time(10), quantita=10, **kwargs
+        )
+
+    def test_cart_series_allocates_devices_per_occurrence(self):
+        giorno = timezone.localdate() + timedelta(weeks=1)
+        inizio = timezone.make_aware(datetime.combine(giorno + timedelta(weeks=1), time(8)))
+        blocker = Prenotazione.objects.create(utente=self.user, risorsa=self.cart, inizio=inizio,
+                                              fine=inizio + timedelta(hours=2), quantita=5, stato='approvata')
+        self._assign(blocker, self.laptops[:5])
+        # La capacità residua basta, ma restano liberi solo 5 portatili su 10 richiesti
+        Dispositivo.objects.filter(pk__in=[d.pk for d in self.laptops[10:]]).update(stato='manutenzione')
+
+        success, message, conflicts = self._cart_series(giorno, consenti_parziale=False)
+        self.assertFalse(success)
+        self.assertEqual([c[0] for c in conflicts], [inizio])
+        self.assertFalse(SeriePrenotazioni.objects.exists())
+        self.assertEqual(PrenotazioneDispositivo.objects.count(), 5)
+
+        success, serie, conflicts = self._cart_series(giorno)
+        self.assertTrue(success, serie)
+        self.assertEqual(len(conflicts), 1)
+        self.assertIn('su 10', conflicts[0][2])
+        self.assertEqual(serie.occorrenze.count(), 3)
+        for booking in serie.occorrenze.all():
+            self.assertEqual(booking.dispositivi_assegnati.count(), 10)
+
+    def test_moving_cart_series_reallocates_or_rolls_back(self):
+        giorno = timezone.localdate() + timedelta(weeks=1)
+        _, serie, _ = self._cart_series(giorno)
+        inizio = timezone.make_aware(datetime.combine(giorno + timedelta(weeks=2), time(11)))
+        blocker = Prenotazione.objects.create(utente=self.user, risorsa=self.cart, inizio=inizio,
+                                              fine=inizio + timedelta(hours=1), quantita=10, stato='approvata')
+        self._assign(blocker, self.laptops[:10])
+
+        success, updated, conflicts = RecurringBookingService.update_series(
+            serie.pk, self.user, ora_inizio=time(11), ora_fine=time(12)
+        )
+        self.assertTrue(success, updated)
+        blocked = set(blocker.dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+        for booking in serie.occorrenze.all():
+            assigned = set(booking.dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+            self.assertEqual(len(assigned), 10)
+            if booking.inizio == inizio:
+                self.assertFalse(assigned & blocked)
+
+        # Con 15 portatili in manutenzione l'occorrenza bloccata non trova dispositivi
+        Dispositivo.objects.filter(pk__in=[d.pk for d in self.laptops[15:]]).update(stato='manutenzione')
+        before = {b.pk: set(b.dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+                  for b in serie.occorrenze.all()}
+        success, message, conflicts = RecurringBookingService.update_series(
+            serie.pk, self.user, ora_inizio=time(10), ora_fine=time(12)
+        )
+        self.assertFalse(success)
+        self.assertEqual([timezone.localtime(c[0]).date() for c in conflicts], [giorno + timedelta(weeks=2)])
+        self.assertFalse(serie.occorrenze.exclude(inizio__hour=timezone.localtime(inizio).hour).exists())
+        self.assertEqual({b.pk: set(b.dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+                          for b in serie.occorrenze.all()}, before)
@@ -0,0 +1,74 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from prenotazioni.models import Prenotazione, Risorsa, LogSistema
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass', is_staff=True)
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.lab = Risorsa.objects.create(nome='Lab', codice='LAB', tipo='laboratorio')
+        self.aula = Risorsa.objects.create(nome='Aula', codice='AULA', tipo='aula')
+        base = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for day in range(3):
+            Prenotazione.objects.create(utente=self.user, risorsa=self.lab, inizio=base + timedelta(days=day),
+                                        fine=base + timedelta(days=day, hours=1))
+        Prenotazione.objects.create(utente=self.user, risorsa=self.aula, inizio=base, fine=base + timedelta(hours=1))
+        self.base = base
+
+    def test_csv_stream_with_resource_filter(self):
+        self.client.login(username='admin', password='pass')
+        url = reverse('prenotazioni:export_dati', args=['prenotazioni'])
+        response = self.client.get(url, {'risorsa': self.lab.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertTrue(lines[0].startswith('id,utente_id'))
+        self.assertEqual(len(lines), 4)
+
+    def test_ndjson_stream_with_date_filter(self):
+        self.client.login(username='admin', password='pass')
+        url = reverse('prenotazioni:export_dati', args=['prenotazioni'])
+        day = self.base.date().isoformat()
+        response = self.client.get(url, {'formato': 'ndjson', 'dal': day, 'al': day})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({r['risorsa__codice'] for r in rows}, {'LAB', 'AULA'})
+
+    def test_export_requires_staff(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('prenotazioni:export_dati', args=['log']))
+        self.assertNotEqual(response.status_code, 200)
+
+    def test_unsupported_filter_is_rejected(self):
+        self.client.login(username='admin', password='pass')
+        response = self.client.get(reverse('prenotazioni:export_dati', args=['log']), {'risorsa': self.lab.id})
+        self.assertEqual(response.status_code, 400)
+
+    def test_management_command_exports_logs(self):
+        LogSistema.objects.create(tipo_evento='test', messaggio='ciao', dettagli={'a': 1}, utente=self.user)
+        out = StringIO()
+        call_command('export_dati', 'log', '--formato', 'ndjson', '--utente', str(self.user.id), stdout=out, stderr=StringIO())
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['dettagli'], {'a': 1})
+
+    def test_impossible_dates_are_rejected(self):
+        self.client.login(username='admin', password='pass')
+        response = self.client.get(reverse('prenotazioni:export_dati', args=['prenotazioni']), {'dal': '2024-02-30'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['param'], 'dal')
+
+        with self.assertRaises(CommandError):
+            call_command('export_dati', 'prenotazioni', '--al', '2024-02-30', stdout=StringIO(), stderr=StringIO())
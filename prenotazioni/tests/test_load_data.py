@@ -0,0 +1,68 @@
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from prenotazioni.models import NotificaUtente, Prenotazione, ProfiloUtente
+
+User = get_user_model()
+
+SIZES = ['--utenti', '40', '--risorse', '8', '--dispositivi', '20', '--prenotazioni', '3000', '--notifiche', '50']
+
+
+class GenerateLoadDataTests(TestCase):
+    def _run(self, *args):
+        out = StringIO()
+        call_command('generate_load_data', *SIZES, *args, stdout=out)
+        return out.getvalue()
+
+    def test_creates_requested_volumes(self):
+        output = self._run()
+
+        self.assertIn('bookings: 3000', output)
+        self.assertEqual(User.objects.filter(username__startswith='syn_u').count(), 40)
+        self.assertEqual(ProfiloUtente.objects.filter(utente__username__startswith='syn_u').count(), 40)
+        self.assertEqual(Prenotazione.all_objects.count(), 3000)
+        backlog = NotificaUtente.objects.filter(stato='pending', canale='email')
+        self.assertGreater(backlog.count(), 0)
+        self.assertEqual(NotificaUtente.objects.count(), 50)
+
+    def test_distributions_are_realistic(self):
+        self._run()
+        bookings = Prenotazione.all_objects.all()
+
+        cancelled = bookings.filter(cancellato_il__isnull=False)
+        self.assertTrue(0 < cancelled.count() < 3000 * 0.15)
+        self.assertFalse(cancelled.exclude(stato='annullata').exists())
+
+        hours = Counter(timezone.localtime(b.inizio).hour for b in bookings)
+        weekdays = Counter(timezone.localtime(b.inizio).weekday() for b in bookings)
+        self.assertGreater(hours[9], hours[13])
+        self.assertLessEqual(max(hours), 14)
+        self.assertNotIn(5, weekdays)
+        self.assertNotIn(6, weekdays)
+        self.assertGreater(weekdays[0], weekdays[4])
+        self.assertTrue(all(timezone.localtime(b.fine).hour <= 16 for b in bookings))
+
+        # Code lunga: l'utente più attivo prenota molto più della media
+        per_user = Counter(bookings.values_list('utente_id', flat=True))
+        self.assertGreater(max(per_user.values()), 2 * 3000 / 40)
+
+    def test_same_seed_gives_same_data_after_cleanup(self):
+        self._run()
+        first = list(Prenotazione.all_objects.order_by('inizio', 'risorsa__codice', 'utente__username')
+                     .values_list('inizio', 'risorsa__codice', 'utente__username', 'stato'))
+        self._run('--pulisci')
+        second = list(Prenotazione.all_objects.order_by('inizio', 'risorsa__codice', 'utente__username')
+                      .values_list('inizio', 'risorsa__codice', 'utente__username', 'stato'))
+        self.assertEqual(first, second)
+
+    def test_existing_prefix_without_cleanup_fails_cleanly(self):
+        self._run()
+        with self.assertRaises(CommandError):
+            self._run()
+        self.assertEqual(Prenotazione.all_objects.count(), 3000)
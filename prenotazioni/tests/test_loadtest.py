@@ -0,0 +1,104 @@
+from datetime import datetime, time, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from prenotazioni import loadtest, synthetic
+from prenotazioni.models import Prenotazione, Risorsa
+
+User = get_user_model()
+
+
+class RushHarnessTests(TransactionTestCase):
+    def test_sequential_rush_books_each_resource_once(self):
+        for target in loadtest.TARGETS:
+            with self.subTest(target=target):
+                summary = loadtest.run(target=target, teachers=12, laboratori=2, carrelli=0, concurrency=1,
+                                       allow_real_db=True)
+                self.assertEqual(summary['requests'], 12)
+                self.assertEqual(summary['errors'], 0)
+                self.assertEqual(summary['created'], 2)
+                self.assertEqual(summary['rejected'], 10)
+                self.assertEqual(summary['double_bookings'], 0)
+                self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+        # I dati della prova vengono rimossi
+        self.assertFalse(Risorsa.all_objects.filter(codice__startswith='RUSH-R').exists())
+        self.assertFalse(User.objects.filter(username__startswith='rush_u').exists())
+
+    def test_concurrent_rush_has_no_double_bookings(self):
+        summary = loadtest.run(target='api', teachers=30, laboratori=2, carrelli=1, concurrency=6, allow_real_db=True)
+        self.assertEqual(summary['requests'], 30)
+        self.assertEqual(summary['double_bookings'], 0)
+
+    def test_command_reports_passing_gate(self):
+        out = StringIO()
+        call_command('loadtest_prenotazioni', '--target', 'api', '--docenti', '6', '--concorrenza', '1',
+                     '--consenti-db-reale', stdout=out)
+        self.assertIn('Prova di carico superata', out.getvalue())
+
+
+class RealDatabaseGuardTests(TestCase):
+    def test_refuses_without_debug_or_consent(self):
+        User.objects.create_user(username='rush_u00000', email='vero@example.com')
+        with override_settings(DEBUG=False):
+            with self.assertRaises(RuntimeError):
+                loadtest.run(target='api', teachers=2, laboratori=1, carrelli=0, concurrency=1)
+            with self.assertRaises(CommandError):
+                call_command('loadtest_prenotazioni', '--docenti', '2', stdout=StringIO())
+        # Nessuna pulizia eseguita
+        self.assertTrue(User.objects.filter(username='rush_u00000').exists())
+
+    @override_settings(DEBUG=True)
+    def test_debug_allows_run(self):
+        self.assertTrue(loadtest.database_allowed())
+
+
+class DoubleBookingCountTests(TestCase):
+    def test_counts_bookings_beyond_the_first_in_each_group(self):
+        users, resources = loadtest.prepare(teachers=3, laboratori=1, carrelli=0)
+        day = loadtest.rush_day()
+        inizio = timezone.make_aware(datetime.combine(day, time(8, 0)))
+        for user in users:
+            Prenotazione.objects.create(utente=user, risorsa=resources[0], inizio=inizio,
+                                        fine=inizio + timedelta(hours=1), stato='approvata')
+
+        self.assertEqual(loadtest.count_double_bookings(resources, day), (2, 1))
+
+    def test_gate_thresholds(self):
+        summary = {'error_rate': 0.0, 'double_bookings': 0, 'p95_ms': 50.0}
+        self.assertEqual(loadtest.check_gate(summary), [])
+        self.assertEqual(len(loadtest.check_gate({**summary, 'double_bookings': 1})), 1)
+        self.assertEqual(len(loadtest.check_gate({**summary, 'error_rate': 0.2})), 1)
+        self.assertEqual(len(loadtest.check_gate(summary, max_p95_ms=10)), 1)
+
+
+class BookingApiCreateTests(TestCase):
+    def setUp(self):
+        self.users, self.resources = loadtest.prepare(teachers=2, laboratori=1, carrelli=0, prefix='api')
+        inizio = timezone.make_aware(datetime.combine(loadtest.rush_day(), time(10, 0)))
+        self.payload = {
+            'risorsa': self.resources[0].pk,
+            'inizio': inizio.isoformat(),
+            'fine': (inizio + timedelta(hours=1)).isoformat(),
+            'quantita': 1,
+        }
+
+    def tearDown(self):
+        synthetic.purge('api')
+
+    def test_create_goes_through_availability_check(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        response = client.post('/api/prenotazioni/', self.payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Prenotazione.objects.get().utente, self.users[0])
+
+        client.force_authenticate(self.users[1])
+        response = client.post('/api/prenotazioni/', self.payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Prenotazione.objects.count(), 1)
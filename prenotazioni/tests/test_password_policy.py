@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from prenotazioni.models import (
+    PasswordHistory, ProfiloUtente, create_user_profile_signal, invalidate_password_inputs_signal,
+)
+from prenotazioni.services import PasswordPolicyService
+from prenotazioni.views import ForcedPasswordChangeForm
+
+User = get_user_model()
+
+STRONG = 'Vela-Grotta-Ciclamino-47'
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PasswordPolicyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='mrossi', email='mario.rossi@example.com', password='Vecchia-Password-91!')
+        for old in ('Primo-Tentativo-2020!', STRONG):
+            PasswordHistory.objects.create(utente=self.user, password_hash=make_password(old))
+
+    def _form(self, new):
+        return ForcedPasswordChangeForm(self.user, data={
+            'old_password': 'Vecchia-Password-91!', 'new_password1': new, 'new_password2': new,
+        })
+
+    def test_history_match_rejects_password(self):
+        self.assertIs(PasswordPolicyService.is_in_history(self.user, STRONG), True)
+        form = self._form(STRONG)
+        self.assertFalse(form.is_valid())
+        self.assertIn('già stata usata', str(form.errors))
+
+    def test_new_strong_password_is_accepted(self):
+        self.assertIs(PasswordPolicyService.is_in_history(self.user, 'Fiume-Lanterna-Quarzo-58'), False)
+        self.assertTrue(self._form('Fiume-Lanterna-Quarzo-58').is_valid())
+
+    def test_weak_password_is_rejected_by_zxcvbn(self):
+        with self.assertRaises(ValidationError) as ctx:
+            PasswordPolicyService.validate('Mrossi2024!', self.user)
+        self.assertTrue(any('troppo debole' in m for m in ctx.exception.messages))
+
+    def test_history_budget_exhausted_returns_none(self):
+        self.assertIsNone(PasswordPolicyService.is_in_history(self.user, 'Altra-Password-77!', budget=0))
+
+    def test_history_timeout_rejects_password(self):
+        with mock.patch.object(PasswordPolicyService, 'is_in_history', return_value=None):
+            with self.assertRaises(ValidationError) as ctx:
+                PasswordPolicyService.validate('Fiume-Lanterna-Quarzo-58', self.user)
+        self.assertTrue(any('storico' in m for m in ctx.exception.messages))
+
+    def test_profile_changes_invalidate_user_inputs(self):
+        self.assertNotIn('carlotta', PasswordPolicyService.user_inputs(self.user))
+        self.user.first_name = 'Carlotta'
+        self.user.save()
+        invalidate_password_inputs_signal(User, self.user)
+        self.assertIn('carlotta', PasswordPolicyService.user_inputs(self.user))
+
+        create_user_profile_signal(User, self.user, created=True)
+        profilo = ProfiloUtente.objects.get(utente=self.user)
+        profilo.cognome_utente = 'Bianchini'
+        profilo.save()
+        invalidate_password_inputs_signal(ProfiloUtente, profilo)
+        self.assertIn('bianchini', PasswordPolicyService.user_inputs(self.user))
+
+    def test_user_inputs_are_cached(self):
+        PasswordPolicyService.evaluate('qualcosa', self.user)
+        with self.assertNumQueries(0):
+            result = PasswordPolicyService.evaluate('mrossi123', self.user)
+        self.assertFalse(result['ok'])
+
+    def test_strength_endpoint_reports_zxcvbn_score(self):
+        self.client.force_login(self.user)
+        data = self.client.post(reverse('prenotazioni:check_password_strength'), {'password': STRONG}).json()
+        self.assertGreaterEqual(data['score'], data['min_score'])
+        self.assertTrue(data['is_strong'])
+
+    def test_strength_endpoint_matches_form_verdict(self):
+        # Soddisfa i requisiti regex ma zxcvbn (e quindi il form) la rifiuta
+        self.client.force_login(self.user)
+        data = self.client.post(reverse('prenotazioni:check_password_strength'), {'password': 'Mrossi2024!'}).json()
+        self.assertTrue(data['requirements']['min_length_10'])
+        self.assertFalse(data['is_strong'])
+        self.assertFalse(self._form('Mrossi2024!').is_valid())
+
+    @override_settings(AUTH_PASSWORD_VALIDATORS=[{
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', 'OPTIONS': {'min_length': 12},
+    }])
+    def test_strength_endpoint_applies_password_validators(self):
+        # Abbastanza forte per zxcvbn ma più corta del minimo dei validatori
+        self.client.force_login(self.user)
+        data = self.client.post(reverse('prenotazioni:check_password_strength'), {'password': 'qzxvblwrkp9'}).json()
+        self.assertGreaterEqual(data['score'], data['min_score'])
+        self.assertFalse(data['is_strong'])
+        self.assertTrue(data['errors'])
+        self.assertFalse(self._form('qzxvblwrkp9').is_valid())
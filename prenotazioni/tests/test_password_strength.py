@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+
+from prenotazioni import passwords
+
+
+class PasswordStrengthEvaluatorTests(SimpleTestCase):
+    def test_matches_reference_zxcvbn(self):
+        from zxcvbn import zxcvbn
+        for pwd in ('password1', 'Tr0ub4dor&3', 'correct horse battery staple', 'mrossi2024'):
+            with self.subTest(pwd=pwd):
+                expected = zxcvbn(pwd, user_inputs=['mrossi'])['score']
+                self.assertEqual(passwords.evaluate_password_strength(pwd, ['mrossi'])['score'], expected)
+
+    def test_results_are_memoized_by_hash_in_bounded_lru(self):
+        first = passwords.evaluate_password_strength('Lanterna-Quarzo-58', ['utente'])
+        first['suggestions'].append('modificato dal chiamante')
+        self.assertEqual(passwords.evaluate_password_strength('Lanterna-Quarzo-58', ['utente'])['suggestions'], [])
+        self.assertNotIn('Lanterna-Quarzo-58', ''.join(passwords._result_cache))
+
+        for i in range(passwords._RESULT_CACHE_SIZE + 10):
+            passwords.evaluate_password_strength(f'pw{i}')
+        self.assertEqual(len(passwords._result_cache), passwords._RESULT_CACHE_SIZE)
+
+    def test_user_inputs_lower_the_score(self):
+        self.assertLess(
+            passwords.evaluate_password_strength('giuseppeverdi', ['giuseppe', 'verdi'])['score'],
+            passwords.evaluate_password_strength('giuseppeverdi')['score'],
+        )
+
+    def test_long_passwords_are_capped(self):
+        result = passwords.evaluate_password_strength('x' * 1000 + 'Quarzo!')
+        self.assertIn('score', result)
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from prenotazioni.models import SessioneUtente
+from prenotazioni.services import UserSessionService
+
+User = get_user_model()
+
+
+class PinSessionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pin', email='pin@example.com', password='pass')
+
+    def _session(self, pin='123456', **kwargs):
+        return UserSessionService.create_session(self.user, 'login_pin', self.user.email, pin=pin, **kwargs)
+
+    def test_pin_is_stored_hashed_with_salt(self):
+        first = self._session()
+        second = self._session()
+
+        self.assertNotIn('123456', first.pin_sessione)
+        self.assertTrue(first.pin_sessione.startswith('hmac-sha256$'))
+        self.assertNotEqual(first.pin_sessione, second.pin_sessione)
+        self.assertTrue(first.pin_corretto('123456'))
+        self.assertFalse(first.pin_corretto('654321'))
+        self.assertFalse(first.pin_corretto(None))
+
+    def test_verification_is_single_use(self):
+        session = self._session()
+
+        self.assertEqual(UserSessionService.verify_session(session.token_sessione, '123456'), (True, 'Verifica completata con successo'))
+        session.refresh_from_db()
+        self.assertEqual(session.stato_sessione, 'verificato')
+        self.assertIsNotNone(session.data_verifica_sessione)
+
+        success, message = UserSessionService.verify_session(session.token_sessione, '123456')
+        self.assertFalse(success)
+        self.assertEqual(message, 'Sessione non valida')
+
+    def test_verification_queries(self):
+        session = self._session()
+        with CaptureQueriesContext(connection) as ctx:
+            success, _ = UserSessionService.verify_session(session.token_sessione, '123456')
+        self.assertTrue(success)
+        # Una lettura per token e un solo UPDATE condizionato (oltre all'eventuale log)
+        on_sessions = [q['sql'] for q in ctx.captured_queries if 'prenotazioni_sessioneutente' in q['sql']]
+        self.assertEqual(len(on_sessions), 2)
+        self.assertTrue(on_sessions[0].startswith('SELECT'))
+        self.assertTrue(on_sessions[1].startswith('UPDATE'))
+
+    def test_wrong_pin_does_not_change_state(self):
+        session = self._session()
+
+        self.assertEqual(UserSessionService.verify_session(session.token_sessione, '000000'), (False, 'PIN non corretto'))
+        session.refresh_from_db()
+        self.assertEqual(session.stato_sessione, 'in_attesa')
+
+    def test_update_refuses_session_expired_after_read(self):
+        session = self._session()
+        SessioneUtente.objects.filter(pk=session.pk).update(data_scadenza_sessione=timezone.now() - timedelta(seconds=1))
+
+        # L'istanza in memoria crede ancora la sessione valida: decide l'UPDATE
+        success, _ = session.verifica_sessione('123456')
+        self.assertFalse(success)
+        session.refresh_from_db()
+        self.assertEqual(session.stato_sessione, 'in_attesa')
+
+    def test_expired_session_is_marked(self):
+        session = self._session()
+        SessioneUtente.objects.filter(pk=session.pk).update(data_scadenza_sessione=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(UserSessionService.verify_session(session.token_sessione, '123456'), (False, 'Sessione scaduta'))
+        session.refresh_from_db()
+        self.assertEqual(session.stato_sessione, 'scaduto')
+
+    def test_legacy_plaintext_pin_still_verifies(self):
+        session = self._session()
+        SessioneUtente.objects.filter(pk=session.pk).update(pin_sessione='424242')
+
+        self.assertFalse(UserSessionService.verify_session(session.token_sessione, '123456')[0])
+        self.assertTrue(UserSessionService.verify_session(session.token_sessione, '424242')[0])
+
+    def test_unknown_or_malformed_token(self):
+        self.assertEqual(UserSessionService.verify_session('non-un-uuid', '123456'), (False, 'Sessione non trovata'))
+
+    def test_cleanup_touches_only_pending_expired_sessions(self):
+        past = timezone.now() - timedelta(hours=1)
+        pending = self._session()
+        verified = self._session()
+        already = self._session()
+        valid = self._session()
+        SessioneUtente.objects.filter(pk__in=[pending.pk, verified.pk, already.pk]).update(data_scadenza_sessione=past)
+        SessioneUtente.objects.filter(pk=verified.pk).update(stato_sessione='verificato')
+        SessioneUtente.objects.filter(pk=already.pk).update(stato_sessione='scaduto')
+
+        self.assertEqual(UserSessionService.cleanup_expired_sessions(), 1)
+        states = dict(SessioneUtente.objects.values_list('pk', 'stato_sessione'))
+        self.assertEqual(states[pending.pk], 'scaduto')
+        self.assertEqual(states[verified.pk], 'verificato')
+        self.assertEqual(states[valid.pk], 'in_attesa')
+        self.assertEqual(UserSessionService.cleanup_expired_sessions(), 0)
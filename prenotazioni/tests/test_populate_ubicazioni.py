@@ -0,0 +1,56 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from prenotazioni.models import UbicazioneRisorsa
+
+
+class PopulateUbicazioniCommandTests(TestCase):
+    def _write_csv(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as fh:
+            writer = csv.DictWriter(fh, fieldnames=['CODICESCUOLA', 'DENOMINAZIONESCUOLA', 'DESCRIZIONECOMUNE'])
+            writer.writeheader()
+            writer.writerows(rows)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def _run(self, path, *args):
+        out = StringIO()
+        call_command('populate_ubicazioni', '--csv', path, '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_load_is_idempotent_and_updates_changed_names(self):
+        path = self._write_csv([
+            {'CODICESCUOLA': 'GRIS00100A', 'DENOMINAZIONESCUOLA': 'Liceo A', 'DESCRIZIONECOMUNE': 'Follonica'},
+            {'CODICESCUOLA': 'GRIS00100B', 'DENOMINAZIONESCUOLA': 'Liceo B', 'DESCRIZIONECOMUNE': 'Follonica'},
+            {'CODICESCUOLA': 'GRIS00100B', 'DENOMINAZIONESCUOLA': 'Duplicato', 'DESCRIZIONECOMUNE': 'Follonica'},
+            {'CODICESCUOLA': 'GRIS00100C', 'DENOMINAZIONESCUOLA': 'Liceo C', 'DESCRIZIONECOMUNE': ''},
+        ])
+        self._run(path)
+        self.assertEqual(UbicazioneRisorsa.objects.count(), 3)
+        self.assertEqual(UbicazioneRisorsa.objects.get(codice_meccanografico='GRIS00100C').edificio, 'Sede')
+
+        output = self._run(path)
+        self.assertIn('Creati: 0', output)
+        self.assertIn('Invariati: 3', output)
+
+        path2 = self._write_csv([
+            {'CODICESCUOLA': 'GRIS00100A', 'DENOMINAZIONESCUOLA': 'Liceo A rinominato', 'DESCRIZIONECOMUNE': 'Follonica'},
+        ])
+        output = self._run(path2)
+        self.assertIn('Aggiornati: 1', output)
+        self.assertEqual(UbicazioneRisorsa.objects.get(codice_meccanografico='GRIS00100A').nome, 'Liceo A rinominato')
+
+    def test_dry_run_does_not_write(self):
+        path = self._write_csv([
+            {'CODICESCUOLA': 'GRIS00100A', 'DENOMINAZIONESCUOLA': 'Liceo A', 'DESCRIZIONECOMUNE': 'Follonica'},
+        ])
+        output = self._run(path, '--dry-run')
+        self.assertIn('Creati: 1', output)
+        self.assertIn('righe/s', output)
+        self.assertFalse(UbicazioneRisorsa.objects.exists())
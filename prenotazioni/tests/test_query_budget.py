@@ -0,0 +1,104 @@
+import logging
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from prenotazioni.middleware import QueryBudgetExceeded, QueryBudgetMiddleware
+from prenotazioni.models import Risorsa
+
+User = get_user_model()
+
+
+class ClientAwareCache(LocMemCache):
+    """Backend con argomenti extra come django-redis (`client=`)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.clients = []
+
+    def get(self, key, default=None, version=None, client=None):
+        self.clients.append(client)
+        return super().get(key, default, version)
+
+    def get_many(self, keys, version=None, client=None):
+        self.clients.append(client)
+        return super().get_many(keys, version)
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.url = reverse('prenotazioni:database_viewer_data', args=['risorse'])
+
+    def test_disabled_by_default_for_regular_requests(self):
+        self.client.force_login(self.staff)
+        self.assertNotIn('Server-Timing', self.client.get(self.url))
+
+    def test_staff_header_enables_profiling(self):
+        self.client.force_login(self.staff)
+        with self.assertLogs('prenotazioni.profiling', logging.INFO) as logs:
+            response = self.client.get(self.url, HTTP_X_PROFILE_QUERIES='1')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('"view": "prenotazioni:database_viewer_data"', logs.output[0])
+
+        self.client.force_login(self.user)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('home'), HTTP_X_PROFILE_QUERIES='1'))
+
+    @override_settings(QUERY_PROFILING_ENABLED=True, QUERY_BUDGETS={'prenotazioni:database_viewer_data': 1}, QUERY_BUDGET_STRICT=True)
+    def test_strict_budget_raises(self):
+        self.client.force_login(self.staff)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(self.url)
+
+    @override_settings(QUERY_PROFILING_ENABLED=True, QUERY_BUDGETS={'prenotazioni:database_viewer_data': 1})
+    def test_budget_warning(self):
+        self.client.force_login(self.staff)
+        with self.assertLogs('prenotazioni.profiling', logging.WARNING) as logs:
+            self.client.get(self.url)
+        self.assertTrue(any('Budget query superato' in line for line in logs.output))
+
+    @override_settings(QUERY_PROFILING_ENABLED=True)
+    def test_counts_duplicates_and_cache(self):
+        Risorsa.objects.create(nome='Lab', codice='LAB', tipo='laboratorio')
+        cache.set('presente', 1)
+
+        def view(request):
+            list(Risorsa.objects.all())
+            list(Risorsa.objects.all())
+            cache.get('presente')
+            cache.get('assente')
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/')
+        with self.assertLogs('prenotazioni.profiling', logging.INFO):
+            response = QueryBudgetMiddleware(view)(request)
+        self.assertIn('SQL (2)', response['Server-Timing'])
+        self.assertIn('SQL duplicate (1)', response['Server-Timing'])
+        self.assertIn('Cache hit 1 / miss 1', response['Server-Timing'])
+
+    def test_cache_backends_are_untouched_outside_profiled_requests(self):
+        original = type(caches['default']).get
+        QueryBudgetMiddleware(lambda request: HttpResponse('ok'))(RequestFactory().get('/'))
+        self.assertIs(type(caches['default']).get, original)
+        self.assertNotIn('get', vars(caches['default']))
+
+    @override_settings(QUERY_PROFILING_ENABLED=True, CACHES={'default': {
+        'BACKEND': 'prenotazioni.tests.test_query_budget.ClientAwareCache',
+    }})
+    def test_extra_cache_arguments_are_passed_through(self):
+        def view(request):
+            cache.set('presente', 1)
+            cache.get('presente', client='replica')
+            cache.get_many(['presente', 'assente'], client='replica')
+            return HttpResponse('ok')
+
+        with self.assertLogs('prenotazioni.profiling', logging.INFO):
+            response = QueryBudgetMiddleware(view)(RequestFactory().get('/'))
+        self.assertIn('Cache hit 2 / miss 1', response['Server-Timing'])
+        self.assertEqual(caches['default'].clients.count('replica'), 2)
+        self.assertNotIn('get', vars(caches['default']))
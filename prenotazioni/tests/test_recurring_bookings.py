@@ -0,0 +1,165 @@
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from prenotazioni.models import Prenotazione, Risorsa, SeriePrenotazioni
+from prenotazioni.services import RecurringBookingService
+
+User = get_user_model()
+
+
+def next_weekday(weekday, weeks_ahead=2):
+    today = timezone.localdate() + timedelta(weeks=weeks_ahead)
+    return today + timedelta(days=(weekday - today.weekday()) % 7)
+
+
+class ExpandTests(TestCase):
+    def test_weekly_biweekly_exceptions_and_count(self):
+        start = date(2030, 9, 2)  # lunedì
+        end = date(2030, 12, 20)
+        weekly = RecurringBookingService.expand(start, end, [1], time(8), time(10))
+        self.assertEqual(len(weekly), 16)
+        self.assertTrue(all(timezone.localtime(i).weekday() == 1 for i, _ in weekly))
+        self.assertEqual(timezone.localtime(weekly[0][0]).date(), date(2030, 9, 3))
+
+        biweekly = RecurringBookingService.expand(start, end, [1, 3], time(8), time(10), intervallo_settimane=2)
+        self.assertEqual([timezone.localtime(i).date() for i, _ in biweekly[:4]],
+                         [date(2030, 9, 3), date(2030, 9, 5), date(2030, 9, 17), date(2030, 9, 19)])
+
+        skipped = RecurringBookingService.expand(start, end, [1], time(8), time(10), eccezioni=[date(2030, 9, 10)])
+        self.assertEqual(len(skipped), 15)
+        limited = RecurringBookingService.expand(start, end, [1], time(8), time(10), occorrenze=4)
+        self.assertEqual(len(limited), 4)
+
+    def test_days_before_start_in_first_week_are_skipped(self):
+        start = date(2030, 9, 4)  # mercoledì
+        occurrences = RecurringBookingService.expand(start, date(2030, 9, 30), [0], time(8), time(9))
+        self.assertEqual(timezone.localtime(occurrences[0][0]).date(), date(2030, 9, 9))
+
+
+class RecurringSeriesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='docente', email='d@example.com')
+        self.other = User.objects.create_user(username='collega', email='c@example.com')
+        self.lab = Risorsa.objects.create(nome='Lab 1', codice='LAB1', tipo='laboratorio')
+        self.cart = Risorsa.objects.create(nome='Carrello', codice='CAR1', tipo='carrello', capacita_massima=20)
+        self.start = next_weekday(1)
+        self.end = self.start + timedelta(weeks=14)
+
+    def _series(self, **kwargs):
+        params = dict(utente=self.user, risorsa_id=self.lab.id, data_inizio=self.start, data_fine=self.end,
+                      giorni_settimana=[1], ora_inizio=time(8), ora_fine=time(10))
+        params.update(kwargs)
+        return RecurringBookingService.create_series(**params)
+
+    def _book(self, risorsa, giorno, start=8, end=10, quantita=1):
+        inizio = timezone.make_aware(datetime.combine(giorno, time(start)))
+        return Prenotazione.objects.create(utente=self.other, risorsa=risorsa, inizio=inizio,
+                                           fine=inizio.replace(hour=end), quantita=quantita, stato='approvata')
+
+    def test_creates_all_occurrences_for_a_term(self):
+        success, serie, conflicts = self._series()
+        self.assertTrue(success, serie)
+        self.assertEqual(conflicts, [])
+        self.assertEqual(serie.occorrenze.count(), 15)
+        self.assertFalse(serie.occorrenze.exclude(risorsa=self.lab).exists())
+
+    def test_conflicting_occurrences_are_skipped_or_block_the_series(self):
+        self._book(self.lab, self.start + timedelta(weeks=3), start=9, end=11)
+
+        success, message, conflicts = self._series(consenti_parziale=False)
+        self.assertFalse(success)
+        self.assertEqual(len(conflicts), 1)
+        self.assertFalse(SeriePrenotazioni.objects.exists())
+
+        success, serie, conflicts = self._series()
+        self.assertTrue(success)
+        self.assertEqual(serie.occorrenze.count(), 14)
+        self.assertEqual(timezone.localtime(conflicts[0][0]).date(), self.start + timedelta(weeks=3))
+
+    def test_cart_capacity_is_checked_per_occurrence(self):
+        self._book(self.cart, self.start, quantita=15)
+        success, serie, conflicts = self._series(risorsa_id=self.cart.id, quantita=10)
+        self.assertTrue(success)
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(serie.occorrenze.count(), 14)
+
+    def test_query_count_does_not_grow_with_occurrences(self):
+        # La prima serie crea anche lo stato 'pending': la si esclude dal confronto
+        self._series(data_fine=self.start)
+        Prenotazione.objects.all().delete()
+        with CaptureQueriesContext(connection) as few:
+            self._series(data_fine=self.start + timedelta(weeks=2))
+        Prenotazione.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            self._series(giorni_settimana=[1, 3])
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_update_shifts_all_future_occurrences_in_one_statement(self):
+        _, serie, _ = self._series()
+        with CaptureQueriesContext(connection) as ctx:
+            success, updated, _ = RecurringBookingService.update_series(
+                serie.pk, self.user, ora_inizio=time(11), ora_fine=time(12), scopo='Recupero'
+            )
+        self.assertTrue(success)
+        self.assertEqual(updated, 15)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "prenotazioni_prenotazione"')]
+        self.assertEqual(len(updates), 1)
+        for booking in serie.occorrenze.all():
+            self.assertEqual(timezone.localtime(booking.inizio).time(), time(11))
+            self.assertEqual(timezone.localtime(booking.fine).time(), time(12))
+            self.assertEqual(booking.scopo, 'Recupero')
+
+    def test_update_refuses_when_new_time_conflicts(self):
+        _, serie, _ = self._series()
+        self._book(self.lab, self.start + timedelta(weeks=5), start=11, end=12)
+        success, message, conflicts = RecurringBookingService.update_series(
+            serie.pk, self.user, ora_inizio=time(11), ora_fine=time(12)
+        )
+        self.assertFalse(success)
+        self.assertEqual(len(conflicts), 1)
+        self.assertFalse(serie.occorrenze.filter(inizio__hour=11).exists())
+
+    def test_cancel_and_exception(self):
+        _, serie, _ = self._series()
+        self.assertEqual(RecurringBookingService.cancel_series(serie.pk, self.other), (False, "Puoi cancellare solo le tue serie."))
+
+        success, cancelled = RecurringBookingService.add_exception(serie.pk, self.user, self.start + timedelta(weeks=1))
+        self.assertEqual((success, cancelled), (True, 1))
+        serie.refresh_from_db()
+        self.assertEqual(serie.eccezioni, [(self.start + timedelta(weeks=1)).isoformat()])
+
+        success, cancelled = RecurringBookingService.cancel_series(serie.pk, self.user)
+        self.assertEqual((success, cancelled), (True, 14))
+        self.assertFalse(Prenotazione.objects.filter(serie=serie).exists())
+        serie.refresh_from_db()
+        self.assertIsNotNone(serie.cancellato_il)
+
+    def test_api_creates_series(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/prenotazioni/serie/', {
+            'risorsa': self.lab.id,
+            'giorni_settimana': [1],
+            'intervallo_settimane': 2,
+            'data_inizio': self.start.isoformat(),
+            'data_fine': self.end.isoformat(),
+            'ora_inizio': '08:00',
+            'ora_fine': '10:00',
+            'scopo': 'Laboratorio di fisica',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['prenotazioni_create'], 8)
+
+        serie_id = response.json()['id']
+        for dal in ('domani', '2024-02-30'):
+            response = client.post(f'/api/prenotazioni/serie/{serie_id}/annulla/', {'dal': dal}, format='json')
+            self.assertEqual(response.status_code, 400, dal)
+        response = client.post(f'/api/prenotazioni/serie/{serie_id}/annulla/', {}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['occorrenze_annullate'], 8)
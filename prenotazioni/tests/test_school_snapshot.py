@@ -0,0 +1,129 @@
+import dataclasses
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, RequestContext, Template
+from django.test import RequestFactory, TestCase
+
+from prenotazioni.context_processors import scuola
+from prenotazioni.models import InformazioniScuola
+from prenotazioni.services import EmailService
+
+
+def _school(**kwargs):
+    defaults = dict(
+        id=1, nome_completo_scuola='Istituto Tecnico Statale', nome_breve_scuola='ITS',
+        codice_meccanografico_scuola='GRIS00100A', indirizzo_scuola='Via Roma 1',
+        codice_postale_scuola='58022', comune_scuola='Follonica', provincia_scuola='GR',
+        regione_scuola='Toscana',
+    )
+    defaults.update(kwargs)
+    return InformazioniScuola.objects.create(**defaults)
+
+
+class SchoolSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        InformazioniScuola.invalida_snapshot()
+        self.addCleanup(InformazioniScuola.invalida_snapshot)
+
+    def test_snapshot_is_frozen_and_cached(self):
+        _school()
+        InformazioniScuola.invalida_snapshot()
+
+        with self.assertNumQueries(1):
+            first = InformazioniScuola.ottieni_snapshot()
+            second = InformazioniScuola.ottieni_snapshot()
+        self.assertIs(first, second)
+        self.assertEqual(first.nome_breve_scuola, 'ITS')
+        self.assertIn('Follonica', first.indirizzo_completo_scuola)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            first.nome_breve_scuola = 'altro'
+
+    def test_missing_school_is_cached_and_not_created(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(InformazioniScuola.ottieni_snapshot())
+            self.assertIsNone(InformazioniScuola.ottieni_snapshot())
+        self.assertFalse(InformazioniScuola.objects.exists())
+
+    def test_save_invalidates_after_commit(self):
+        school = _school()
+        self.assertEqual(InformazioniScuola.ottieni_snapshot().nome_breve_scuola, 'ITS')
+
+        school.nome_breve_scuola = 'ITS Follonica'
+        with self.captureOnCommitCallbacks(execute=True):
+            school.save()
+        self.assertEqual(InformazioniScuola.ottieni_snapshot().nome_breve_scuola, 'ITS Follonica')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            school.delete()
+        self.assertIsNone(InformazioniScuola.ottieni_snapshot())
+
+    def test_shared_cache_serves_other_processes(self):
+        _school()
+        InformazioniScuola.invalida_snapshot()
+        InformazioniScuola.ottieni_snapshot()
+
+        # Un altro processo ha solo la cache condivisa, non la copia locale
+        InformazioniScuola._snapshot_locale = None
+        with self.assertNumQueries(0):
+            self.assertEqual(InformazioniScuola.ottieni_snapshot().nome_breve_scuola, 'ITS')
+
+    def test_snapshot_shared_across_threads(self):
+        _school()
+        InformazioniScuola.invalida_snapshot()
+        expected = InformazioniScuola.ottieni_snapshot()
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(InformazioniScuola.ottieni_snapshot()))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(snapshot is expected for snapshot in seen))
+
+
+class SchoolContextProcessorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        InformazioniScuola.invalida_snapshot()
+        self.addCleanup(InformazioniScuola.invalida_snapshot)
+        self.request = RequestFactory().get('/')
+
+    def test_lazy_until_used(self):
+        _school()
+        InformazioniScuola.invalida_snapshot()
+
+        with self.assertNumQueries(0):
+            Template('{{ request.path }}').render(RequestContext(self.request, {}, [scuola]))
+        with self.assertNumQueries(1):
+            rendered = Template('{{ school_info.nome_breve_scuola }}').render(
+                RequestContext(self.request, {}, [scuola]))
+        self.assertEqual(rendered, 'ITS')
+
+    def test_without_school_renders_empty(self):
+        rendered = Template('{% if school_info %}si{% else %}no{% endif %}').render(
+            RequestContext(self.request, {}, [scuola]))
+        self.assertEqual(rendered, 'no')
+
+
+class EmailSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        InformazioniScuola.invalida_snapshot()
+        self.addCleanup(InformazioniScuola.invalida_snapshot)
+
+    def test_pin_emails_read_school_once(self):
+        _school()
+        InformazioniScuola.invalida_snapshot()
+        user = get_user_model().objects.create_user('docente', 'docente@example.com', 'pass')
+
+        with mock.patch.object(EmailService, 'send_email', return_value=(True, None)) as send:
+            InformazioniScuola.ottieni_snapshot()
+            with self.assertNumQueries(0):
+                for _ in range(5):
+                    EmailService.send_pin_email(user, '123456')
+        self.assertEqual(send.call_args.kwargs['subject'], 'Codice PIN - ITS')
+        self.assertEqual(Template('{{ s }}').render(Context({'s': InformazioniScuola.ottieni_snapshot()})), 'ITS')
@@ -0,0 +1,139 @@
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from prenotazioni import slot_index
+from prenotazioni.models import Dispositivo, Prenotazione, PrenotazioneDispositivo, Risorsa
+from prenotazioni.services import BookingService, DeviceService
+
+User = get_user_model()
+
+PERIODI = ['08:00-09:00', '09:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-13:00', '13:00-14:00']
+
+
+@override_settings(SLOT_INDEX_ENABLED=True, ORE_SCOLASTICHE=PERIODI)
+class SlotIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='docente', email='docente@example.com')
+        self.cart = Risorsa.objects.create(nome='Carrello', codice='CAR1', tipo='carrello', capacita_massima=60)
+        self.devices = [
+            Dispositivo.objects.create(nome=f'Tablet {i}', marca='Acme', codice_inventario=f'TAB{i:03d}', tipo='tablet')
+            for i in range(60)
+        ]
+        self.cart.dispositivi.set(self.devices)
+        self.day = timezone.localdate() + timedelta(days=7)
+
+    def _at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.day, time(hour, minute)))
+
+    def _book(self, quantita, start, end):
+        with self.captureOnCommitCallbacks(execute=True):
+            success, booking = BookingService.create_booking(self.user, self.cart.id, quantita, start, end)
+        self.assertTrue(success, booking)
+        return booking
+
+    def _all_ids(self):
+        return [d.pk for d in self.devices]
+
+    def test_period_mask_marks_partial_overlap(self):
+        self.assertEqual(slot_index.period_mask(self._at(9), self._at(11), self.day), 0b000110)
+        self.assertEqual(slot_index.period_mask(self._at(10, 30), self._at(11, 15), self.day), 0b001100)
+        self.assertEqual(slot_index.period_mask(self._at(14), self._at(15), self.day), 0)
+
+    def test_free_devices_matches_exact_query(self):
+        booking = self._book(20, self._at(10), self._at(12))
+        busy = set(booking.dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+
+        self.assertEqual(set(slot_index.free_devices(self._all_ids(), self.day, 2, 4)), set(self._all_ids()) - busy)
+        self.assertEqual(len(slot_index.free_devices(self._all_ids(), self.day, 0, 1)), 60)
+        with override_settings(SLOT_INDEX_ENABLED=False):
+            exact = DeviceService.free_devices_in_periods(self.cart, self.day, 2, 4)
+        self.assertEqual(DeviceService.free_devices_in_periods(self.cart, self.day, 2, 4), exact)
+
+    def test_lookup_from_cache_needs_no_queries(self):
+        self._book(10, self._at(8), self._at(9))
+        slot_index.get_day(self.day)
+        with CaptureQueriesContext(connection) as ctx:
+            free = slot_index.free_devices(self._all_ids(), self.day, 0, 5)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(len(free), 50)
+
+    def test_index_follows_writes(self):
+        slot_index.get_day(self.day)
+        first = self._book(30, self._at(8), self._at(10))
+        # Nuova generazione: la copia precedente non è più raggiungibile
+        self.assertIsNone(cache.get(slot_index._key(self.day)))
+        self.assertEqual(len(slot_index.free_devices(self._all_ids(), self.day, 1, 1)), 30)
+        self.assertEqual(slot_index.verify(self.day, self.day), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BookingService.update_booking(first.pk, self.user, self._at(12), self._at(13), 30)
+        self.assertEqual(len(slot_index.free_devices(self._all_ids(), self.day, 0, 1)), 60)
+        self.assertEqual(len(slot_index.free_devices(self._all_ids(), self.day, 4, 4)), 30)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DeviceService.release_devices(first)
+        self.assertEqual(len(slot_index.free_devices(self._all_ids(), self.day, 0, 5)), 60)
+        self.assertEqual(slot_index.verify(self.day, self.day), [])
+
+    def test_build_racing_with_allocation_is_not_cached(self):
+        # Il lettore legge il database prima del commit dell'assegnazione e
+        # salva in cache dopo l'invalidazione che la segue
+        build_day = slot_index.build_day
+        allocated = []
+
+        def stale_build(giorno):
+            columns = build_day(giorno)
+            if not allocated:
+                allocated.append(self._book(20, self._at(9), self._at(11)))
+            return columns
+
+        with mock.patch.object(slot_index, 'build_day', stale_build):
+            stale = slot_index.get_day(self.day)
+        self.assertEqual(stale[1], 0)
+
+        busy = set(allocated[0].dispositivi_assegnati.values_list('dispositivo_id', flat=True))
+        self.assertEqual(set(slot_index.free_devices(self._all_ids(), self.day, 1, 2)), set(self._all_ids()) - busy)
+        self.assertEqual(slot_index.verify(self.day, self.day), [])
+
+    def test_invalidate_survives_evicted_generation(self):
+        slot_index.get_day(self.day)
+        key = slot_index._key(self.day)
+        cache.delete(slot_index._generation_key(self.day))
+        slot_index.invalidate(self._at(8), self._at(9))
+        self.assertNotEqual(slot_index._key(self.day), key)
+
+    def test_verify_command_detects_and_repairs_drift(self):
+        self._book(5, self._at(8), self._at(9))
+        slot_index.get_day(self.day)
+        # Assegnazione scritta senza passare dai servizi: l'indice non la vede
+        other = Prenotazione.objects.create(utente=self.user, risorsa=self.cart, inizio=self._at(11),
+                                            fine=self._at(12), quantita=1, stato='approvata')
+        PrenotazioneDispositivo.objects.create(prenotazione=other, dispositivo=self.devices[-1])
+
+        args = ['--da', self.day.isoformat(), '--a', self.day.isoformat()]
+        with self.assertRaises(CommandError):
+            call_command('verifica_indice_slot', *args, stdout=StringIO())
+        out = StringIO()
+        call_command('verifica_indice_slot', *args, '--ripara', stdout=out)
+        self.assertIn('riparati', out.getvalue())
+        self.assertNotIn(self.devices[-1].pk, slot_index.free_devices(self._all_ids(), self.day, 3, 3))
+        call_command('verifica_indice_slot', *args, stdout=StringIO())
+
+    def test_verify_command_rejects_impossible_dates(self):
+        with self.assertRaises(CommandError):
+            call_command('verifica_indice_slot', '--da', '2024-02-30', stdout=StringIO())
+
+    def test_invalid_period_range(self):
+        with self.assertRaises(ValueError):
+            DeviceService.free_devices_in_periods(self.cart, self.day, 4, 6)
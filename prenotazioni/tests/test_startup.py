@@ -0,0 +1,72 @@
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from prenotazioni import startup
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     prenotazioni.slot_index
+import time:      2900 |       3020 |   prenotazioni.services
+import time:       900 |       4100 | prenotazioni.views
+import time:        50 |         50 | rest_framework
+"""
+
+
+class ReadyTests(SimpleTestCase):
+    def test_ready_does_not_start_threads_or_touch_the_database(self):
+        config = apps.get_app_config('prenotazioni')
+        with mock.patch('sys.argv', ['gunicorn']), \
+                mock.patch('prenotazioni.models.connect_signals') as connect, \
+                mock.patch.object(threading.Thread, 'start') as start:
+            config.ready()
+        connect.assert_called_once_with()
+        start.assert_not_called()
+
+
+class ImportTimeParsingTests(SimpleTestCase):
+    def test_parse_and_group_by_package(self):
+        modules = startup.parse_importtime(IMPORTTIME.splitlines())
+
+        self.assertEqual(modules['prenotazioni.views'], (900, 4100))
+        self.assertNotIn('imported package', modules)
+        self.assertEqual(startup.by_package(modules), {'prenotazioni': 3920, 'rest_framework': 50})
+
+
+class StartupChecksTests(TestCase):
+    def test_checks_report_missing_superuser(self):
+        results = {name: (ok, detail) for name, ok, detail in startup.run_checks()}
+
+        self.assertTrue(results['database'][0])
+        self.assertFalse(results['superuser'][0])
+
+        get_user_model().objects.create_superuser('root', 'root@example.com', 'pass')
+        out = StringIO()
+        call_command('startup_profile', '--controlli', stdout=out)
+        self.assertIn('1 superuser', out.getvalue())
+
+
+class StartupProfileCommandTests(SimpleTestCase):
+    def test_profile_output(self):
+        report = {
+            'url': '/health/', 'process_s': 0.6,
+            'timings': {'setup_s': 0.3, 'wsgi_s': 0.01, 'first_request_s': 0.1,
+                        'second_request_s': 0.002, 'status': 200, 'total_s': 0.41},
+            'modules': startup.parse_importtime(IMPORTTIME.splitlines()),
+        }
+        report['packages'] = startup.by_package(report['modules'])
+        out = StringIO()
+        with mock.patch.object(startup, 'profile', return_value=report) as profile:
+            call_command('startup_profile', '--prefisso', 'prenotazioni', '--top', '2', stdout=out)
+
+        profile.assert_called_once_with(url='/health/')
+        output = out.getvalue()
+        self.assertIn('prima richiesta', output)
+        self.assertIn('prenotazioni.views', output)
+        self.assertIn('prenotazioni.services', output)
+        self.assertNotIn('prenotazioni.slot_index', output)
@@ -0,0 +1,70 @@
+import importlib.util
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from prenotazioni import warmup
+from prenotazioni.models import InformazioniScuola
+
+
+class WarmupTests(TestCase):
+    def test_all_steps_succeed_without_writes(self):
+        report = warmup.run(budget=30)
+
+        self.assertEqual([s['step'] for s in report['steps']], [name for name, _ in warmup.STEPS])
+        failed = [s for s in report['steps'] if s['status'] != 'ok']
+        self.assertEqual(failed, [])
+        self.assertIs(warmup.last_report, report)
+        # Il warm-up legge soltanto: nessuna scuola creata
+        self.assertFalse(InformazioniScuola.objects.exists())
+
+    def test_budget_skips_remaining_steps(self):
+        report = warmup.run(budget=0)
+
+        self.assertTrue(report['steps'])
+        self.assertTrue(all(s['status'] == 'saltato' for s in report['steps']))
+
+    def test_failing_step_is_isolated(self):
+        def boom():
+            raise RuntimeError('rotto')
+
+        steps = (('primo', boom), ('secondo', lambda: 'fatto'))
+        with mock.patch.object(warmup, 'STEPS', steps):
+            report = warmup.run(budget=30)
+
+        self.assertEqual([s['status'] for s in report['steps']], ['errore', 'ok'])
+        self.assertIn('rotto', report['steps'][0]['detail'])
+
+    @override_settings(WARMUP_ENABLED=False)
+    def test_disabled_worker_hook_does_nothing(self):
+        with mock.patch.object(warmup, 'run') as run:
+            self.assertIsNone(warmup.on_worker_start())
+        run.assert_not_called()
+
+    def test_gunicorn_hook_runs_warmup(self):
+        path = Path(settings.BASE_DIR) / 'gunicorn.conf.py'
+        spec = importlib.util.spec_from_file_location('gunicorn_conf', path)
+        conf = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(conf)
+        worker = mock.Mock(pid=123)
+
+        with mock.patch.object(warmup, 'run', return_value={'total_ms': 12.0}) as run:
+            conf.post_worker_init(worker)
+
+        run.assert_called_once_with()
+        worker.log.info.assert_called_once()
+
+    def test_command_reports_steps_and_fails_on_errors(self):
+        out = StringIO()
+        call_command('warmup', '--solo', 'template', '--solo', 'url_resolver', stdout=out)
+        self.assertIn('template', out.getvalue())
+        self.assertNotIn('query', out.getvalue())
+
+        with mock.patch.object(warmup, 'STEPS', (('rotto', mock.Mock(side_effect=ValueError('x'))),)):
+            with self.assertRaises(CommandError):
+                call_command('warmup', stdout=StringIO())
@@ -1,7 +1,7 @@
 
 from rest_framework import routers
-from .views import BookingViewSet, prenota_laboratorio, lista_prenotazioni, edit_prenotazione, delete_prenotazione, database_viewer, admin_operazioni, setup_amministratore, lookup_unica, debug_devices, debug_create_test_device, sanity_check, check_password_strength, generate_password
-from .views import ForcedPasswordChangeView
+from .views import BookingViewSet, prenota_laboratorio, lista_prenotazioni, edit_prenotazione, delete_prenotazione, database_viewer, admin_operazioni, setup_amministratore, lookup_unica, debug_devices, debug_create_test_device, sanity_check, check_password_strength, generate_password, export_dati, database_viewer_data, calendar_feed, availability_matrix
+from .views import ForcedPasswordChangeView, ResourceViewSet, DeviceViewSet
 from django.urls import path, include
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -10,6 +10,8 @@ app_name = 'prenotazioni'
 
 router = routers.DefaultRouter()
 router.register(r'prenotazioni', BookingViewSet)
+router.register(r'risorse', ResourceViewSet)
+router.register(r'dispositivi', DeviceViewSet)
 
 # Decoratori di sicurezza per view sensibili
 admin_required = user_passes_test(lambda u: u.is_staff)
@@ -20,6 +22,10 @@ urlpatterns = [
     path('prenotazione/<int:pk>/edit/', login_required(edit_prenotazione), name='edit_prenotazione'),
     path('prenotazione/<int:pk>/delete/', login_required(delete_prenotazione), name='delete_prenotazione'),
     path('database-viewer/', login_required(admin_required(database_viewer)), name='database_viewer'),
+    path('database-viewer/<str:section>/', login_required(admin_required(database_viewer_data)), name='database_viewer_data'),
+    path('export/<str:dataset>/', login_required(admin_required(export_dati)), name='export_dati'),
+    path('calendario/risorsa/<int:pk>.ics', calendar_feed, {'kind': 'risorsa'}, name='calendar_feed_risorsa'),
+    path('calendario/utente/<int:pk>.ics', calendar_feed, {'kind': 'utente'}, name='calendar_feed_utente'),
     path('configurazione-sistema/', lambda request: redirect('prenotazioni:setup_amministratore'), name='configurazione_sistema'),
     path('admin-operazioni/', login_required(admin_required(admin_operazioni)), name='admin_operazioni'),
     path('setup/', setup_amministratore, name='setup_amministratore'),
@@ -27,6 +33,7 @@ urlpatterns = [
     path('debug/devices/', debug_devices, name='debug_devices'),
     path('debug/devices/create_test/', debug_create_test_device, name='debug_create_test_device'),
     path('debug/sanity/', sanity_check, name='sanity_check'),
+    path('availability-matrix/', login_required(availability_matrix), name='availability_matrix'),
     path('api/check-password-strength/', check_password_strength, name='check_password_strength'),
     path('api/generate-password/', login_required(generate_password), name='generate_password'),
     path('accounts/password_change/', ForcedPasswordChangeView.as_view(), name='password_change'),
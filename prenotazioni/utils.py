@@ -0,0 +1,35 @@
+"""Funzioni di supporto condivise da servizi, viste e comandi."""
+from datetime import datetime, time as dt_time
+
+from django.utils import timezone
+
+
+def as_aware_datetime(value):
+    """Converte una data (a mezzanotte) o un datetime naive in datetime aware.
+
+    I datetime già aware vengono restituiti invariati; quelli naive sono
+    interpretati nel fuso orario corrente.
+    """
+    if not hasattr(value, 'hour'):
+        value = datetime.combine(value, dt_time.min)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def parse_date_strict(value):
+    """Converte una stringa YYYY-MM-DD in data.
+
+    Solleva ValueError sia per il formato sbagliato sia per date ben formate
+    ma inesistenti (es. 2024-02-30), per cui `parse_date` solleverebbe a sua
+    volta ValueError invece di restituire None.
+    """
+    from django.utils.dateparse import parse_date
+
+    try:
+        parsed = parse_date(str(value))
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f'Data non valida: {value} (formato YYYY-MM-DD)')
+    return parsed
@@ -116,6 +116,10 @@ def sanity_check(request):
     except Exception as e:
         result['pending_migrations_error'] = str(e)
 
+    # Esito del warm-up di questo worker (None se non eseguito)
+    from . import warmup
+    result['warmup'] = warmup.last_report
+
     return JsonResponse(result)
 
 
@@ -164,17 +168,40 @@ def validate_password_requirements(password):
 def check_password_strength(request):
     """Endpoint AJAX per controllare la forza della password in tempo reale.
     
-    Riceve la password POST e ritorna un JSON con i requisiti soddisfatti.
+    Riceve la password POST e ritorna un JSON con i requisiti soddisfatti,
+    il punteggio zxcvbn e gli errori di AUTH_PASSWORD_VALIDATORS: gli
+    stessi controlli del form di cambio password (storico escluso).
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
     
+    from django.contrib.auth.password_validation import validate_password
+    from django.core.exceptions import ValidationError
+    from .services import PasswordPolicyService
+
     password = request.POST.get('password', '')
     requirements = validate_password_requirements(password)
-    
+    user = request.user if request.user.is_authenticated else None
+    evaluation = PasswordPolicyService.evaluate(password, user) if password else None
+
+    errors = []
+    try:
+        validate_password(password, user)
+    except ValidationError as e:
+        errors = e.messages
+
+    # Stesso criterio del form: validatori di Django e, se disponibile,
+    # punteggio zxcvbn (altrimenti i requisiti regex)
+    zxcvbn_ok = evaluation['ok'] if evaluation is not None else requirements['is_strong']
+    is_strong = bool(password) and not errors and zxcvbn_ok
     return JsonResponse({
         'requirements': requirements,
-        'is_strong': requirements['is_strong']
+        'is_strong': is_strong,
+        'errors': errors,
+        'score': evaluation['score'] if evaluation else None,
+        'min_score': PasswordPolicyService.min_score(),
+        'warning': evaluation['warning'] if evaluation else '',
+        'suggestions': evaluation['suggestions'] if evaluation else [],
     })
 
 
@@ -251,50 +278,10 @@ class ForcedPasswordChangeForm(forms.Form):
         if p1 and p2 and p1 != p2:
             raise forms.ValidationError('Le password non coincidono')
 
-        # Validate complexity via Django validators
+        # Policy completa: validatori Django, zxcvbn e storico (hash in parallelo)
         if p1:
-            validate_password(p1, self.user)
-
-            # Optional: use zxcvbn for advanced password strength checks
-            try:
-                from django.conf import settings as _settings
-                from zxcvbn import zxcvbn
-                min_score = int(getattr(_settings, 'PASSWORD_MIN_ZXCVBN_SCORE', 3))
-                try:
-                    zx = zxcvbn(p1, user_inputs=[
-                        getattr(self.user, 'username', ''),
-                        getattr(self.user, 'first_name', ''),
-                        getattr(self.user, 'last_name', ''),
-                        getattr(self.user, 'email', ''),
-                    ])
-                    score = int(zx.get('score', 0))
-                    if score < min_score:
-                        feedback = zx.get('feedback') or {}
-                        suggestions = feedback.get('suggestions', []) if isinstance(feedback, dict) else []
-                        warning = feedback.get('warning', '') if isinstance(feedback, dict) else ''
-                        msg = 'Password troppo debole.'
-                        if warning:
-                            msg += f' {warning}'
-                        if suggestions:
-                            msg += ' ' + ' '.join(suggestions[:2])
-                        raise forms.ValidationError(msg)
-                except Exception:
-                    # If zxcvbn fails for any reason, do not block password
-                    # change; rely on Django validators as a fallback.
-                    pass
-            except Exception:
-                # zxcvbn not installed or import failed — skip advanced check
-                pass
-
-            # Check password history
-            from .models import PasswordHistory
-            history = PasswordHistory.objects.filter(utente=self.user).order_by('-created_at')[:5]
-            for h in history:
-                try:
-                    if check_password(p1, h.password_hash):
-                        raise forms.ValidationError('Questa password è già stata usata in precedenza')
-                except Exception:
-                    continue
+            from .services import PasswordPolicyService
+            PasswordPolicyService.validate(p1, self.user)
 
         return cleaned
 
@@ -374,26 +361,16 @@ def setup_amministratore(request):
     - Se no superuser → Mostra wizard (admin → school → device → resources → done)
     - Se superuser esiste → Mostra dashboard configurazioni
     """
-    from django.contrib.auth import get_user_model
-    from django.contrib import messages
-    from django.shortcuts import render, redirect
-    from .models import (
-        Risorsa, InformazioniScuola, Dispositivo, UbicazioneRisorsa,
-        ConfigurazioneSistema
-    )
-    from .forms import (
-        AdminUserForm, SchoolInfoForm, DeviceWizardForm, RisorseConfigurazioneForm,
-        ConfigurationForm
-    )
+    # Modelli, form e shortcut sono già importati a livello di modulo;
+    # qui solo ciò che serve al wizard, usato di rado.
+    from .forms import AdminUserForm
     from django.urls import reverse
     from django.db import transaction
-    from django.core.paginator import Paginator
     from .wizard_security import (
         log_wizard_access, validate_wizard_admin_session,
         log_wizard_step_completion
     )
-    
-    from .models import ConfigurazioneSistema
+
     User = get_user_model()
 
     # Step 1: Se setup è già completato (flag DB) oppure esiste un superuser
@@ -894,7 +871,7 @@ import logging
 from django.contrib import messages
 from django.shortcuts import redirect, render, get_object_or_404
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from rest_framework import viewsets, generics
@@ -902,7 +879,8 @@ from rest_framework.decorators import action
 from django.contrib.auth import get_user_model
 
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.exceptions import ValidationError as DRFValidationError
+from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import (
     Risorsa, Dispositivo, Prenotazione, ConfigurazioneSistema, SessioneUtente, LogSistema, NotificaUtente, UbicazioneRisorsa, CategoriaDispositivo, StatoPrenotazione, InformazioniScuola
@@ -913,10 +891,11 @@ from .forms import (
 from .services import (
     ConfigurationService, UserSessionService, EmailService, BookingService,
     NotificationService, ResourceService, SystemService,
-    SystemInitializer
+    SystemInitializer, CalendarFeedService, RecurringBookingService, BulkBookingService
 )
 from .serializers import (
-    ResourceSerializer, DeviceSerializer, BookingSerializer
+    ResourceSerializer, DeviceSerializer, BookingSerializer, BookingCreateSerializer,
+    BookingSeriesSerializer, BookingSeriesUpdateSerializer, BookingBulkItemSerializer, BookingBulkIdsSerializer
 )
 
 
@@ -975,12 +954,7 @@ class HomeView(LoginRequiredMixin, View):
                 'is_admin': False
             }
 
-        # Informazioni scuola
-        try:
-            context['school_info'] = InformazioniScuola.ottieni_istanza()
-        except Exception:
-            context['school_info'] = None
-
+        # `school_info` arriva dal context processor `prenotazioni.context_processors.scuola`
         return render(request, 'home.html', context)
 
 
@@ -1214,7 +1188,7 @@ class PrenotaResourceView(LoginRequiredMixin, View):
 
             if success:
                 messages.success(request, 'Prenotazione creata con successo!')
-                return redirect('bookings:lista')
+                return redirect('prenotazioni:lista_prenotazioni')
             else:
                 messages.error(request, f'Errore: {result}')
         else:
@@ -1280,6 +1254,7 @@ class ListaPrenotazioniView(LoginRequiredMixin, View):
             'bookings': page_obj.object_list,
             'page_obj': page_obj,
             'is_admin_view': is_admin_view,
+            'calendar_feed_token': CalendarFeedService.feed_token('utente', user.pk),
         }
 
         return render(request, 'prenotazioni/lista.html', context)
@@ -1318,7 +1293,7 @@ class ListaPrenotazioniView(LoginRequiredMixin, View):
         # Controllo permessi
         if not prenotazione.can_be_modified_by(request.user):
             messages.error(request, 'Non hai i permessi per modificare questa prenotazione.')
-            return redirect('bookings:lista')
+            return redirect('prenotazioni:lista_prenotazioni')
 
         form = BookingForm(request.POST, user=request.user, prenotazione_id=pk)
 
@@ -1339,7 +1314,7 @@ class ListaPrenotazioniView(LoginRequiredMixin, View):
 
             if success:
                 messages.success(request, 'Prenotazione aggiornata con successo!')
-                return redirect('bookings:lista')
+                return redirect('prenotazioni:lista_prenotazioni')
             else:
                 messages.error(request, f'Errore: {result}')
         else:
@@ -1366,7 +1341,7 @@ class DeletePrenotazioneView(LoginRequiredMixin, View):
         # Controllo permessi
         if not prenotazione.can_be_cancelled_by(request.user):
             messages.error(request, 'Non hai i permessi per eliminare questa prenotazione.')
-            return redirect('bookings:lista')
+            return redirect('prenotazioni:lista_prenotazioni')
 
         form = ConfirmDeleteForm()
 
@@ -1385,7 +1360,7 @@ class DeletePrenotazioneView(LoginRequiredMixin, View):
         # Controllo permessi
         if not prenotazione.can_be_cancelled_by(request.user):
             messages.error(request, 'Non hai i permessi per eliminare questa prenotazione.')
-            return redirect('bookings:lista')
+            return redirect('prenotazioni:lista_prenotazioni')
 
         form = ConfirmDeleteForm(request.POST)
 
@@ -1404,7 +1379,7 @@ class DeletePrenotazioneView(LoginRequiredMixin, View):
         else:
             messages.error(request, 'Devi confermare per procedere.')
 
-        return redirect('bookings:lista')
+        return redirect('prenotazioni:lista_prenotazioni')
 
 
 # =====================================================
@@ -1528,9 +1503,29 @@ class BookingViewSet(viewsets.ModelViewSet):
         else:
             return Prenotazione.objects.filter(utente=user).select_related('utente', 'risorsa').only('id', 'utente', 'risorsa', 'inizio', 'fine', 'stato')
 
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return BookingCreateSerializer
+        return BookingSerializer
+
     def perform_create(self, serializer):
-        """Crea prenotazione associandola all'utente."""
-        serializer.save(utente=self.request.user)
+        """Crea la prenotazione tramite BookingService, come la vista HTML.
+
+        Così API e form condividono controllo di disponibilità e pipeline
+        degli effetti collaterali.
+        """
+        data = serializer.validated_data
+        success, result = BookingService.create_booking(
+            utente=self.request.user,
+            risorsa_id=data['risorsa'].id,
+            quantita=data.get('quantita', 1),
+            inizio=data['inizio'],
+            fine=data['fine'],
+            **{key: data[key] for key in ('numero_persone', 'priorita', 'scopo', 'note', 'setup_needed', 'cleanup_needed') if key in data}
+        )
+        if not success:
+            raise DRFValidationError({'detail': result})
+        serializer.instance = result
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -1563,25 +1558,223 @@ class BookingViewSet(viewsets.ModelViewSet):
 
         return Response({'message': 'Prenotazione approvata'})
 
+    @staticmethod
+    def _bulk_response(results, success_status=200):
+        """Esiti per elemento: tutti ok, parziale (207) o nessuno (400)."""
+        ok = sum(1 for r in results if r['esito'] == 'ok')
+        if ok == len(results):
+            status = success_status
+        else:
+            status = 207 if ok else 400
+        return Response({'risultati': results, 'ok': ok, 'errori': len(results) - ok}, status=status)
+
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create(self, request):
+        """Crea più prenotazioni: `{"prenotazioni": [...], "tutto_o_niente": false}`."""
+        items = request.data.get('prenotazioni') if hasattr(request.data, 'get') else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Serve una lista non vuota in "prenotazioni"'}, status=400)
+        if len(items) > BulkBookingService.MAX_ELEMENTI:
+            return Response({'error': f'Al massimo {BulkBookingService.MAX_ELEMENTI} prenotazioni per richiesta'}, status=400)
+        tutto_o_niente = hasattr(request.data, 'get') and bool(request.data.get('tutto_o_niente'))
+
+        results, valid = [None] * len(items), []
+        for indice, item in enumerate(items):
+            serializer = BookingBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((indice, serializer.validated_data))
+            else:
+                results[indice] = {'indice': indice, 'id': None, 'esito': 'errore', 'errore': serializer.errors}
+        if tutto_o_niente and len(valid) < len(items):
+            valid_results = []
+        else:
+            valid_results, _ = BulkBookingService.create_many(request.user, valid, tutto_o_niente)
+        for result in valid_results:
+            results[result['indice']] = result
+        results = [r or {'indice': i, 'id': None, 'esito': 'errore', 'errore': 'Lotto annullato per errori in altri elementi.'}
+                   for i, r in enumerate(results)]
+        return self._bulk_response(results, success_status=201)
+
+    @action(detail=False, methods=['post'], url_path='bulk-cancel')
+    def bulk_cancel(self, request):
+        """Annulla più prenotazioni: `{"ids": [...], "motivo": "", "tutto_o_niente": false}`."""
+        serializer = BookingBulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        results, _ = BulkBookingService.cancel_many(
+            request.user, data['ids'], reason=data['motivo'] or 'Cancellata via API', tutto_o_niente=data['tutto_o_niente']
+        )
+        return self._bulk_response(results)
+
+    @action(detail=False, methods=['post'], url_path='bulk-approve')
+    def bulk_approve(self, request):
+        """Approva più prenotazioni (solo admin): `{"ids": [...], "tutto_o_niente": false}`."""
+        if not request.user.is_staff:
+            return Response({'error': 'Solo amministratori'}, status=403)
+        serializer = BookingBulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results, _ = BulkBookingService.approve_many(
+            request.user, serializer.validated_data['ids'], tutto_o_niente=serializer.validated_data['tutto_o_niente']
+        )
+        return self._bulk_response(results)
+
+    @staticmethod
+    def _series_conflicts(conflicts):
+        return [{'inizio': inizio, 'fine': fine, 'motivo': motivo} for inizio, fine, motivo in conflicts]
+
+    @action(detail=False, methods=['post'], url_path='serie')
+    def create_series(self, request):
+        """Crea una serie ricorrente e tutte le occorrenze disponibili."""
+        serializer = BookingSeriesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        risorsa = data.pop('risorsa')
+
+        success, result, conflicts = RecurringBookingService.create_series(
+            utente=request.user, risorsa_id=risorsa.id, **data
+        )
+        if not success:
+            return Response({'error': result, 'conflitti': self._series_conflicts(conflicts)}, status=400)
+        return Response({
+            **BookingSeriesSerializer(result).data,
+            'prenotazioni_create': result.occorrenze.count(),
+            'conflitti': self._series_conflicts(conflicts),
+        }, status=201)
+
+    @action(detail=False, methods=['patch'], url_path=r'serie/(?P<serie_id>[0-9]+)')
+    def update_series(self, request, serie_id=None):
+        """Modifica tutte le occorrenze future di una serie."""
+        serializer = BookingSeriesUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        success, result, conflicts = RecurringBookingService.update_series(
+            serie_id, request.user, **serializer.validated_data
+        )
+        if not success:
+            return Response({'error': result, 'conflitti': self._series_conflicts(conflicts)}, status=400)
+        return Response({'message': 'Serie aggiornata', 'occorrenze_aggiornate': result})
+
+    @action(detail=False, methods=['post'], url_path=r'serie/(?P<serie_id>[0-9]+)/annulla')
+    def cancel_series(self, request, serie_id=None):
+        """Annulla le occorrenze future di una serie (da `dal`, se indicato)."""
+        from datetime import datetime, time as dt_time
+        from .utils import parse_date_strict
+
+        dal = None
+        if request.data.get('dal'):
+            try:
+                giorno = parse_date_strict(request.data['dal'])
+            except ValueError:
+                return Response({'error': 'Data non valida per dal (YYYY-MM-DD)'}, status=400)
+            dal = timezone.make_aware(datetime.combine(giorno, dt_time.min))
+
+        success, result = RecurringBookingService.cancel_series(
+            serie_id, request.user, dal=dal, reason="Serie cancellata via API"
+        )
+        if not success:
+            return Response({'error': result}, status=400)
+        return Response({'message': 'Serie annullata', 'occorrenze_annullate': result})
+
+
+
+class ConditionalGetMixin:
+    """GET condizionali (ETag) per viewset di sola lettura.
+
+    Il validatore viene da una sola query aggregata sul queryset filtrato:
+    `max(modificato_il)` e numero di righe, più gli stessi valori dei
+    modelli annidati elencati in `etag_related`. Con `If-None-Match` ancora
+    valido la risposta è un 304, prima di caricare e serializzare gli
+    oggetti. Niente `Last-Modified`: una riga che esce dal queryset
+    (disattivata, cancellata, filtrata) cambia il conteggio ma non
+    `max(modificato_il)`, e un client che usa solo `If-Modified-Since`
+    riceverebbe un 304 obsoleto. Il payload serializzato è in cache
+    sotto una chiave che contiene l'ETag: ogni modifica a una riga cambia
+    il validatore e rende obsoleta la copia precedente.
+    """
+
+    etag_related = ()
+    # Se impostato, l'ETag cambia comunque ogni `etag_max_age` secondi
+    # (per campi calcolati che non dipendono da `modificato_il`)
+    etag_max_age = None
+    body_cache_timeout = 60 * 60
+
+    def get_validator(self, queryset):
+        """Restituisce l'ETag del queryset."""
+        import hashlib
+        from django.db.models import Count, Max
+
+        aggregates = {'last': Max('modificato_il'), 'total': Count('pk', distinct=True)}
+        for i, related in enumerate(self.etag_related):
+            aggregates[f'last_{i}'] = Max(f'{related}__modificato_il')
+            aggregates[f'total_{i}'] = Count(related)
+        agg = queryset.order_by().aggregate(**aggregates)
+
+        parts = [
+            self.queryset.model._meta.label,
+            self.request.build_absolute_uri(),
+            getattr(self.request, 'accepted_media_type', ''),
+        ]
+        parts.extend(f'{key}={value.timestamp() if hasattr(value, "timestamp") else value}'
+                     for key, value in sorted(agg.items()))
+        if self.etag_max_age:
+            parts.append(str(int(timezone.now().timestamp() // self.etag_max_age)))
+        digest = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+        return f'"{digest}"'
+
+    def _conditional(self, request, queryset, render):
+        from django.core.cache import cache
+        from django.utils.cache import get_conditional_response
+
+        etag = self.get_validator(queryset)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            key = f'api-body:{etag.strip(chr(34))}'
+            data = cache.get(key)
+            if data is None:
+                response = render()
+                if response.status_code == 200:
+                    cache.set(key, response.data, self.body_cache_timeout)
+            else:
+                response = Response(data)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional(request, queryset, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return self._conditional(request, queryset, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
 
 
-class ResourceViewSet(viewsets.ReadOnlyModelViewSet):
-    """API REST per risorse ottimizzata (solo lettura)."""
-    queryset = Risorsa.objects.filter(attivo=True).select_related('ubicazione').only('id', 'nome', 'tipo', 'localizzazione')
+class ResourceViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """API REST per risorse (solo lettura, con GET condizionali)."""
+    queryset = Risorsa.objects.filter(attivo=True).select_related('localizzazione').prefetch_related(
+        'dispositivi__categoria'
+    ).order_by('tipo', 'nome')
     serializer_class = ResourceSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['tipo', 'attivo']
     search_fields = ['nome']
     pagination_class = SmallResultsSetPagination
+    etag_related = ('dispositivi',)
+    # utilization_stats dipende dalle prenotazioni, non da modificato_il
+    etag_max_age = 60 * 60
 
 
-
-class DeviceViewSet(viewsets.ReadOnlyModelViewSet):
-    """API REST per dispositivi ottimizzata (solo lettura)."""
-    queryset = Dispositivo.objects.filter(attivo=True).select_related('categoria').only('id', 'nome', 'tipo', 'marca', 'categoria', 'stato')
+class DeviceViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """API REST per dispositivi (solo lettura, con GET condizionali)."""
+    queryset = Dispositivo.objects.filter(attivo=True).select_related('categoria').order_by('tipo', 'marca', 'nome')
     serializer_class = DeviceSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    # Inventario (codici, numeri di serie, valori): mai esposto agli anonimi
+    permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['tipo', 'stato']
     search_fields = ['nome']
@@ -1917,30 +2110,145 @@ def delete_prenotazione(request, pk):
     return view(request, pk=pk)
 
 
+def calendar_feed(request, kind, pk):
+    """Feed iCalendar (.ics) delle prenotazioni di una risorsa o di un utente.
+
+    Accesso con sessione (staff, o l'utente stesso per il proprio feed) oppure
+    con il parametro `token` per i client calendario. Supporta GET condizionali
+    con ETag: se nulla è cambiato risponde 304.
+    """
+    from django.utils.cache import get_conditional_response
+    from .services import CalendarFeedService
+
+    if kind == 'risorsa':
+        obj = get_object_or_404(Risorsa.objects.only('nome'), pk=pk)
+        title = obj.nome
+        allowed = request.user.is_authenticated
+    else:
+        obj = get_object_or_404(get_user_model().objects.only('username'), pk=pk)
+        title = f'Prenotazioni di {obj.username}'
+        allowed = request.user.is_authenticated and (request.user.is_staff or request.user.pk == obj.pk)
+    if not (allowed or CalendarFeedService.check_token(kind, pk, request.GET.get('token'))):
+        return HttpResponse(status=403)
+
+    etag = CalendarFeedService.validator(kind, pk, title)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    body = CalendarFeedService.get_body(kind, pk, etag, title)
+    response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Content-Disposition'] = f'inline; filename="{kind}_{pk}.ics"'
+    return response
+
+
+def availability_matrix(request):
+    """Matrice di disponibilità delle risorse per la griglia settimanale (JSON).
+
+    Parametri GET: `from` e `to` (YYYY-MM-DD, arrotondati a settimane intere,
+    default: settimana corrente) e `tipo` (tipo risorsa).
+    """
+    from .services import AvailabilityMatrixService
+    from .utils import parse_date_strict
+
+    raw_from, raw_to = request.GET.get('from'), request.GET.get('to')
+    try:
+        da = parse_date_strict(raw_from) if raw_from else timezone.localdate()
+        a = parse_date_strict(raw_to) if raw_to else da
+        data = AvailabilityMatrixService.get_matrix(da, a, tipo=request.GET.get('tipo') or None)
+    except ValueError as e:
+        return JsonResponse({'error': 'invalid_request', 'detail': str(e)}, status=400)
+    return JsonResponse(data)
+
+
 def database_viewer(request):
-    """Wrapper view per visualizzazione database (solo admin)."""
+    """Wrapper view per visualizzazione database (solo admin).
+
+    La pagina contiene solo la struttura delle sezioni: i dati vengono
+    caricati per scheda da `database_viewer_data`.
+    """
+    from .services import DatabaseViewerService
+
     if not request.user.is_staff:
         messages.error(request, 'Accesso negato. Solo gli amministratori possono visualizzare il database.')
         return redirect('home')
-    
-    # Statistiche dettagliate
-    stats = SystemService.get_system_stats()
-    
-    # Dati completi
-    User = get_user_model()
-    utenti = User.objects.all().order_by('username')
-    risorse = Risorsa.objects.all().select_related('ubicazione')
-    dispositivi = Dispositivo.objects.all().select_related('categoria').order_by('marca', 'nome')
-    prenotazioni = Prenotazione.objects.all().select_related('utente', 'risorsa', 'stato').order_by('-inizio')[:100]
-    logs = LogSistema.objects.order_by('-timestamp')[:50]
-    
+
     context = {
-        'stats': stats,
-        'utenti': utenti,
-        'risorse': risorse,
-        'dispositivi': dispositivi,
-        'prenotazioni': prenotazioni,
-        'logs': logs,
+        'sections': DatabaseViewerService.sections(),
         'is_admin_view': True
     }
-    return render(request, 'admin/database_viewer.html', context)
+    return render(request, 'prenotazioni/database_viewer.html', context)
+
+
+def database_viewer_data(request, section):
+    """Pagina JSON di una sezione del database viewer (solo admin).
+
+    Parametri GET: `after` (cursore), `limit`, `q` (ricerca) e i filtri
+    ammessi dalla sezione.
+    """
+    from .services import DatabaseViewerService
+
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    if section not in DatabaseViewerService.SECTIONS:
+        return JsonResponse({'error': 'unknown_section'}, status=404)
+
+    reserved = {'after', 'limit', 'q'}
+    filters = {k: v for k, v in request.GET.items() if k not in reserved}
+    try:
+        data = DatabaseViewerService.page(
+            section,
+            after=request.GET.get('after') or None,
+            limit=request.GET.get('limit') or None,
+            q=(request.GET.get('q') or '').strip() or None,
+            filters=filters,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': 'invalid_request', 'detail': str(e)}, status=400)
+    return JsonResponse(data)
+
+
+def export_dati(request, dataset):
+    """Export in streaming (CSV o NDJSON) di prenotazioni, log e notifiche (solo admin).
+
+    Parametri GET: `formato` (csv|ndjson), `dal`/`al` (YYYY-MM-DD),
+    `risorsa`, `utente`, `include_cancellate`.
+    """
+    from django.http import StreamingHttpResponse
+    from .services import ExportService
+    from .utils import parse_date_strict
+
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+
+    fmt = request.GET.get('formato', 'csv')
+    filters = {}
+    for param, key in (('dal', 'date_from'), ('al', 'date_to')):
+        raw = request.GET.get(param)
+        if raw:
+            try:
+                filters[key] = parse_date_strict(raw)
+            except ValueError:
+                return JsonResponse({'error': 'invalid_date', 'param': param}, status=400)
+    for param, key in (('risorsa', 'risorsa_id'), ('utente', 'utente_id')):
+        raw = request.GET.get(param)
+        if raw:
+            if not raw.isdigit():
+                return JsonResponse({'error': 'invalid_id', 'param': param}, status=400)
+            filters[key] = int(raw)
+    filters['include_cancelled'] = bool(request.GET.get('include_cancellate'))
+    if dataset != 'prenotazioni':
+        filters.pop('include_cancelled')
+
+    try:
+        rows = ExportService.stream(dataset, fmt=fmt, **filters)
+    except ValueError as e:
+        return JsonResponse({'error': 'invalid_request', 'message': str(e)}, status=400)
+
+    content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(rows, content_type=content_type)
+    filename = f"{dataset}_{timezone.now():%Y%m%d_%H%M}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,202 @@
+"""Riscaldamento dei worker prima che accettino traffico.
+
+Dopo un deploy o il riciclo di un worker la prima richiesta paga import
+e costruzione del resolver degli URL, compilazione dei template (il
+loader con cache di Django li tiene in memoria per processo), apertura
+della connessione al database, caricamento di zxcvbn e le prime query
+dei percorsi più usati. `run` esegue questi passi una volta, in ordine,
+entro un tempo massimo: i passi rimasti fuori vengono saltati e
+registrati, mai rimandati alla richiesta dell'utente.
+
+Punti di ingresso:
+- `gunicorn.conf.py` (`post_worker_init`): in ogni worker, dopo il
+  caricamento dell'applicazione e prima della prima richiesta;
+- `manage.py warmup`: esegue i passi e ne stampa i tempi.
+
+L'ultimo report del processo è in `last_report` ed è esposto da
+`sanity_check`.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger('prenotazioni.warmup')
+
+DEFAULT_BUDGET_SECONDS = 5.0
+DEFAULT_TEMPLATES = (
+    'home.html',
+    'registration/login.html',
+    'registration/email_login.html',
+    'registration/verify_pin.html',
+    'prenotazioni/prenota.html',
+    'prenotazioni/lista.html',
+    'emails/booking_confirmation.html',
+    'emails/booking_reminder.html',
+    'emails/pin_verification.html',
+)
+
+last_report = None
+
+
+# =====================================================
+# PASSI
+# =====================================================
+
+def _url_resolver():
+    """Importa URLconf e viste (DRF incluso) e popola le tabelle di reverse."""
+    from django.urls import get_resolver, reverse
+
+    resolver = get_resolver()
+    resolver.url_patterns
+    reverse('home')
+    return f'{len(resolver.reverse_dict)} nomi'
+
+
+def _database():
+    from django.db import connection
+
+    connection.ensure_connection()
+    return connection.vendor
+
+
+def _configurazione():
+    from .services import ConfigurationService
+
+    return f"{len(ConfigurationService.get_booking_settings())} impostazioni"
+
+
+def _scuola():
+    from .models import InformazioniScuola
+
+    # Snapshot in sola lettura: un worker appena avviato non deve creare righe
+    return 'configurata' if InformazioniScuola.ottieni_snapshot() else 'assente'
+
+
+def _template_notifiche():
+    from .models import TemplateNotifica
+
+    return f'{len(list(TemplateNotifica.objects.filter(attivo=True)))} attivi'
+
+
+def _template():
+    """Compila i template più usati; un template rotto non blocca gli altri."""
+    from django.template import TemplateDoesNotExist, TemplateSyntaxError
+    from django.template.loader import get_template
+
+    names = getattr(settings, 'WARMUP_TEMPLATES', DEFAULT_TEMPLATES)
+    broken = []
+    for name in names:
+        try:
+            get_template(name)
+        except TemplateDoesNotExist:
+            logger.warning('Warm-up: template %s non trovato', name)
+        except TemplateSyntaxError as e:
+            broken.append(f'{name} ({e})')
+    if broken:
+        raise TemplateSyntaxError('; '.join(broken))
+    return f'{len(names)} template'
+
+
+def _query():
+    """Esegue una volta le query dei percorsi più frequenti (home, lista, API)."""
+    from django.utils import timezone
+
+    from .models import Dispositivo, Prenotazione, Risorsa
+
+    now = timezone.now()
+    list(Risorsa.objects.filter(attivo=True).select_related('localizzazione')[:1])
+    list(Dispositivo.objects.select_related('categoria')[:1])
+    list(Prenotazione.objects.filter(fine__gte=now).select_related('risorsa', 'utente')[:1])
+    return 'ok'
+
+
+def _passwords():
+    from . import passwords
+
+    return 'zxcvbn caricato' if passwords.warm_up() else 'zxcvbn non installato'
+
+
+# Ordine: prima ciò che serve a ogni richiesta, poi i percorsi specifici
+STEPS = (
+    ('url_resolver', _url_resolver),
+    ('database', _database),
+    ('configurazione', _configurazione),
+    ('scuola', _scuola),
+    ('template', _template),
+    ('template_notifiche', _template_notifiche),
+    ('query', _query),
+    ('passwords', _passwords),
+)
+
+
+# =====================================================
+# ESECUZIONE
+# =====================================================
+
+def enabled():
+    return bool(getattr(settings, 'WARMUP_ENABLED', True))
+
+
+def run(budget=None, only=None):
+    """Esegue i passi entro `budget` secondi e restituisce il report.
+
+    Ogni passo è isolato: un errore viene registrato e si prosegue. Un
+    passo già avviato non viene interrotto, quindi il tempo totale può
+    superare il budget al più della durata di un passo.
+    """
+    global last_report
+
+    if budget is None:
+        budget = float(getattr(settings, 'WARMUP_BUDGET_SECONDS', DEFAULT_BUDGET_SECONDS))
+    started = time.perf_counter()
+    deadline = started + budget
+    steps = []
+    for name, step in STEPS:
+        if only and name not in only:
+            continue
+        if time.perf_counter() >= deadline:
+            steps.append({'step': name, 'status': 'saltato', 'ms': 0.0, 'detail': 'budget esaurito'})
+            continue
+        step_started = time.perf_counter()
+        try:
+            detail, status = step(), 'ok'
+        except Exception as e:
+            detail, status = f'{type(e).__name__}: {e}', 'errore'
+            logger.warning('Warm-up: passo %s fallito: %s', name, detail)
+        steps.append({
+            'step': name, 'status': status,
+            'ms': round((time.perf_counter() - step_started) * 1000, 2), 'detail': detail,
+        })
+
+    report = {
+        'pid': os.getpid(),
+        'total_ms': round((time.perf_counter() - started) * 1000, 2),
+        'budget_ms': round(budget * 1000, 2),
+        'steps': steps,
+    }
+    last_report = report
+    logger.info(
+        'Warm-up pid=%s in %.1fms: %s', report['pid'], report['total_ms'],
+        ', '.join(f"{s['step']}={s['status']}({s['ms']:.0f}ms)" for s in steps),
+    )
+    return report
+
+
+def on_worker_start():
+    """Entry point per i worker: esegue `run` se abilitato, senza mai sollevare."""
+    if not enabled():
+        return None
+    from django.db import connection
+
+    try:
+        return run()
+    except Exception:
+        logger.exception('Warm-up del worker fallito')
+        return None
+    finally:
+        # La connessione resta al worker solo se CONN_MAX_AGE lo consente
+        connection.close_if_unusable_or_obsolete()